@@ -0,0 +1,103 @@
+"""
+Benchmark: BeautifulSoup get_text() vs. text_cleaning.clean_html.
+
+    python bench_clean_html.py                      # BayernCloud dumps from BAYERNCLOUD_DATA_DIR
+    python bench_clean_html.py --synthetic 5000     # generated sample corpus
+
+Cleans every description and opening-hours description per document, the
+same inputs parse_to_document sees, checks both produce identical text and
+prints the time per document.
+"""
+import os
+import time
+import random
+import argparse
+from typing import Any, Dict, Iterator, List
+
+from sources import iter_source_items, list_source_files
+from text_cleaning import cache_info, clean_html, clean_html_soup, _html_to_text
+
+DATA_DIR = os.getenv("BAYERNCLOUD_DATA_DIR", "../api-gateway/bayerncloud-data")
+FILE_PATTERN = os.getenv("BAYERNCLOUD_FILE_PATTERN", "bayerncloud*.json")
+
+BOILERPLATE_HOURS = [
+    "<p>Öffnungszeiten nach Vereinbarung.</p>",
+    "Bitte informieren Sie sich vorab telefonisch.",
+    "<p>Saisonal geöffnet, Details auf der Website.</p>",
+]
+
+
+def html_inputs(item: Dict[str, Any]) -> List[str]:
+    texts = [item.get("description") or ""]
+    ohs = item.get("openingHoursSpecification") or []
+    if isinstance(ohs, dict):
+        ohs = [ohs]
+    texts.extend(oh.get("description") or "" for oh in ohs if isinstance(oh, dict))
+    return texts
+
+
+def synthetic_items(n: int, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    for i in range(n):
+        if rng.random() < 0.3:
+            description = f"Gasthof {i} im Allgäu mit regionaler Küche und Terrasse."
+        else:
+            paragraphs = "".join(
+                f"<p>Absatz {j} über <strong>POI {i}</strong> &amp; Umgebung.<br/>Mehr Text hier.</p>"
+                for j in range(rng.randint(1, 6))
+            )
+            description = f"<div>{paragraphs}</div>"
+        yield {
+            "@id": f"poi-{i}",
+            "description": description,
+            "openingHoursSpecification": [{"description": rng.choice(BOILERPLATE_HOURS)}],
+        }
+
+
+def load_documents(args) -> List[List[str]]:
+    if args.synthetic:
+        items = synthetic_items(args.synthetic)
+    else:
+        files = list_source_files(DATA_DIR, FILE_PATTERN)
+        if not files:
+            raise SystemExit(f"Keine Dateien in {DATA_DIR} ({FILE_PATTERN}), --synthetic N verwenden.")
+        items = (item for f in files for item in iter_source_items(f))
+    documents = [html_inputs(item) for item in items]
+    return documents[: args.limit] if args.limit else documents
+
+
+def run(fn, documents: List[List[str]]) -> float:
+    started = time.perf_counter()
+    for texts in documents:
+        for text in texts:
+            fn(text)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="generate N sample documents instead")
+    parser.add_argument("--limit", type=int, default=0)
+    args = parser.parse_args()
+
+    documents = load_documents(args)
+    inputs = sum(len(texts) for texts in documents)
+    print(f"{len(documents)} Dokumente, {inputs} HTML-Felder")
+
+    mismatches = [t for texts in documents for t in texts if clean_html(t) != clean_html_soup(t)]
+    print(f"Abweichungen zur BeautifulSoup-Ausgabe: {len(mismatches)}")
+    _html_to_text.cache_clear()
+
+    soup_sec = run(clean_html_soup, documents)
+    fast_sec = run(clean_html, documents)
+    info = cache_info()
+
+    per_doc = lambda sec: sec / max(len(documents), 1) * 1e6
+    print(f"BeautifulSoup:  {soup_sec:8.3f} s  {per_doc(soup_sec):8.1f} µs/Dokument")
+    print(f"clean_html:     {fast_sec:8.3f} s  {per_doc(fast_sec):8.1f} µs/Dokument")
+    print(f"Speedup:        {soup_sec / max(fast_sec, 1e-9):8.1f}x")
+    print(f"Cache:          {info.hits} Treffer, {info.misses} Parses, {info.currsize}/{info.maxsize} Einträge")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: per-item track geometry vs. the vectorized batch stage (geometry.py).
+
+    python bench_geometry.py                        # track lines from BAYERNCLOUD_DATA_DIR
+    python bench_geometry.py --synthetic 2000       # generated trails, ~2000 vertices each
+
+Unsimplified: wkt.loads + shapely mapping() of the full line, the ingest
+before track simplification. Per item: track_metadata for every line, the
+parse_to_document fallback. Batch: track_geometry over chunks of
+INGEST_PARSE_CHUNK lines, as prepare_geometry does. Per item and batch must
+produce the same metadata.
+"""
+import os
+import time
+import argparse
+from typing import List, Optional
+
+import numpy as np
+from shapely.geometry import mapping as shape_mapping
+
+from sources import iter_source_items, list_source_files
+from pipeline import INGEST_PARSE_CHUNK, batched
+from geometry import TRACK_SIMPLIFY_TOLERANCE_M, parse_track_wkt, track_geometry, track_metadata
+
+DATA_DIR = os.getenv("BAYERNCLOUD_DATA_DIR", "../api-gateway/bayerncloud-data")
+FILE_PATTERN = os.getenv("BAYERNCLOUD_FILE_PATTERN", "bayerncloud*.json")
+
+
+def synthetic_lines(n: int, vertices: int = 2000, seed: int = 42) -> List[str]:
+    # random walks across Bavaria, ~5 m steps with elevation, like GPS tracks
+    rng = np.random.default_rng(seed)
+    lines = []
+    for _ in range(n):
+        start = np.array([rng.uniform(9.5, 13.5), rng.uniform(47.3, 50.3)])
+        steps = rng.normal(scale=0.00005, size=(vertices, 2)).cumsum(axis=0)
+        z = 500 + rng.normal(scale=0.5, size=vertices).cumsum()
+        coords = ", ".join(f"{x:.7f} {y:.7f} {h:.1f}" for (x, y), h in zip(start + steps, z))
+        lines.append(f"MULTILINESTRING Z (({coords}))")
+    return lines
+
+
+def load_lines(args) -> List[str]:
+    if args.synthetic:
+        return synthetic_lines(args.synthetic)
+    files = list_source_files(DATA_DIR, FILE_PATTERN)
+    if not files:
+        raise SystemExit(f"Keine Dateien in {DATA_DIR} ({FILE_PATTERN}), --synthetic N verwenden.")
+    lines = [
+        item["geo"]["line"]
+        for f in files
+        for item in iter_source_items(f)
+        if isinstance(item, dict) and (item.get("geo") or {}).get("line")
+    ]
+    return lines[: args.limit] if args.limit else lines
+
+
+def unsimplified(lines: List[str]) -> None:
+    for line in lines:
+        shape_mapping(parse_track_wkt(line))
+
+
+def per_item(lines: List[str]) -> List[Optional[dict]]:
+    results = []
+    for line in lines:
+        try:
+            results.append(track_metadata(parse_track_wkt(line)))
+        except Exception:
+            results.append(None)
+    return results
+
+
+def batch(lines: List[str], chunk: int) -> List[Optional[dict]]:
+    results = []
+    for lines_chunk in batched(lines, chunk):
+        results.extend(metadata for metadata, _ in track_geometry(lines_chunk, [None] * len(lines_chunk)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="generate N sample tracks instead")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--chunk", type=int, default=INGEST_PARSE_CHUNK)
+    args = parser.parse_args()
+
+    lines = load_lines(args)
+    print(f"{len(lines)} Tracks, Toleranz {TRACK_SIMPLIFY_TOLERANCE_M} m")
+
+    started = time.perf_counter()
+    unsimplified(lines)
+    full_sec = time.perf_counter() - started
+
+    started = time.perf_counter()
+    single = per_item(lines)
+    single_sec = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batched_results = batch(lines, args.chunk)
+    batch_sec = time.perf_counter() - started
+
+    mismatches = sum(1 for a, b in zip(single, batched_results) if a != b)
+    vertices_in = sum(len(line.split(",")) for line in lines)
+    vertices_out = sum(r["geo_vertices"] for r in batched_results if r)
+    per_track = lambda sec: sec / max(len(lines), 1) * 1e3
+    print(f"Abweichungen:   {mismatches}")
+    print(f"Vertices:       {vertices_in} -> {vertices_out} ({vertices_out / max(vertices_in, 1):.1%})")
+    print(f"unvereinfacht:  {full_sec:8.3f} s  {per_track(full_sec):8.3f} ms/Track")
+    print(f"pro Item:       {single_sec:8.3f} s  {per_track(single_sec):8.3f} ms/Track")
+    print(f"Batch:          {batch_sec:8.3f} s  {per_track(batch_sec):8.3f} ms/Track")
+    print(f"Speedup:        {single_sec / max(batch_sec, 1e-9):8.1f}x (vs. pro Item)")
+
+
+if __name__ == "__main__":
+    main()
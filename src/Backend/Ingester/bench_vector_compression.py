@@ -0,0 +1,234 @@
+"""
+Benchmark: recall vs. memory of the kNN vector compressions (vector_mapping.py).
+
+    # against OpenSearch, vectors sampled from the live index
+    python bench_vector_compression.py --limit 20000 --modes none,fp16,byte,pq
+
+    # without OpenSearch: quantization error only (brute force), synthetic vectors
+    python bench_vector_compression.py --offline --synthetic 20000 --dim 3072
+
+For every mode a temporary index <prefix>-<mode> is filled with the same
+vectors; recall@k is measured against exact (float32 brute force) neighbours
+of held-out query vectors. Memory is the k-NN sizing estimate for
+--corpus-size vectors plus, online, the graph memory reported by the k-NN
+stats after warmup.
+"""
+import os
+import time
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+from opensearchpy import OpenSearch, RequestsHttpConnection, helpers
+
+from vector_mapping import (
+    VECTOR_PQ_M,
+    bytes_per_vector,
+    estimate_graph_bytes,
+    knn_vector_mapping,
+    quantize_to_byte,
+    train_pq_model,
+)
+
+OPENSEARCH_HOST = os.getenv("OPENSEARCH_HOST", "localhost")
+OPENSEARCH_PORT = int(os.getenv("OPENSEARCH_PORT", "9200"))
+INDEX_NAME = os.getenv("POI_INDEX", "tourism-data-v-working")
+
+
+def load_index_vectors(os_client: OpenSearch, index: str, limit: int) -> np.ndarray:
+    vectors = []
+    for hit in helpers.scan(os_client, index=index, query={"_source": ["embedding"]}, size=500):
+        vector = hit["_source"].get("embedding")
+        if vector:
+            vectors.append(vector)
+        if len(vectors) >= limit:
+            break
+    if not vectors:
+        raise SystemExit(f"Keine Vektoren in '{index}'.")
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def synthetic_vectors(n: int, dim: int, seed: int = 42) -> np.ndarray:
+    # clustered like real POI embeddings (categories), unit length like text-embedding-3
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(n // 200, 8), dim))
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.6 * rng.normal(size=(n, dim))
+    return normalize(vectors.astype(np.float32))
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_neighbours(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    # l2 on unit vectors ranks like cosine
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall(found: List[List[int]], truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t.tolist())) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def simulated(corpus: np.ndarray, mode: str) -> Optional[np.ndarray]:
+    if mode == "none":
+        return corpus
+    if mode == "fp16":
+        return corpus.astype(np.float16).astype(np.float32)
+    if mode == "byte":
+        # queries are quantized as well, see ByteQueryEmbedding
+        return np.asarray([quantize_to_byte(v) for v in corpus], dtype=np.float32)
+    return None  # pq needs a trained faiss model -> online only
+
+
+def run_offline(corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray, modes: List[str], k: int) -> Dict:
+    results = {}
+    for mode in modes:
+        stored = simulated(corpus, mode)
+        if stored is None:
+            print(f"{mode}: nur online messbar, übersprungen")
+            continue
+        q = np.asarray([quantize_to_byte(v) for v in queries], dtype=np.float32) if mode == "byte" else queries
+        started = time.perf_counter()
+        # l2 distance on the stored representation
+        dist = (stored ** 2).sum(axis=1)[None, :] - 2 * q @ stored.T
+        found = np.argsort(dist, axis=1)[:, :k].tolist()
+        results[mode] = {"recall": recall(found, truth), "query_ms": (time.perf_counter() - started) * 1000 / len(q)}
+    return results
+
+
+def index_vectors(os_client: OpenSearch, index: str, corpus: np.ndarray, mode: str, pq_model_id: str):
+    if os_client.indices.exists(index=index):
+        os_client.indices.delete(index=index)
+    mapping = knn_vector_mapping(corpus.shape[1], compression=mode, pq_model_id=pq_model_id)
+    os_client.indices.create(
+        index=index,
+        body={
+            "settings": {"index": {"knn": True, "number_of_replicas": 0, "refresh_interval": "-1"}},
+            "mappings": {"properties": {"embedding": mapping}},
+        },
+    )
+    transform = quantize_to_byte if mode == "byte" else (lambda v: v.tolist())
+    helpers.bulk(
+        os_client,
+        ({"_index": index, "_id": str(i), "embedding": transform(v)} for i, v in enumerate(corpus)),
+        chunk_size=200,
+    )
+    os_client.indices.refresh(index=index)
+    os_client.indices.forcemerge(index=index, max_num_segments=1, request_timeout=1800)
+
+
+def graph_memory_kb(os_client: OpenSearch, index: str) -> Optional[float]:
+    os_client.transport.perform_request("GET", f"/_plugins/_knn/warmup/{index}")
+    stats = os_client.transport.perform_request("GET", "/_plugins/_knn/stats")
+    total = 0.0
+    for node in stats.get("nodes", {}).values():
+        total += node.get("indices_in_cache", {}).get(index, {}).get("graph_memory_usage", 0)
+    return total or None
+
+
+def query_index(os_client: OpenSearch, index: str, queries: np.ndarray, mode: str, k: int):
+    found, started = [], time.perf_counter()
+    for q in queries:
+        vector = quantize_to_byte(q) if mode == "byte" else q.tolist()
+        response = os_client.search(
+            index=index,
+            body={"size": k, "_source": False, "query": {"knn": {"embedding": {"vector": vector, "k": k}}}},
+        )
+        found.append([int(hit["_id"]) for hit in response["hits"]["hits"]])
+    return found, (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def run_online(os_client, corpus, queries, truth, modes, k, prefix, pq_m, keep) -> Dict:
+    results = {}
+    created = []
+    try:
+        for mode in modes:
+            index = f"{prefix}-{mode}"
+            pq_model_id = ""
+            if mode == "pq":
+                # the float index of this run is the training data
+                source = f"{prefix}-none"
+                if source not in created:
+                    index_vectors(os_client, source, corpus, "none", "")
+                    created.append(source)
+                pq_model_id = f"{prefix}-pq-m{pq_m}"
+                try:
+                    os_client.transport.perform_request("DELETE", f"/_plugins/_knn/models/{pq_model_id}")
+                except Exception:
+                    pass
+                train_pq_model(os_client, pq_model_id, source, corpus.shape[1], m=pq_m)
+
+            print(f"{mode}: indexiere {len(corpus)} Vektoren in '{index}'...")
+            index_vectors(os_client, index, corpus, mode, pq_model_id)
+            created.append(index)
+            found, query_ms = query_index(os_client, index, queries, mode, k)
+            results[mode] = {
+                "recall": recall(found, truth),
+                "query_ms": query_ms,
+                "graph_kb": graph_memory_kb(os_client, index),
+            }
+    finally:
+        if not keep:
+            for index in created:
+                os_client.indices.delete(index=index, ignore=[404])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source-index", default=INDEX_NAME)
+    parser.add_argument("--limit", type=int, default=20000, help="vectors taken from the source index")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N generated vectors instead")
+    parser.add_argument("--dim", type=int, default=int(os.getenv("EMBED_DIM", "3072")))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modes", default="none,fp16,byte")
+    parser.add_argument("--pq-m", type=int, default=VECTOR_PQ_M)
+    parser.add_argument("--corpus-size", type=int, default=0, help="POIs/chunks to size memory for (default: sample size)")
+    parser.add_argument("--offline", action="store_true", help="no OpenSearch, simulate quantization only")
+    parser.add_argument("--prefix", default="bench-vectors")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark indices")
+    args = parser.parse_args()
+
+    os_client = None
+    if not args.offline or not args.synthetic:
+        os_client = OpenSearch(
+            hosts=[{"host": OPENSEARCH_HOST, "port": OPENSEARCH_PORT}],
+            use_ssl=False,
+            verify_certs=False,
+            connection_class=RequestsHttpConnection,
+            timeout=120,
+        )
+
+    vectors = synthetic_vectors(args.synthetic, args.dim) if args.synthetic else normalize(
+        load_index_vectors(os_client, args.source_index, args.limit + args.queries)
+    )
+    # held-out, slightly perturbed queries so no query is its own neighbour
+    rng = np.random.default_rng(7)
+    queries = normalize(vectors[: args.queries] + 0.05 * rng.normal(size=vectors[: args.queries].shape))
+    corpus = vectors[args.queries:]
+    truth = exact_neighbours(corpus, queries, args.k)
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+
+    if args.offline:
+        results = run_offline(corpus, queries, truth, modes, args.k)
+    else:
+        results = run_online(os_client, corpus, queries, truth, modes, args.k, args.prefix, args.pq_m, args.keep)
+
+    dim = corpus.shape[1]
+    corpus_size = args.corpus_size or len(corpus)
+    print(f"\n{len(corpus)} Vektoren, dim={dim}, {len(queries)} Queries, recall@{args.k}; Speicher für {corpus_size} Vektoren")
+    print(f"{'mode':<6} {'B/vec':>7} {'geschätzt':>11} {'gemessen':>11} {'recall':>8} {'ms/query':>9}")
+    for mode, r in results.items():
+        estimate = estimate_graph_bytes(corpus_size, dim, mode, pq_m=args.pq_m) / 2 ** 20
+        measured = f"{r['graph_kb'] / 1024:.1f} MB" if r.get("graph_kb") else "-"
+        print(
+            f"{mode:<6} {bytes_per_vector(dim, mode, args.pq_m):>7} {estimate:>8.1f} MB {measured:>11} "
+            f"{r['recall']:>8.3f} {r['query_ms']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
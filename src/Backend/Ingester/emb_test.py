@@ -1,5 +1,6 @@
 import os
 import logging
+from datetime import datetime
 from opensearchpy import OpenSearch, RequestsHttpConnection
 
 # LlamaIndex Imports
@@ -9,6 +10,13 @@ from llama_index.core.vector_stores import MetadataFilters, MetadataFilter
 from llama_index.embeddings.azure_openai import AzureOpenAIEmbedding
 from llama_index.vector_stores.opensearch import OpensearchVectorStore, OpensearchVectorClient
 
+from embedding_cache import with_embedding_cache
+from query_cache import with_query_cache
+from matryoshka import FULL_VECTOR_FIELD, RescoringRetriever, search_dim
+from event_dates import event_window_filters
+from opening_hours import is_open_at, open_at_filter
+from vector_mapping import vector_transform, with_query_quantization
+
 # --- Configuration ---
 OPENSEARCH_HOST = os.getenv("OPENSEARCH_HOST", "localhost")
 OPENSEARCH_PORT = int(os.getenv("OPENSEARCH_PORT", "9200"))
@@ -22,6 +30,8 @@ AZURE_API_VERSION = os.getenv("AZURE_API_VERSION", "")
 
 # text-embedding-3-large uses 3072 dimensions
 EMBED_DIM = int(os.getenv("EMBED_DIM", "3072"))
+# Gekürztes Suchfeld + Rescoring mit dem Vollvektor (wie beim Ingest gesetzt)
+SEARCH_DIM = search_dim(EMBED_DIM)
 
 logging.basicConfig(level=logging.ERROR)
 
@@ -34,7 +44,10 @@ embed_model = AzureOpenAIEmbedding(
     azure_endpoint=AZURE_OPENAI_ENDPOINT,
     api_version=AZURE_API_VERSION,
 )
-Settings.embed_model = embed_model
+# Query-Embeddings: In-Memory-LRU (normalisierter Text) vor dem SQLite-Cache
+cached_embed_model = with_query_cache(with_embedding_cache(embed_model, EMBED_DIM))
+# byte-Index: Query-Vektoren wie beim Schreiben auf int8 skalieren
+Settings.embed_model = with_query_quantization(cached_embed_model)
 Settings.llm = None 
 
 # --- 2. Connect to OpenSearch ---
@@ -50,9 +63,10 @@ os_client = OpenSearch(
 client_wrapper = OpensearchVectorClient(
     endpoint=f"http://{OPENSEARCH_HOST}:{OPENSEARCH_PORT}",
     index=INDEX_NAME,
-    dim=EMBED_DIM,
+    dim=SEARCH_DIM,
     embedding_field="embedding",
     text_field="description",
+    excluded_source_fields=["embedding", FULL_VECTOR_FIELD],
     os_client=os_client
 )
 
@@ -60,20 +74,40 @@ vector_store = OpensearchVectorStore(client_wrapper)
 index = VectorStoreIndex.from_vector_store(vector_store=vector_store)
 
 # --- 3. Retrieval Function ---
-def test_query(query_str, city_filter=None, top_k=3):
-    print(f"\n🔎 TEST QUERY: '{query_str}' | 🌍 FILTER: {city_filter if city_filter else 'None'}")
+def test_query(query_str, city_filter=None, top_k=3, open_at=None, events_between=None):
+    print(f"\n🔎 TEST QUERY: '{query_str}' | 🌍 FILTER: {city_filter if city_filter else 'None'}"
+          + (f" | 🕒 GEÖFFNET: {open_at:%a %H:%M}" if open_at else "")
+          + (f" | 📅 EVENTS: {events_between[0]} – {events_between[1]}" if events_between else ""))
     print("=" * 60)
     
-    filters = None
+    # Filter landen im kNN-Query (efficient filtering), nicht als Post-Filter
+    conditions = []
     if city_filter:
-        filters = MetadataFilters(
-            filters=[MetadataFilter(key="city", value=city_filter)]
-        )
+        conditions.append(MetadataFilter(key="city", value=city_filter))
+    if open_at:
+        # Term auf open_minutes (integer_range): trifft jede Range, die den Zeitpunkt enthält
+        conditions.append(open_at_filter(open_at))
+    if events_between:
+        # (start, end): Events, deren date_range das Fenster schneidet; vergangene fallen raus
+        conditions.append(event_window_filters(*events_between))
+    filters = MetadataFilters(filters=conditions) if conditions else None
     
-    retriever = index.as_retriever(
-        similarity_top_k=top_k,
-        filters=filters 
-    )
+    if SEARCH_DIM < EMBED_DIM:
+        retriever = RescoringRetriever(
+            vector_store,
+            os_client,
+            INDEX_NAME,
+            embed_model=cached_embed_model,
+            dim=SEARCH_DIM,
+            similarity_top_k=top_k,
+            filters=filters,
+            query_transform=vector_transform(),
+        )
+    else:
+        retriever = index.as_retriever(
+            similarity_top_k=top_k,
+            filters=filters 
+        )
     
     nodes = retriever.retrieve(query_str)
     
@@ -85,6 +119,10 @@ def test_query(query_str, city_filter=None, top_k=3):
         meta = node.metadata
         print(f"{i}. [Score: {node.score:.4f}] {meta.get('name', 'Unknown')}")
         print(f"   📍 {meta.get('city', 'Unknown City')} ({meta.get('type', 'Unknown')})")
+        if open_at:
+            print(f"   🕒 geöffnet: {is_open_at(meta, open_at)}")
+        if events_between:
+            print(f"   📅 {meta.get('startDate', '?')} – {meta.get('endDate', '?')}")
         print(f"   📄 Content: {node.get_content()[:100]}...") 
         print("-" * 30)
 
@@ -99,4 +137,10 @@ if __name__ == "__main__":
     # Test 3: No Filter
     test_query("Schwimmbad und Sauna in Kempten")
 
-    test_query("Quad und Wasseraktivität in Allgäu")
\ No newline at end of file
+    test_query("Quad und Wasseraktivität in Allgäu")
+
+    # Test 4: Nur was Sonntag 15:00 geöffnet hat
+    test_query("Museum", open_at=datetime(2025, 6, 15, 15, 0))
+
+    # Test 5: Events an einem Wochenende
+    test_query("Konzert", events_between=("2025-06-14", "2025-06-15"))
\ No newline at end of file
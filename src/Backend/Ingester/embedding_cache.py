@@ -0,0 +1,242 @@
+import os
+import time
+import sqlite3
+import hashlib
+import argparse
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from pydantic import PrivateAttr
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+
+logger = logging.getLogger(__name__)
+
+# --- Persistent embedding cache ---
+# SQLite file keyed by (model, dimension, kind, sha256 of the exact embed text);
+# vectors are stored as float16 and misses are returned rounded the same way,
+# so a text gets the same vector from the model and from the cache. A reindex into a new index name or with new
+# mappings reuses every embedding whose text did not change.
+# Empty EMBED_CACHE_PATH disables the cache.
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "./embedding-cache.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    text_hash BLOB NOT NULL,
+    vector BLOB NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (model, dim, kind, text_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+# SQLite limits the number of host parameters per statement
+LOOKUP_CHUNK = 500
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def encode_vector(vector: Sequence[float]) -> bytes:
+    return np.asarray(vector, dtype=np.float16).tobytes()
+
+
+def decode_vector(blob: bytes) -> List[float]:
+    return np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+
+
+def round_vector(vector: Sequence[float]) -> List[float]:
+    """The vector as it comes back from the cache."""
+    return np.asarray(vector, dtype=np.float16).astype(np.float32).tolist()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str = EMBED_CACHE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # the pipeline embeds on one thread, but queries may come from others
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get_many(self, model: str, dim: int, kind: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        hashes = [text_hash(t) for t in texts]
+        found: Dict[bytes, bytes] = {}
+        with self._lock:
+            for start in range(0, len(hashes), LOOKUP_CHUNK):
+                chunk = hashes[start:start + LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT text_hash, vector FROM embeddings WHERE model = ? AND dim = ? AND kind = ? "
+                    f"AND text_hash IN ({','.join('?' * len(chunk))})",
+                    (model, dim, kind, *chunk),
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = int(time.time())
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND dim = ? AND kind = ? AND text_hash = ?",
+                    [(now, model, dim, kind, h) for h in found],
+                )
+                self._conn.commit()
+        return [decode_vector(found[h]) if h in found else None for h in hashes]
+
+    def put_many(self, model: str, dim: int, kind: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        now = int(time.time())
+        rows = [(model, dim, kind, text_hash(t), encode_vector(v), now) for t, v in zip(texts, vectors)]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, dim, kind, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT model, dim, kind, COUNT(*), SUM(LENGTH(vector)) FROM embeddings GROUP BY model, dim, kind"
+            ).fetchall()
+        return [
+            {"model": model, "dim": dim, "kind": kind, "entries": count, "vector_bytes": size}
+            for model, dim, kind, count, size in rows
+        ]
+
+    def compact(
+        self,
+        older_than_days: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        model: Optional[str] = None,
+    ) -> int:
+        """Evicts entries unused for `older_than_days`, then the least recently used beyond `max_entries`."""
+        deleted = 0
+        with self._lock:
+            if model is not None:
+                deleted += self._conn.execute("DELETE FROM embeddings WHERE model = ?", (model,)).rowcount
+            if older_than_days is not None:
+                cutoff = int(time.time() - older_than_days * 86400)
+                deleted += self._conn.execute("DELETE FROM embeddings WHERE last_used < ?", (cutoff,)).rowcount
+            if max_entries is not None:
+                deleted += self._conn.execute(
+                    "DELETE FROM embeddings WHERE (model, dim, kind, text_hash) IN ("
+                    "SELECT model, dim, kind, text_hash FROM embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (max_entries,),
+                ).rowcount
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+        return deleted
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Wraps any LlamaIndex embedding model; texts and queries already in the
+    cache are answered from disk, only misses reach the wrapped model.
+    """
+
+    dim: int = 0
+    _inner: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+    _hits: int = PrivateAttr(default=0)
+    _misses: int = PrivateAttr(default=0)
+    _counter_lock: threading.Lock = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, cache: EmbeddingCache, dim: int, **kwargs: Any):
+        super().__init__(
+            model_name=inner.model_name,
+            embed_batch_size=inner.embed_batch_size,
+            dim=dim,
+            **kwargs,
+        )
+        self._inner = inner
+        self._cache = cache
+        # the embedding stage calls from several threads
+        self._counter_lock = threading.Lock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def inner(self) -> BaseEmbedding:
+        return self._inner
+
+    @property
+    def hit_rate(self) -> Dict[str, Any]:
+        with self._counter_lock:
+            hits, misses = self._hits, self._misses
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "rate": round(hits / total, 3) if total else 0.0}
+
+    def _lookup(self, kind: str, texts: List[str], embed) -> List[Embedding]:
+        vectors = self._cache.get_many(self.model_name, self.dim, kind, texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        with self._counter_lock:
+            self._hits += len(texts) - len(missing)
+            self._misses += len(missing)
+
+        if missing:
+            fresh = [round_vector(v) for v in embed([texts[i] for i in missing])]
+            self._cache.put_many(self.model_name, self.dim, kind, [texts[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+        return vectors
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._lookup("text", texts, self._inner.get_text_embedding_batch)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        # queries may get a model-specific instruction prefix, so they are cached separately
+        return self._lookup("query", [query], lambda qs: [self._inner.get_query_embedding(q) for q in qs])[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return self._get_query_embedding(query)
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embedding(text)
+
+
+def with_embedding_cache(embed_model: BaseEmbedding, dim: int, path: str = EMBED_CACHE_PATH) -> BaseEmbedding:
+    if not path:
+        return embed_model
+    logger.info(f"Embedding-Cache aktiv: {path}")
+    return CachedEmbedding(embed_model, EmbeddingCache(path), dim=dim)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or compact the embedding cache")
+    parser.add_argument("--path", default=EMBED_CACHE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats")
+    compact = sub.add_parser("compact", help="evict entries and VACUUM the file")
+    compact.add_argument("--older-than-days", type=float)
+    compact.add_argument("--max-entries", type=int)
+    compact.add_argument("--model", help="drop every entry of this model")
+    args = parser.parse_args()
+
+    cache = EmbeddingCache(args.path)
+    if args.command == "compact":
+        deleted = cache.compact(args.older_than_days, args.max_entries, args.model)
+        print(f"{deleted} Einträge entfernt.")
+    for row in cache.stats():
+        print(f"{row['model']} dim={row['dim']} {row['kind']}: {row['entries']} Einträge, {row['vector_bytes']} Bytes")
+    print(f"Datei: {os.path.getsize(args.path)} Bytes")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
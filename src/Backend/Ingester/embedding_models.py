@@ -0,0 +1,62 @@
+import os
+import logging
+from typing import Any
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+logger = logging.getLogger(__name__)
+
+# --- Embedding models ---
+# Ingest and search must embed with the same model, otherwise query vectors
+# and indexed vectors live in different spaces (or have different lengths).
+#   azure        Azure OpenAI text-embedding-3-large (AZURE_* settings), 3072 dims,
+#                ingested by ingestor_v2.py
+#   huggingface  local sentence-transformers/EMBEDDING_MODEL_NAME, 384 dims,
+#                ingested by ingest_with_llamaindex.py
+# The search service picks the model with EMBEDDING_PROVIDER; EMBED_DIM
+# defaults to the vector length of the chosen provider.
+EMBEDDING_PROVIDERS = ("azure", "huggingface")
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "azure")
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "paraphrase-multilingual-MiniLM-L12-v2")
+AZURE_EMBEDDING_MODEL = "text-embedding-3-large"
+DEFAULT_EMBED_DIMS = {"azure": 3072, "huggingface": 384}
+
+AZURE_OPENAI_KEY = os.getenv("AZURE_OPENAI_KEY", "")
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT", "")
+AZURE_DEPLOYMENT_NAME = os.getenv("AZURE_DEPLOYMENT_NAME", "")
+AZURE_API_VERSION = os.getenv("AZURE_API_VERSION", "")
+
+
+def check_provider(provider: str) -> str:
+    if provider not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER '{provider}', expected one of {EMBEDDING_PROVIDERS}")
+    return provider
+
+
+def embed_dim(provider: str = EMBEDDING_PROVIDER) -> int:
+    """EMBED_DIM, or the vector length of the provider's model."""
+    return int(os.getenv("EMBED_DIM", str(DEFAULT_EMBED_DIMS[check_provider(provider)])))
+
+
+def load_embedding(provider: str = EMBEDDING_PROVIDER, **kwargs: Any) -> BaseEmbedding:
+    """
+    The raw model of the provider (kwargs go to its constructor). Imported
+    here, not at module level: only the chosen provider's package is needed.
+    """
+    if check_provider(provider) == "azure":
+        from llama_index.embeddings.azure_openai import AzureOpenAIEmbedding
+
+        logger.info(f"Lade Azure OpenAI Embedding Modell: {AZURE_DEPLOYMENT_NAME}...")
+        return AzureOpenAIEmbedding(
+            model=AZURE_EMBEDDING_MODEL,
+            deployment_name=AZURE_DEPLOYMENT_NAME,
+            api_key=AZURE_OPENAI_KEY,
+            azure_endpoint=AZURE_OPENAI_ENDPOINT,
+            api_version=AZURE_API_VERSION,
+            **kwargs,
+        )
+
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    logger.info(f"Lade Embedding Modell: {EMBEDDING_MODEL_NAME}...")
+    return HuggingFaceEmbedding(model_name=f"sentence-transformers/{EMBEDDING_MODEL_NAME}", **kwargs)
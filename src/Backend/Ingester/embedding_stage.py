@@ -0,0 +1,249 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from pydantic import PrivateAttr
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+
+logger = logging.getLogger(__name__)
+
+# --- Embedding stage ---
+# Splits the texts of one pipeline batch into embedding requests and runs up
+# to EMBED_MAX_IN_FLIGHT of them in parallel. The request size adapts (AIMD):
+# it grows while requests succeed within EMBED_TARGET_BATCH_SEC, shrinks when
+# they are slow and halves on throttling (429). Throttled and transient
+# failures are retried with exponential backoff, honouring Retry-After.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_MIN_BATCH = int(os.getenv("EMBED_MIN_BATCH", "8"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "256"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_TARGET_BATCH_SEC = float(os.getenv("EMBED_TARGET_BATCH_SEC", "10"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+EMBED_BACKOFF_BASE_SEC = float(os.getenv("EMBED_BACKOFF_BASE_SEC", "1"))
+EMBED_BACKOFF_MAX_SEC = float(os.getenv("EMBED_BACKOFF_MAX_SEC", "60"))
+
+THROTTLE_STATUS = {429}
+TRANSIENT_STATUS = {408, 500, 502, 503, 504}
+
+
+class EmbeddingThrottled(Exception):
+    """Raised by backends (or the stand-in below) when the request was rate limited."""
+
+    def __init__(self, message: str = "rate limited", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = 429
+        self.retry_after = retry_after
+
+
+def classify_error(exc: Exception) -> Tuple[Optional[str], Optional[float]]:
+    """-> ("throttled" | "transient" | None, retry_after seconds)"""
+    status = getattr(exc, "status_code", None)
+    retry_after = getattr(exc, "retry_after", None)
+    response = getattr(exc, "response", None)
+    if retry_after is None and response is not None:
+        try:
+            retry_after = float(response.headers.get("retry-after"))
+        except (AttributeError, TypeError, ValueError):
+            retry_after = None
+
+    if status in THROTTLE_STATUS:
+        return "throttled", retry_after
+    if status in TRANSIENT_STATUS or isinstance(exc, (TimeoutError, ConnectionError)):
+        return "transient", retry_after
+    # openai.APIConnectionError / APITimeoutError carry no status code
+    if type(exc).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return "transient", retry_after
+    return None, None
+
+
+class EmbeddingStage:
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        batch_size: int = EMBED_BATCH_SIZE,
+        min_batch: int = EMBED_MIN_BATCH,
+        max_batch: int = EMBED_MAX_BATCH,
+        max_in_flight: int = EMBED_MAX_IN_FLIGHT,
+        target_batch_sec: float = EMBED_TARGET_BATCH_SEC,
+        max_retries: int = EMBED_MAX_RETRIES,
+        backoff_base_sec: float = EMBED_BACKOFF_BASE_SEC,
+        backoff_max_sec: float = EMBED_BACKOFF_MAX_SEC,
+        on_metrics: Optional[Callable[[Dict[str, Any]], None]] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.embed_model = embed_model
+        self.min_batch = max(min_batch, 1)
+        self.max_batch = max(max_batch, self.min_batch)
+        self.batch_size = min(max(batch_size, self.min_batch), self.max_batch)
+        self.max_in_flight = max(max_in_flight, 1)
+        self.target_batch_sec = target_batch_sec
+        self.max_retries = max_retries
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.on_metrics = on_metrics
+        self.sleep = sleep
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self.totals = {"requests": 0, "texts": 0, "seconds": 0.0, "throttled": 0, "retries": 0}
+
+    # --- adaptive batch size ---
+
+    def _adapt(self, seconds: float, throttled: bool):
+        with self._lock:
+            if throttled:
+                self.batch_size = max(self.min_batch, self.batch_size // 2)
+            elif seconds > self.target_batch_sec:
+                self.batch_size = max(self.min_batch, int(self.batch_size * 0.75))
+            else:
+                self.batch_size = min(self.max_batch, self.batch_size + max(self.batch_size // 4, 1))
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max_sec)
+        delay = min(self.backoff_base_sec * (2 ** attempt), self.backoff_max_sec)
+        return delay * random.uniform(0.5, 1.0)
+
+    # --- one request ---
+
+    def _embed_request(self, request_no: int, texts: List[str]) -> List[Embedding]:
+        started = time.perf_counter()
+        throttled = 0
+        attempt = 0
+        while True:
+            attempt_started = time.perf_counter()
+            try:
+                vectors = self.embed_model.get_text_embedding_batch(texts)
+                break
+            except Exception as e:
+                kind, retry_after = classify_error(e)
+                if kind is None or attempt >= self.max_retries:
+                    raise
+                if kind == "throttled":
+                    throttled += 1
+                    self._adapt(time.perf_counter() - attempt_started, throttled=True)
+                delay = self._backoff(attempt, retry_after)
+                logger.warning(f"Embedding-Request {request_no} ({len(texts)} Texte) {kind}, neuer Versuch in {delay:.1f}s")
+                self.sleep(delay)
+                attempt += 1
+
+        request_sec = time.perf_counter() - attempt_started
+        self._adapt(request_sec, throttled=False)
+
+        metrics = {
+            "request": request_no,
+            "texts": len(texts),
+            "seconds": round(time.perf_counter() - started, 3),
+            "request_seconds": round(request_sec, 3),
+            "retries": attempt,
+            "throttled": throttled,
+            "texts_per_sec": round(len(texts) / request_sec, 1) if request_sec > 0 else None,
+            "next_batch_size": self.batch_size,
+        }
+        with self._lock:
+            self.totals["requests"] += 1
+            self.totals["texts"] += len(texts)
+            self.totals["seconds"] += request_sec
+            self.totals["throttled"] += throttled
+            self.totals["retries"] += attempt
+        logger.info(f"Embedding-Batch: {metrics}")
+        if self.on_metrics is not None:
+            self.on_metrics(metrics)
+        return vectors
+
+    # --- public ---
+
+    def embed(self, texts: Sequence[str]) -> List[Embedding]:
+        """Embeds `texts` in adaptive requests, at most `max_in_flight` at a time; keeps input order."""
+        texts = list(texts)
+        results: List[Optional[List[Embedding]]] = []
+        pending: Deque[Tuple[int, Future]] = deque()
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="embed") as executor:
+            cursor = 0
+            while cursor < len(texts) or pending:
+                # backpressure: new requests only when a slot is free
+                if cursor < len(texts) and len(pending) < self.max_in_flight:
+                    size = self.batch_size
+                    chunk = texts[cursor:cursor + size]
+                    self._requests += 1
+                    results.append(None)
+                    pending.append((len(results) - 1, executor.submit(self._embed_request, self._requests, chunk)))
+                    cursor += len(chunk)
+                    continue
+
+                slot, future = pending.popleft()
+                results[slot] = future.result()
+
+        return [vector for chunk in results for vector in chunk]
+
+    def summary(self) -> Dict[str, Any]:
+        totals = dict(self.totals)
+        totals["seconds"] = round(totals["seconds"], 2)
+        totals["batch_size"] = self.batch_size
+        return totals
+
+
+class RateLimitedStandIn(BaseEmbedding):
+    """
+    Local stand-in for the embedding backend: deterministic vectors, optional
+    latency and a requests-per-second budget like an Azure deployment quota.
+    Exceeding the budget raises EmbeddingThrottled with a Retry-After.
+    """
+
+    dim: int = 8
+    requests_per_sec: float = 5.0
+    latency_sec: float = 0.0
+    calls: int = 0
+    throttled: int = 0
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _tokens: float = PrivateAttr(default=0.0)
+    _updated: float = PrivateAttr(default=0.0)
+
+    def __init__(self, **kwargs: Any):
+        kwargs.setdefault("model_name", "rate-limited-stand-in")
+        # one backend call per stage request
+        kwargs.setdefault("embed_batch_size", 2048)
+        super().__init__(**kwargs)
+        self._tokens = self.requests_per_sec
+        self._updated = time.monotonic()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "RateLimitedStandIn"
+
+    def _admit(self):
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            self._tokens = min(self.requests_per_sec, self._tokens + (now - self._updated) * self.requests_per_sec)
+            self._updated = now
+            if self._tokens < 1:
+                self.throttled += 1
+                raise EmbeddingThrottled("too many requests", retry_after=(1 - self._tokens) / self.requests_per_sec)
+            self._tokens -= 1
+        if self.latency_sec:
+            time.sleep(self.latency_sec)
+
+    def _vector(self, text: str) -> Embedding:
+        seed = sum(text.encode("utf-8")) or 1
+        return [((seed * (i + 1)) % 97) / 97.0 for i in range(self.dim)]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        self._admit()
+        return [self._vector(t) for t in texts]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._get_text_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return self._get_query_embedding(query)
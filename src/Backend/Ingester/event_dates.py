@@ -0,0 +1,215 @@
+import os
+import time
+import logging
+import argparse
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Any, Dict, Optional
+from zoneinfo import ZoneInfo
+
+from opensearchpy import OpenSearch, RequestsHttpConnection
+from llama_index.core.vector_stores import FilterCondition, FilterOperator, MetadataFilter, MetadataFilters
+
+logger = logging.getLogger(__name__)
+
+# --- Event dates ---
+# Events (list_current_events) carry startDate/endDate. Besides the original
+# strings they get metadata.event_dates, a date_range [gte, lte]. A range
+# query on a range field matches by intersection, so "events between A and B"
+# is two range conditions (starts <= B, ends >= A) that OpenSearch applies
+# inside the kNN query. Date-only values cover the whole day, naive times are
+# local (EVENT_TZ), a missing end means a single-day event.
+#
+# Expiry: `python event_dates.py` deletes (EVENT_EXPIRY_MODE=delete) or moves
+# to EVENT_ARCHIVE_INDEX (archive) every event that ended more than
+# EVENT_EXPIRY_GRACE_HOURS ago. EVENT_EXPIRY_INTERVAL_HOURS > 0 repeats the
+# run (the event-expiry service in docker-compose). Expired events that are
+# still in the source come back with the next ingest and go again with the
+# next run; list_current_events normally drops them itself.
+EVENT_TZ = ZoneInfo(os.getenv("EVENT_TZ", "Europe/Berlin"))
+EVENT_EXPIRY_MODE = os.getenv("EVENT_EXPIRY_MODE", "delete")
+# not <POI_ALIAS>-*: that pattern belongs to the index versions (and gets pruned)
+EVENT_ARCHIVE_INDEX = os.getenv("EVENT_ARCHIVE_INDEX", "tourism-events-archive")
+EVENT_EXPIRY_GRACE_HOURS = float(os.getenv("EVENT_EXPIRY_GRACE_HOURS", "6"))
+EVENT_EXPIRY_INTERVAL_HOURS = float(os.getenv("EVENT_EXPIRY_INTERVAL_HOURS", "0"))
+
+EVENT_METADATA_KEYS = ["event_dates"]
+EVENT_DATES_FIELD = "metadata.event_dates"
+
+
+def parse_event_date(value: Any, end: bool = False) -> Optional[datetime]:
+    """ISO date or datetime -> aware datetime; a plain date is its first (or with end=True last) second."""
+    if not value:
+        return None
+    text = str(value).strip()
+    try:
+        if len(text) == 10:
+            day = date.fromisoformat(text)
+            parsed = datetime.combine(day, dtime(23, 59, 59) if end else dtime.min)
+        else:
+            parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=EVENT_TZ)
+
+
+def _iso(value: datetime) -> str:
+    return value.isoformat(timespec="seconds")
+
+
+def event_date_metadata(start_date: Any, end_date: Any) -> Dict[str, Any]:
+    """{"event_dates": {"gte", "lte"}} for an event; empty if neither date parses."""
+    start = parse_event_date(start_date)
+    end = parse_event_date(end_date, end=True)
+    if start is None and end is None:
+        return {}
+    if start is None:
+        start = end
+    if end is None:
+        # single-day event: until the end of its (local) day
+        end = datetime.combine(start.astimezone(EVENT_TZ).date(), dtime(23, 59, 59), tzinfo=EVENT_TZ)
+    if end < start:
+        end = start
+    return {"event_dates": {"gte": _iso(start), "lte": _iso(end)}}
+
+
+def event_date_mappings() -> Dict[str, Any]:
+    return {"event_dates": {"type": "date_range", "format": "strict_date_optional_time||epoch_millis"}}
+
+
+# --- query side ---
+
+def _as_datetime(value: Any, end: bool = False) -> datetime:
+    parsed = value if isinstance(value, datetime) else parse_event_date(value, end=end)
+    if parsed is None:
+        raise ValueError(f"Kein Datum: {value!r}")
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=EVENT_TZ)
+
+
+def event_window_filters(
+    start: Any = None, end: Any = None, include_undated: bool = False
+) -> Optional[MetadataFilters]:
+    """
+    Events taking place (at least partly) between `start` and `end`; either
+    bound may be open. include_undated=True keeps documents without
+    event_dates (POIs), for searches over events and POIs together.
+    """
+    conditions = []
+    if start is not None:
+        # date_range + range query = intersects: the event ends after `start`
+        conditions.append(MetadataFilter(key="event_dates", value=_iso(_as_datetime(start)), operator=FilterOperator.GTE))
+    if end is not None:
+        # ... and starts before `end` (a plain date includes that whole day)
+        conditions.append(MetadataFilter(key="event_dates", value=_iso(_as_datetime(end, end=True)), operator=FilterOperator.LTE))
+    if not conditions:
+        return None
+    window = MetadataFilters(filters=conditions)
+    if not include_undated:
+        return window
+    return MetadataFilters(
+        filters=[window, MetadataFilter(key="event_dates", value=None, operator=FilterOperator.IS_EMPTY)],
+        condition=FilterCondition.OR,
+    )
+
+
+def expired_events_query(cutoff: datetime) -> Dict[str, Any]:
+    """Events whose whole date range lies before `cutoff`."""
+    return {"range": {EVENT_DATES_FIELD: {"lt": _iso(cutoff), "relation": "within"}}}
+
+
+# --- expiry job ---
+
+class EventExpiry:
+    def __init__(
+        self,
+        os_client: OpenSearch,
+        index: str,
+        mode: str = EVENT_EXPIRY_MODE,
+        archive_index: str = EVENT_ARCHIVE_INDEX,
+        grace_hours: float = EVENT_EXPIRY_GRACE_HOURS,
+    ):
+        if mode not in ("delete", "archive"):
+            raise ValueError(f"EVENT_EXPIRY_MODE muss 'delete' oder 'archive' sein, nicht '{mode}'")
+        self.os_client = os_client
+        self.index = index
+        self.mode = mode
+        self.archive_index = archive_index
+        self.grace = timedelta(hours=grace_hours)
+
+    def cutoff(self, now: Optional[datetime] = None) -> datetime:
+        return (now or datetime.now(EVENT_TZ)) - self.grace
+
+    def ensure_archive(self):
+        """Creates the archive index with the mappings of the live one (vectors included)."""
+        if self.os_client.indices.exists(index=self.archive_index):
+            return
+        mappings = next(iter(self.os_client.indices.get_mapping(index=self.index).values()))["mappings"]
+        self.os_client.indices.create(
+            index=self.archive_index, body={"settings": {"index": {"knn": True}}, "mappings": mappings}
+        )
+        logger.info(f"Archiv-Index '{self.archive_index}' erstellt.")
+
+    def run(self, now: Optional[datetime] = None, dry_run: bool = False) -> Dict[str, Any]:
+        cutoff = self.cutoff(now)
+        query = expired_events_query(cutoff)
+        expired = self.os_client.count(index=self.index, body={"query": query})["count"]
+        stats = {"cutoff": _iso(cutoff), "expired": expired, "archived": 0, "deleted": 0}
+        if dry_run or not expired:
+            return stats
+
+        if self.mode == "archive":
+            self.ensure_archive()
+            response = self.os_client.reindex(
+                body={"source": {"index": self.index, "query": query}, "dest": {"index": self.archive_index}},
+                refresh=True,
+                request_timeout=3600,
+            )
+            stats["archived"] = response.get("created", 0) + response.get("updated", 0)
+            if response.get("failures"):
+                # nothing is deleted that did not make it into the archive
+                logger.error(f"Archivieren fehlgeschlagen, nichts gelöscht: {response['failures'][:3]}")
+                return stats
+
+        response = self.os_client.delete_by_query(
+            index=self.index, body={"query": query}, refresh=True, conflicts="proceed", request_timeout=3600
+        )
+        stats["deleted"] = response.get("deleted", 0)
+        logger.info(
+            f"Abgelaufene Events (Ende vor {stats['cutoff']}): {stats['deleted']} gelöscht"
+            + (f", {stats['archived']} archiviert in '{self.archive_index}'" if self.mode == "archive" else "")
+        )
+        return stats
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Delete or archive events that are over")
+    parser.add_argument("--index", default=os.getenv("POI_INDEX", "tourism-data"))
+    parser.add_argument("--mode", choices=["delete", "archive"], default=EVENT_EXPIRY_MODE)
+    parser.add_argument("--archive-index", default=EVENT_ARCHIVE_INDEX)
+    parser.add_argument("--grace-hours", type=float, default=EVENT_EXPIRY_GRACE_HOURS)
+    parser.add_argument("--every-hours", type=float, default=EVENT_EXPIRY_INTERVAL_HOURS, help="0 = run once")
+    parser.add_argument("--dry-run", action="store_true", help="only count expired events")
+    args = parser.parse_args()
+
+    os_client = OpenSearch(
+        hosts=[{"host": os.getenv("OPENSEARCH_HOST", "localhost"), "port": int(os.getenv("OPENSEARCH_PORT", "9200"))}],
+        use_ssl=False,
+        verify_certs=False,
+        connection_class=RequestsHttpConnection,
+    )
+    expiry = EventExpiry(os_client, args.index, mode=args.mode, archive_index=args.archive_index, grace_hours=args.grace_hours)
+
+    while True:
+        try:
+            print(expiry.run(dry_run=args.dry_run))
+        except Exception as e:
+            if args.every_hours <= 0:
+                raise
+            logger.error(f"Event-Expiry fehlgeschlagen: {e}")
+        if args.every_hours <= 0:
+            break
+        time.sleep(args.every_hours * 3600)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+import os
+import gzip
+import json
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely import wkt
+from shapely.geometry import mapping as shape_mapping
+from shapely.geometry import shape as geojson_shape
+
+logger = logging.getLogger(__name__)
+
+# --- Track geometry ---
+# Tracks (hiking/bike trails) come with a full-resolution `geo.line` WKT,
+# often thousands of vertices. At ingest the line is simplified with
+# Douglas-Peucker at TRACK_SIMPLIFY_TOLERANCE_M metres (0 = keep every vertex)
+# and bounding box, length and centroid are stored next to it, so most geo
+# queries never touch the line itself. With TRACK_GEOMETRY_STORE set, the
+# full-resolution line is written there as gzipped GeoJSON (one file per
+# source_id) and only fetched on demand (load_full_geometry).
+TRACK_SIMPLIFY_TOLERANCE_M = float(os.getenv("TRACK_SIMPLIFY_TOLERANCE_M", "5") or 0)
+TRACK_GEOMETRY_STORE = os.getenv("TRACK_GEOMETRY_STORE", "")
+
+EARTH_RADIUS_M = 6371008.8
+
+LINESTRING = 1
+MULTILINESTRING = 5
+
+# metadata keys written by track_metadata; none of them is useful to embed or for the LLM
+GEOMETRY_METADATA_KEYS = [
+    "geo_line",
+    "geo_bbox",
+    "geo_centroid",
+    "geo_length_m",
+    "geo_vertices",
+    "geo_line_full",
+]
+
+
+def parse_track_wkt(wkt_string: str):
+    # the source labels 3D lines "MULTILINESTRING Z", the coordinates keep their elevation either way
+    return wkt.loads(wkt_string.replace("MULTILINESTRING Z", "MULTILINESTRING"))
+
+
+# --- metric helpers ---
+# Local equirectangular projection around each line's mean latitude (lat0 is a
+# scalar or one value per coordinate row): accurate to well below a metre over
+# the extent of a single trail, which is all Douglas-Peucker needs.
+
+def _to_metres(coords: np.ndarray, lat0) -> np.ndarray:
+    out = coords.copy()
+    out[:, 0] = np.radians(coords[:, 0]) * EARTH_RADIUS_M * np.cos(np.radians(lat0))
+    out[:, 1] = np.radians(coords[:, 1]) * EARTH_RADIUS_M
+    return out
+
+
+def _to_degrees(coords: np.ndarray, lat0) -> np.ndarray:
+    out = coords.copy()
+    out[:, 0] = np.degrees(coords[:, 0] / (EARTH_RADIUS_M * np.cos(np.radians(lat0))))
+    out[:, 1] = np.degrees(coords[:, 1] / EARTH_RADIUS_M)
+    # 7 decimals ~ 1 cm: undoes the round-trip error and keeps _source small
+    out[:, :2] = np.round(out[:, :2], 7)
+    return out
+
+
+def _mean_lat(coords: np.ndarray, index: np.ndarray, n: int) -> np.ndarray:
+    counts = np.bincount(index, minlength=n)
+    return np.bincount(index, weights=coords[:, 1], minlength=n) / np.maximum(counts, 1)
+
+
+def _simplify_group(geoms: np.ndarray, tolerance_m: float, include_z: bool) -> np.ndarray:
+    coords, index = shapely.get_coordinates(geoms, include_z=include_z, return_index=True)
+    lat0 = _mean_lat(coords, index, len(geoms))
+    metric = shapely.set_coordinates(geoms.copy(), _to_metres(coords, lat0[index]))
+    # preserve_topology=False is plain Douglas-Peucker; line ends always stay
+    simplified = shapely.simplify(metric, tolerance_m, preserve_topology=False)
+
+    coords, index = shapely.get_coordinates(simplified, include_z=include_z, return_index=True)
+    simplified = shapely.set_coordinates(simplified, _to_degrees(coords, lat0[index]))
+
+    # GEOS collapses single-part collections, keep the source type
+    collapsed = (shapely.get_type_id(geoms) == MULTILINESTRING) & (shapely.get_type_id(simplified) == LINESTRING)
+    if collapsed.any():
+        simplified[collapsed] = shapely.multilinestrings(simplified[collapsed], indices=np.arange(collapsed.sum()))
+    return simplified
+
+
+def simplify_m_batch(geoms: Sequence, tolerance_m: float = TRACK_SIMPLIFY_TOLERANCE_M) -> np.ndarray:
+    """Douglas-Peucker with a tolerance in metres on lon/lat geometries; elevation is kept."""
+    geoms = np.asarray(geoms, dtype=object)
+    if tolerance_m <= 0 or not len(geoms):
+        return geoms
+    out = geoms.copy()
+    # projection per geometry (mean latitude); 2D and 3D lines are handled apart
+    todo = ~shapely.is_empty(geoms)
+    for include_z in (True, False):
+        group = todo & (shapely.has_z(geoms) == include_z)
+        if group.any():
+            out[group] = _simplify_group(geoms[group], tolerance_m, include_z)
+    return out
+
+
+def simplify_m(geom, tolerance_m: float = TRACK_SIMPLIFY_TOLERANCE_M):
+    if tolerance_m <= 0 or geom.is_empty:
+        return geom
+    return simplify_m_batch([geom], tolerance_m)[0]
+
+
+def length_m_batch(geoms: Sequence) -> np.ndarray:
+    """Sum of the haversine distances between consecutive vertices of each part."""
+    geoms = np.asarray(geoms, dtype=object)
+    parts, part_geom = shapely.get_parts(geoms, return_index=True)
+    coords, part = shapely.get_coordinates(parts, return_index=True)
+    if len(coords) < 2:
+        return np.zeros(len(geoms))
+    coords = np.radians(coords)
+    lon, lat = coords[:, 0], coords[:, 1]
+    a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    segments = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+    # no segment between the last vertex of one part and the first of the next
+    same_part = part[1:] == part[:-1]
+    return np.bincount(part_geom[part[:-1]][same_part], weights=segments[same_part], minlength=len(geoms))
+
+
+def length_m(geom) -> float:
+    return float(length_m_batch([geom])[0])
+
+
+def envelope(bounds) -> Dict[str, Any]:
+    """geo_shape envelope: [[min_lon, max_lat], [max_lon, min_lat]] (upper left, lower right)."""
+    min_lon, min_lat, max_lon, max_lat = (float(v) for v in bounds)
+    return {"type": "envelope", "coordinates": [[min_lon, max_lat], [max_lon, min_lat]]}
+
+
+def _geojson_lines(geoms: np.ndarray, include_z: bool) -> List[Dict[str, Any]]:
+    """GeoJSON dicts from one get_coordinates call (shapely's mapping() walks every coordinate in Python)."""
+    parts, part_geom = shapely.get_parts(geoms, return_index=True)
+    coords = shapely.get_coordinates(parts, include_z=include_z).tolist()
+    ends = np.cumsum(shapely.get_num_coordinates(parts)).tolist()
+    lines: List[List] = [[] for _ in geoms]
+    start = 0
+    for g, end in zip(part_geom.tolist(), ends):
+        lines[g].append(coords[start:end])
+        start = end
+    multi = (shapely.get_type_id(geoms) == MULTILINESTRING).tolist()
+    return [
+        {"type": "MultiLineString", "coordinates": parts} if is_multi else {"type": "LineString", "coordinates": parts[0]}
+        for parts, is_multi in zip(lines, multi)
+    ]
+
+
+# --- full-resolution side store ---
+
+class GeometryStore:
+    """Gzipped GeoJSON per source_id under `root`, sharded by the first two hash characters."""
+
+    def __init__(self, root: str = TRACK_GEOMETRY_STORE):
+        self.root = root
+
+    def ref(self, source_id: str) -> str:
+        digest = hashlib.sha1(source_id.encode("utf-8")).hexdigest()
+        return f"{digest[:2]}/{digest}.geojson.gz"
+
+    def put(self, source_id: str, geom) -> str:
+        ref = self.ref(source_id)
+        path = os.path.join(self.root, ref)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # parse workers write concurrently: write to a temp file, then rename
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(shape_mapping(geom), f)
+        os.replace(tmp, path)
+        return ref
+
+    def get(self, ref: str):
+        path = os.path.join(self.root, ref)
+        if not os.path.exists(path):
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return geojson_shape(json.load(f))
+
+
+def load_full_geometry(ref: str, store: Optional[GeometryStore] = None):
+    """Full-resolution line for the `geo_line_full` reference of a track (None if not stored)."""
+    store = store or GeometryStore()
+    if not store.root or not ref:
+        return None
+    return store.get(ref)
+
+
+# --- ingest ---
+
+def parse_track_wkt_batch(wkt_strings: Sequence[str]) -> Tuple[np.ndarray, List[Optional[str]]]:
+    """
+    Parses and validates all lines at once. Returns the geometries (None where
+    unusable) and an error message per line (None where fine).
+    """
+    cleaned = np.asarray([w.replace("MULTILINESTRING Z", "MULTILINESTRING") for w in wkt_strings], dtype=object)
+    geoms = shapely.from_wkt(cleaned, on_invalid="ignore")
+    errors: List[Optional[str]] = [None] * len(geoms)
+
+    unparsed = shapely.is_missing(geoms)
+    type_ids = shapely.get_type_id(geoms)
+    wrong_type = ~unparsed & ~np.isin(type_ids, (LINESTRING, MULTILINESTRING))
+    empty = ~unparsed & ~wrong_type & shapely.is_empty(geoms)
+    # OpenSearch rejects the whole document for coordinates outside lon/lat range
+    bounds = shapely.bounds(geoms)
+    with np.errstate(invalid="ignore"):
+        out_of_range = ~(unparsed | wrong_type | empty) & (
+            (np.abs(bounds[:, [0, 2]]) > 180).any(axis=1) | (np.abs(bounds[:, [1, 3]]) > 90).any(axis=1)
+        )
+
+    for i in np.flatnonzero(unparsed):
+        errors[i] = "invalid WKT"
+    for i in np.flatnonzero(wrong_type):
+        errors[i] = f"expected a (multi)line, got {geoms[i].geom_type}"
+    for i in np.flatnonzero(empty):
+        errors[i] = "empty line"
+    for i in np.flatnonzero(out_of_range):
+        errors[i] = f"coordinates out of range {tuple(np.round(bounds[i], 4))}"
+    geoms[unparsed | wrong_type | empty | out_of_range] = None
+    return geoms, errors
+
+
+def track_metadata_batch(
+    geoms: Sequence,
+    source_ids: Optional[Sequence[Optional[str]]] = None,
+    tolerance_m: float = TRACK_SIMPLIFY_TOLERANCE_M,
+    store: Optional[GeometryStore] = None,
+) -> List[Dict[str, Any]]:
+    """Metadata fields per track line: simplified line, bbox, centroid, length, start point."""
+    geoms = np.asarray(geoms, dtype=object)
+    if store is None and TRACK_GEOMETRY_STORE:
+        store = GeometryStore()
+    if not len(geoms):
+        return []
+
+    simplified = simplify_m_batch(geoms, tolerance_m)
+    bounds = shapely.bounds(geoms)
+    centroids = shapely.centroid(geoms)
+    centroid_x, centroid_y = shapely.get_x(centroids), shapely.get_y(centroids)
+    # first vertex of the first part; get_geometry(line, 0) is the line itself
+    starts = shapely.get_point(shapely.get_geometry(geoms, 0), 0)
+    start_x, start_y = shapely.get_x(starts), shapely.get_y(starts)
+    # measured on the full line, simplification shortens it slightly
+    lengths = np.round(length_m_batch(geoms), 1)
+    vertices = shapely.get_num_coordinates(simplified)
+
+    lines: List[Optional[Dict[str, Any]]] = [None] * len(geoms)
+    has_z = shapely.has_z(simplified)
+    for include_z in (True, False):
+        group = np.flatnonzero(has_z == include_z)
+        for i, line in zip(group, _geojson_lines(simplified[group], include_z)):
+            lines[i] = line
+
+    results = []
+    for i, geom in enumerate(geoms):
+        metadata: Dict[str, Any] = {
+            "geo_line": lines[i],
+            "geo_bbox": envelope(bounds[i]),
+            "geo_centroid": f"{centroid_y[i]},{centroid_x[i]}",
+            "geo_length_m": float(lengths[i]),
+            "geo_vertices": int(vertices[i]),
+            "location": f"{start_y[i]},{start_x[i]}",
+        }
+        source_id = source_ids[i] if source_ids is not None else None
+        if store is not None and store.root and source_id:
+            metadata["geo_line_full"] = store.put(source_id, geom)
+        results.append(metadata)
+    return results
+
+
+def track_metadata(
+    geom,
+    source_id: Optional[str] = None,
+    tolerance_m: float = TRACK_SIMPLIFY_TOLERANCE_M,
+    store: Optional[GeometryStore] = None,
+) -> Dict[str, Any]:
+    return track_metadata_batch([geom], [source_id], tolerance_m, store)[0]
+
+
+def track_geometry(
+    wkt_strings: Sequence[Optional[str]],
+    source_ids: Sequence[Optional[str]],
+    tolerance_m: float = TRACK_SIMPLIFY_TOLERANCE_M,
+    store: Optional[GeometryStore] = None,
+) -> List[Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Batch geometry stage for the items of one file chunk: (metadata, None) per
+    usable line, (None, error) per broken one and (None, None) where an item
+    has no line at all.
+    """
+    results: List[Tuple[Optional[Dict[str, Any]], Optional[str]]] = [(None, None)] * len(wkt_strings)
+    present = [i for i, w in enumerate(wkt_strings) if isinstance(w, str) and w.strip()]
+    if not present:
+        return results
+
+    geoms, errors = parse_track_wkt_batch([wkt_strings[i] for i in present])
+    usable = [j for j, error in enumerate(errors) if error is None]
+    summaries = track_metadata_batch(geoms[usable], [source_ids[present[j]] for j in usable], tolerance_m, store)
+    for j, error in enumerate(errors):
+        if error is not None:
+            results[present[j]] = (None, error)
+    for j, metadata in zip(usable, summaries):
+        results[present[j]] = (metadata, None)
+    return results
+
+
+def track_geometry_mappings() -> Dict[str, Any]:
+    """Mappings of the fields above; they live under `metadata` like every other POI field."""
+    return {
+        "location": {"type": "geo_point"},
+        # ignore_z_value=True: the elevation of the track vertices is kept in _source only
+        "geo_line": {"type": "geo_shape", "ignore_z_value": True},
+        "geo_bbox": {"type": "geo_shape"},
+        "geo_centroid": {"type": "geo_point"},
+        "geo_length_m": {"type": "float"},
+        "geo_vertices": {"type": "integer"},
+        "geo_line_full": {"type": "keyword", "index": False},
+    }
@@ -0,0 +1,127 @@
+import os
+import json
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from opensearchpy import OpenSearch, helpers
+
+from llama_index.core import Document
+from llama_index.core.schema import MetadataMode
+
+from sources import SOURCE_FILE_KEY
+
+# --- Diff-based re-ingestion ---
+# Every chunk carries `metadata.content_hash` (hash of the document's embed text
+# and metadata). Before a run the hashes of all indexed documents are scanned in
+# one pass; only new or changed documents are embedded and written, and the old
+# chunks of changed documents plus documents missing from the source are deleted.
+INGEST_DIFF = os.getenv("INGEST_DIFF", "true").lower() == "true"
+INGEST_DELETE_MISSING = os.getenv("INGEST_DELETE_MISSING", "true").lower() == "true"
+INGEST_SCAN_PAGE_SIZE = int(os.getenv("INGEST_SCAN_PAGE_SIZE", "1000"))
+
+HASH_KEY = "content_hash"
+
+
+def content_hash(doc: Document) -> str:
+    payload = {
+        "text": doc.get_content(metadata_mode=MetadataMode.EMBED),
+        # moving the source files does not change a document
+        "metadata": {k: v for k, v in doc.metadata.items() if k not in (HASH_KEY, SOURCE_FILE_KEY)},
+    }
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def tag_content_hash(doc: Document) -> str:
+    """Stores the hash in the metadata without letting it leak into embed/LLM text."""
+    digest = content_hash(doc)
+    doc.metadata[HASH_KEY] = digest
+    for keys in (doc.excluded_embed_metadata_keys, doc.excluded_llm_metadata_keys):
+        if HASH_KEY not in keys:
+            keys.append(HASH_KEY)
+    return digest
+
+
+@dataclass
+class IndexedDocument:
+    chunk_ids: List[str] = field(default_factory=list)
+    hashes: Set[Optional[str]] = field(default_factory=set)
+
+    @property
+    def content_hash(self) -> Optional[str]:
+        # chunks from an older run without hashes, or with mixed hashes, count as changed
+        return next(iter(self.hashes)) if len(self.hashes) == 1 else None
+
+
+def fetch_indexed_documents(
+    os_client: OpenSearch, index: str, page_size: int = INGEST_SCAN_PAGE_SIZE
+) -> Dict[str, IndexedDocument]:
+    """Scans doc id, hash and chunk ids of everything in the index (no vectors, no text)."""
+    indexed: Dict[str, IndexedDocument] = {}
+    hits = helpers.scan(
+        os_client,
+        index=index,
+        query={"query": {"match_all": {}}, "_source": ["metadata.doc_id", f"metadata.{HASH_KEY}"]},
+        size=page_size,
+    )
+    for hit in hits:
+        metadata = hit.get("_source", {}).get("metadata", {})
+        doc_id = metadata.get("doc_id")
+        if not doc_id:
+            continue
+        entry = indexed.setdefault(doc_id, IndexedDocument())
+        entry.chunk_ids.append(hit["_id"])
+        entry.hashes.add(metadata.get(HASH_KEY))
+    return indexed
+
+
+class DocumentDiff:
+    """
+    Filters a document stream against the index: unchanged documents are
+    dropped, new and changed ones pass through. Afterwards `stale_chunk_ids()`
+    lists the chunks to delete.
+    """
+
+    def __init__(self, indexed: Dict[str, IndexedDocument]):
+        self.indexed = indexed
+        self.seen: Set[str] = set()
+        self.stats = {"new": 0, "changed": 0, "unchanged": 0, "missing": 0}
+        self._replaced: List[str] = []
+        # with deterministic chunk ids a changed document reuses ids of its old chunks
+        self._replaced_ids: Set[str] = set()
+        self._rewritten: Set[str] = set()
+
+    def filter(self, documents: Iterable[Document]) -> Iterator[Document]:
+        for doc in documents:
+            if doc.id_ in self.seen:
+                # duplicate item in the source, the first one wins
+                continue
+            self.seen.add(doc.id_)
+
+            digest = tag_content_hash(doc)
+            entry = self.indexed.get(doc.id_)
+            if entry is None:
+                self.stats["new"] += 1
+            elif entry.content_hash == digest:
+                self.stats["unchanged"] += 1
+                continue
+            else:
+                self.stats["changed"] += 1
+                self._replaced.extend(entry.chunk_ids)
+                self._replaced_ids.update(entry.chunk_ids)
+            yield doc
+
+    def written(self, chunk_ids: Iterable[str]):
+        """Chunk ids written in this run; they are never stale even if an old chunk had the same id."""
+        self._rewritten.update(i for i in chunk_ids if i in self._replaced_ids)
+
+    def stale_chunk_ids(self, delete_missing: bool = INGEST_DELETE_MISSING) -> List[str]:
+        """Old chunks of changed documents, plus chunks of documents no longer in the source."""
+        stale = [i for i in self._replaced if i not in self._rewritten]
+        if delete_missing:
+            missing = [doc_id for doc_id in self.indexed if doc_id not in self.seen]
+            self.stats["missing"] = len(missing)
+            for doc_id in missing:
+                stale.extend(self.indexed[doc_id].chunk_ids)
+        return stale
@@ -0,0 +1,153 @@
+import os
+import copy
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from opensearchpy import OpenSearch, RequestsHttpConnection
+
+logger = logging.getLogger(__name__)
+
+# --- Versioned indices behind a read alias ---
+# A rebuild (`--reindex`) writes into a fresh index <alias>-<UTC timestamp>
+# created with refresh disabled and no replicas. When ingestion is done the
+# index is refreshed, force-merged, gets its serving settings back and the
+# alias is moved to it in one atomic _aliases call. Readers use the alias
+# (POI_INDEX=<alias>) and never see a half-built index; the previous
+# POI_KEEP_VERSIONS versions stay around for `rollback`.
+POI_ALIAS = os.getenv("POI_ALIAS", "tourism-data")
+POI_KEEP_VERSIONS = int(os.getenv("POI_KEEP_VERSIONS", "2"))
+POI_REPLICAS = int(os.getenv("POI_REPLICAS", "1"))
+POI_REFRESH_INTERVAL = os.getenv("POI_REFRESH_INTERVAL", "1s")
+POI_FORCE_MERGE_SEGMENTS = int(os.getenv("POI_FORCE_MERGE_SEGMENTS", "1"))
+
+BULK_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+
+
+class IndexVersions:
+    def __init__(
+        self,
+        os_client: OpenSearch,
+        alias: str = POI_ALIAS,
+        keep: int = POI_KEEP_VERSIONS,
+        replicas: int = POI_REPLICAS,
+        refresh_interval: str = POI_REFRESH_INTERVAL,
+        force_merge_segments: int = POI_FORCE_MERGE_SEGMENTS,
+    ):
+        self.os_client = os_client
+        self.alias = alias
+        self.keep = keep
+        self.replicas = replicas
+        self.refresh_interval = refresh_interval
+        self.force_merge_segments = force_merge_segments
+
+    # --- lookup ---
+
+    def new_index_name(self) -> str:
+        return f"{self.alias}-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}"
+
+    def versions(self) -> List[str]:
+        """All versioned indices of this alias, oldest first (the timestamp sorts)."""
+        response = self.os_client.indices.get(index=f"{self.alias}-*", ignore_unavailable=True, allow_no_indices=True)
+        return sorted(response)
+
+    def current(self) -> Optional[str]:
+        if not self.os_client.indices.exists_alias(name=self.alias):
+            return None
+        indices = list(self.os_client.indices.get_alias(name=self.alias))
+        return indices[0] if indices else None
+
+    # --- build ---
+
+    def create(self, index: str, body: Dict[str, Any]):
+        if self.os_client.indices.exists(index=self.alias) and not self.os_client.indices.exists_alias(name=self.alias):
+            raise ValueError(f"'{self.alias}' ist ein Index, kein Alias; POI_ALIAS anders wählen")
+
+        body = copy.deepcopy(body)
+        body.setdefault("settings", {}).setdefault("index", {}).update(BULK_SETTINGS)
+        self.os_client.indices.create(index=index, body=body)
+        logger.info(f"Neue Index-Version '{index}' erstellt (refresh aus, 0 Replicas).")
+
+    def finalize(self, index: str):
+        """Refresh, force-merge, serving settings, alias swap, prune."""
+        self.os_client.indices.refresh(index=index)
+        if self.force_merge_segments > 0:
+            logger.info(f"Force-Merge '{index}' auf {self.force_merge_segments} Segment(e)...")
+            self.os_client.indices.forcemerge(
+                index=index, max_num_segments=self.force_merge_segments, request_timeout=3600
+            )
+        self.os_client.indices.put_settings(
+            index=index,
+            body={"index": {"refresh_interval": self.refresh_interval, "number_of_replicas": self.replicas}},
+        )
+        # replicas of a single-node cluster stay unassigned, yellow is enough to serve
+        self.os_client.cluster.health(index=index, wait_for_status="yellow", timeout="10m")
+        self.swap(index)
+        self.prune()
+
+    def discard(self, index: str):
+        """Drops a version that failed to build; the alias was never moved to it."""
+        if index != self.current():
+            self.os_client.indices.delete(index=index, ignore=[404])
+            logger.warning(f"Unfertige Index-Version '{index}' gelöscht.")
+
+    # --- alias ---
+
+    def swap(self, index: str):
+        previous = self.current()
+        actions: List[Dict[str, Any]] = [{"add": {"index": index, "alias": self.alias}}]
+        if previous and previous != index:
+            actions.insert(0, {"remove": {"index": previous, "alias": self.alias}})
+        self.os_client.indices.update_aliases(body={"actions": actions})
+        logger.info(f"Alias '{self.alias}': {previous or '-'} -> {index}")
+
+    def rollback(self) -> str:
+        current = self.current()
+        older = [v for v in self.versions() if current is None or v < current]
+        if not older:
+            raise ValueError(f"Keine ältere Version von '{self.alias}' vorhanden")
+        self.swap(older[-1])
+        return older[-1]
+
+    def prune(self) -> List[str]:
+        """Keeps the aliased version plus the `keep` newest other versions."""
+        current = self.current()
+        others = [v for v in self.versions() if v != current]
+        # never delete versions newer than the alias (e.g. a build still running)
+        if current:
+            others = [v for v in others if v < current]
+        doomed = others[: max(len(others) - self.keep, 0)]
+        for index in doomed:
+            self.os_client.indices.delete(index=index, ignore=[404])
+            logger.info(f"Alte Index-Version '{index}' gelöscht.")
+        return doomed
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Versioned POI indices behind a read alias")
+    parser.add_argument("command", choices=["list", "rollback", "prune"])
+    parser.add_argument("--alias", default=POI_ALIAS)
+    args = parser.parse_args()
+
+    os_client = OpenSearch(
+        hosts=[{"host": os.getenv("OPENSEARCH_HOST", "localhost"), "port": int(os.getenv("OPENSEARCH_PORT", "9200"))}],
+        use_ssl=False,
+        verify_certs=False,
+        connection_class=RequestsHttpConnection,
+    )
+    versions = IndexVersions(os_client, alias=args.alias)
+
+    if args.command == "rollback":
+        print(f"Alias '{args.alias}' zeigt jetzt auf {versions.rollback()}")
+    elif args.command == "prune":
+        print(f"Gelöscht: {versions.prune() or '-'}")
+
+    current = versions.current()
+    for index in versions.versions():
+        print(f"{'*' if index == current else ' '} {index}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from llama_index.core import Document
+from llama_index.core.schema import BaseNode
+
+from index_state import content_hash
+from sources import SOURCE_FILE_KEY
+
+logger = logging.getLogger(__name__)
+
+# --- Checkpointed ingestion runs ---
+# Every pipelined run writes its progress to a SQLite ledger: one row per
+# committed batch (number, document offset, sizes), per document (file,
+# content hash, batch it was written in) and per source file (done once all
+# of its documents are written or unchanged). Rows are written only after
+# the bulk write of a batch succeeded. `--resume` continues the newest
+# unfinished run of the same target: finished files are not read again,
+# committed documents are neither embedded nor written again. Chunk ids are
+# deterministic (pipeline.chunk_id), so re-writing the batch that was in
+# flight during a crash overwrites instead of duplicating.
+# Empty INGEST_LEDGER_PATH disables the ledger (and --resume).
+INGEST_LEDGER_PATH = os.getenv("INGEST_LEDGER_PATH", "./ingest-ledger.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    target TEXT NOT NULL,
+    index_name TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL DEFAULT 'running',
+    stats TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_target ON runs (target, status);
+CREATE TABLE IF NOT EXISTS files (
+    run_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    end_offset INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run_id, path)
+);
+CREATE TABLE IF NOT EXISTS batches (
+    run_id INTEGER NOT NULL,
+    batch_no INTEGER NOT NULL,
+    doc_offset INTEGER NOT NULL,
+    documents INTEGER NOT NULL,
+    nodes INTEGER NOT NULL,
+    committed_at REAL NOT NULL,
+    PRIMARY KEY (run_id, batch_no)
+);
+CREATE TABLE IF NOT EXISTS documents (
+    run_id INTEGER NOT NULL,
+    doc_id TEXT NOT NULL,
+    path TEXT,
+    content_hash TEXT,
+    batch_no INTEGER,
+    PRIMARY KEY (run_id, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS documents_path ON documents (run_id, path);
+"""
+
+
+def file_signature(path: str) -> Tuple[int, float]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime
+
+
+class IngestRun:
+    """
+    Progress of one run. Wrap the document stream with `documents()` and
+    `skip_committed()`, and call `commit()` for every batch written (in order).
+    """
+
+    def __init__(self, conn: sqlite3.Connection, run_id: int, index_name: str, resumed: bool):
+        self._conn = conn
+        self.id = run_id
+        self.index_name = index_name
+        self.resumed = resumed
+
+        # documents handed to the pipeline in this attempt / committed of those
+        self._fed = 0
+        self._committed_fed = 0
+        # files parsed in this attempt whose documents are not all committed yet: (path, end offset)
+        self._open_files: List[Tuple[str, int]] = []
+
+        row = conn.execute(
+            "SELECT COALESCE(MAX(batch_no), 0), COALESCE(SUM(documents), 0) FROM batches WHERE run_id = ?", (run_id,)
+        ).fetchone()
+        self.batches, self.committed_documents = row
+        self.committed: Dict[str, Optional[str]] = {}
+        self.done_files: Dict[str, Tuple[int, float]] = {}
+        if resumed:
+            self.committed = dict(
+                conn.execute(
+                    "SELECT doc_id, content_hash FROM documents WHERE run_id = ? AND batch_no IS NOT NULL", (run_id,)
+                )
+            )
+            self.done_files = {
+                path: (size, mtime)
+                for path, size, mtime in conn.execute(
+                    "SELECT path, size, mtime FROM files WHERE run_id = ? AND done = 1", (run_id,)
+                )
+            }
+        # ids of the documents in skipped files (for DocumentDiff.seen)
+        self.skipped_doc_ids: Set[str] = set()
+        # index names of the unfinished runs that begin() gave up for this one
+        self.abandoned_indexes: List[str] = []
+        self.stats = {"resumed_files": 0, "resumed_documents": 0}
+
+    # --- document stream ---
+
+    def documents(
+        self,
+        files: Sequence[str],
+        parse_files: Callable[[List[str]], Iterable[Document]],
+        failed_files: Sequence[str] = (),
+    ) -> Iterator[Document]:
+        """
+        Parses all files in one stream (e.g. pipeline.iter_documents); files
+        finished in an earlier attempt and unchanged since are skipped. The
+        stream must keep file order and carry each document's file in
+        metadata[SOURCE_FILE_KEY]: a file is complete once a document of a
+        later file (or the end of the stream) arrives. Files that end up in
+        `failed_files` (read errors, e.g. ParseReport.failed_files) are never
+        marked done.
+        """
+        todo = []
+        for path in files:
+            if path in self.done_files and self.done_files[path] == file_signature(path):
+                ids = [r[0] for r in self._conn.execute(
+                    "SELECT doc_id FROM documents WHERE run_id = ? AND path = ?", (self.id, path)
+                )]
+                self.skipped_doc_ids.update(ids)
+                self.stats["resumed_files"] += 1
+                self.stats["resumed_documents"] += len(ids)
+                logger.info(f"Übersprungen (bereits fertig): {path}")
+                continue
+            todo.append(path)
+
+        # signatures before parsing: a file changed meanwhile is read again next time
+        signatures = {path: file_signature(path) for path in todo}
+        position = 0  # index in `todo` of the file whose documents are arriving
+        doc_ids: List[str] = []
+        for doc in parse_files(todo):
+            path = doc.metadata.get(SOURCE_FILE_KEY)
+            if path in signatures:
+                # files before `path` are complete, those in between had no documents
+                while todo[position] != path:
+                    self._file_done(todo[position], signatures, doc_ids, failed_files)
+                    doc_ids = []
+                    position += 1
+            doc_ids.append(doc.id_)
+            yield doc
+        for path in todo[position:]:
+            self._file_done(path, signatures, doc_ids, failed_files)
+            doc_ids = []
+
+    def _file_done(
+        self, path: str, signatures: Dict[str, Tuple[int, float]], doc_ids: List[str], failed_files: Sequence[str]
+    ):
+        if path not in failed_files:
+            self._file_parsed(path, signatures[path], doc_ids)
+
+    def skip_committed(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Drops documents already written in this run with the same content; counts what passes on."""
+        for doc in documents:
+            if doc.id_ in self.committed and self.committed[doc.id_] == content_hash(doc):
+                self.stats["resumed_documents"] += 1
+                continue
+            self._fed += 1
+            yield doc
+
+    def _file_parsed(self, path: str, signature: Tuple[int, float], doc_ids: List[str]):
+        # the last document of the file has already been handed on when the generator gets here
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO documents (run_id, doc_id, path) VALUES (?, ?, ?) "
+                "ON CONFLICT (run_id, doc_id) DO UPDATE SET path = excluded.path",
+                [(self.id, doc_id, path) for doc_id in doc_ids],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (run_id, path, size, mtime, end_offset, done) VALUES (?, ?, ?, ?, ?, 0)",
+                (self.id, path, signature[0], signature[1], self._fed),
+            )
+            self._open_files.append((path, self._fed))
+            self._close_files()
+
+    def _close_files(self):
+        done = [path for path, end in self._open_files if end <= self._committed_fed]
+        self._open_files = [(path, end) for path, end in self._open_files if end > self._committed_fed]
+        self._conn.executemany(
+            "UPDATE files SET done = 1 WHERE run_id = ? AND path = ?", [(self.id, path) for path in done]
+        )
+
+    # --- checkpoints ---
+
+    def commit(self, documents: Sequence[Document], nodes: Sequence[BaseNode]):
+        """Records a batch whose bulk write succeeded, in one transaction."""
+        self.batches += 1
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO batches (run_id, batch_no, doc_offset, documents, nodes, committed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.id, self.batches, self.committed_documents, len(documents), len(nodes), time.time()),
+            )
+            self._conn.executemany(
+                "INSERT INTO documents (run_id, doc_id, content_hash, batch_no) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (run_id, doc_id) DO UPDATE SET content_hash = excluded.content_hash, batch_no = excluded.batch_no",
+                [(self.id, doc.id_, content_hash(doc), self.batches) for doc in documents],
+            )
+            self.committed_documents += len(documents)
+            self._committed_fed += len(documents)
+            self._close_files()
+
+    def finish(self, stats: Dict[str, Any], status: str = "finished"):
+        with self._conn:
+            self._conn.execute(
+                "UPDATE runs SET finished_at = ?, status = ?, stats = ? WHERE id = ?",
+                (time.time(), status, json.dumps(stats, default=str), self.id),
+            )
+
+
+class IngestLedger:
+    def __init__(self, path: str = INGEST_LEDGER_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def unfinished(self, target: str) -> Optional[Tuple[int, str]]:
+        """(run id, index name) of the newest unfinished run for `target`."""
+        return self._conn.execute(
+            "SELECT id, index_name FROM runs WHERE target = ? AND status = 'running' ORDER BY id DESC LIMIT 1",
+            (target,),
+        ).fetchone()
+
+    def begin(self, target: str, index_name: str, resume: Optional[Tuple[int, str]] = None) -> IngestRun:
+        """
+        Starts a new run, or continues `resume` (from unfinished()); other
+        unfinished runs are abandoned, their indices are listed in
+        `abandoned_indexes` of the returned run.
+        """
+        with self._conn:
+            if resume is not None:
+                run_id, index_name = resume
+            else:
+                run_id = self._conn.execute(
+                    "INSERT INTO runs (target, index_name, started_at) VALUES (?, ?, ?)", (target, index_name, time.time())
+                ).lastrowid
+            abandoned = [r[0] for r in self._conn.execute(
+                "SELECT index_name FROM runs WHERE target = ? AND status = 'running' AND id != ?", (target, run_id)
+            )]
+            self._conn.execute(
+                "UPDATE runs SET status = 'abandoned', finished_at = ? WHERE target = ? AND status = 'running' AND id != ?",
+                (time.time(), target, run_id),
+            )
+        run = IngestRun(self._conn, run_id, index_name, resumed=resume is not None)
+        run.abandoned_indexes = sorted(set(abandoned))
+        if run.resumed:
+            logger.info(
+                f"Setze Lauf {run_id} fort ({index_name}): {run.batches} Batches, "
+                f"{run.committed_documents} Dokumente, {len(run.done_files)} Dateien fertig."
+            )
+        return run
+
+    def runs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        rows = self._conn.execute(
+            "SELECT r.id, r.target, r.index_name, r.status, r.started_at, r.finished_at, "
+            "(SELECT COUNT(*) FROM batches b WHERE b.run_id = r.id), "
+            "(SELECT COALESCE(SUM(documents), 0) FROM batches b WHERE b.run_id = r.id), "
+            "(SELECT COUNT(*) FROM files f WHERE f.run_id = r.id AND f.done = 1) "
+            "FROM runs r ORDER BY r.id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+        keys = ["id", "target", "index", "status", "started_at", "finished_at", "batches", "documents", "files_done"]
+        return [dict(zip(keys, row)) for row in rows]
+
+    def prune(self, keep: int = 10) -> int:
+        """Deletes all but the `keep` newest finished or abandoned runs."""
+        with self._conn:
+            doomed = [r[0] for r in self._conn.execute(
+                "SELECT id FROM runs WHERE status != 'running' ORDER BY id DESC LIMIT -1 OFFSET ?", (keep,)
+            )]
+            for table in ("documents", "batches", "files"):
+                self._conn.executemany(f"DELETE FROM {table} WHERE run_id = ?", [(i,) for i in doomed])
+            self._conn.executemany("DELETE FROM runs WHERE id = ?", [(i,) for i in doomed])
+        return len(doomed)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Progress ledger of pipelined ingestion runs")
+    parser.add_argument("command", choices=["list", "prune"])
+    parser.add_argument("--path", default=INGEST_LEDGER_PATH)
+    parser.add_argument("--keep", type=int, default=10, help="prune: finished runs to keep")
+    args = parser.parse_args()
+
+    ledger = IngestLedger(args.path)
+    if args.command == "prune":
+        print(f"{ledger.prune(args.keep)} Läufe gelöscht")
+    for run in ledger.runs():
+        started = time.strftime("%Y-%m-%d %H:%M", time.localtime(run["started_at"]))
+        print(
+            f"{run['id']:>4} {run['status']:<10} {started} {run['index']:<40} "
+            f"{run['batches']:>5} Batches {run['documents']:>7} Dokumente {run['files_done']:>4} Dateien"
+        )
+    ledger.close()
+
+
+if __name__ == "__main__":
+    main()
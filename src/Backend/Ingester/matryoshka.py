@@ -0,0 +1,128 @@
+import os
+import base64
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from opensearchpy import OpenSearch
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.vector_stores import MetadataFilters, VectorStoreQuery
+from llama_index.vector_stores.opensearch import OpensearchVectorStore
+
+logger = logging.getLogger(__name__)
+
+# --- Reduced-dimension search with full-vector rescoring ---
+# text-embedding-3 vectors are Matryoshka-trained: the first N dimensions,
+# re-normalized, are a usable embedding on their own. With EMBED_SEARCH_DIM
+# set, the HNSW field `embedding` holds only those N dimensions, and the full
+# vector is kept as a compact float16 copy in `embedding_full` (binary, not
+# indexed). Queries search with N dimensions for RESCORE_OVERSAMPLE * k
+# candidates and re-rank them by cosine similarity on the full vectors.
+# Empty/0 = search on the full vector (no copy, no rescoring).
+EMBED_SEARCH_DIM = int(os.getenv("EMBED_SEARCH_DIM", "0") or 0)
+RESCORE_OVERSAMPLE = int(os.getenv("RESCORE_OVERSAMPLE", "4"))
+
+FULL_VECTOR_FIELD = "embedding_full"
+
+
+def search_dim(embed_dim: int, configured: int = EMBED_SEARCH_DIM) -> int:
+    if not configured or configured >= embed_dim:
+        return embed_dim
+    return configured
+
+
+def truncate(vector: Sequence[float], dim: int) -> List[float]:
+    head = np.asarray(vector[:dim], dtype=np.float32)
+    norm = float(np.linalg.norm(head))
+    return (head / norm if norm else head).tolist()
+
+
+def encode_full(vector: Sequence[float]) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=np.float16).tobytes()).decode("ascii")
+
+
+def decode_full(encoded: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded), dtype=np.float16).astype(np.float32)
+
+
+def full_vector_mapping() -> Dict[str, Any]:
+    # binary: stored in _source only, neither indexed nor in doc values
+    return {"type": "binary"}
+
+
+def cosine(query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+    norms[norms == 0] = 1.0
+    return vectors @ query / norms
+
+
+class RescoringRetriever(BaseRetriever):
+    """
+    kNN on the truncated search field, then re-ranking of the candidates by
+    the full-dimension copy fetched with one mget.
+    """
+
+    def __init__(
+        self,
+        vector_store: OpensearchVectorStore,
+        os_client: OpenSearch,
+        index: str,
+        embed_model: BaseEmbedding,
+        dim: int,
+        similarity_top_k: int = 3,
+        filters: Optional[MetadataFilters] = None,
+        oversample: int = RESCORE_OVERSAMPLE,
+        query_transform=None,
+    ):
+        super().__init__()
+        self.vector_store = vector_store
+        self.os_client = os_client
+        self.index = index
+        self.embed_model = embed_model
+        self.dim = dim
+        self.similarity_top_k = similarity_top_k
+        self.filters = filters
+        self.oversample = max(oversample, 1)
+        # e.g. int8 quantization for byte-vector indices, applied to the truncated vector
+        self.query_transform = query_transform
+
+    def _full_vectors(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        if not ids:
+            return {}
+        response = self.os_client.mget(index=self.index, body={"ids": ids}, _source_includes=[FULL_VECTOR_FIELD])
+        return {
+            doc["_id"]: decode_full(doc["_source"][FULL_VECTOR_FIELD])
+            for doc in response["docs"]
+            if doc.get("found") and doc.get("_source", {}).get(FULL_VECTOR_FIELD)
+        }
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        full_query = np.asarray(self.embed_model.get_query_embedding(query_bundle.query_str), dtype=np.float32)
+        search_vector = truncate(full_query, self.dim)
+        if self.query_transform is not None:
+            search_vector = [float(v) for v in self.query_transform(search_vector)]
+
+        result = self.vector_store.query(
+            VectorStoreQuery(
+                query_embedding=search_vector,
+                similarity_top_k=self.similarity_top_k * self.oversample,
+                filters=self.filters,
+            )
+        )
+        candidates = list(zip(result.ids or [], result.nodes or [], result.similarities or []))
+        full = self._full_vectors([node_id for node_id, _, _ in candidates])
+
+        scored = []
+        # candidates without a full copy (older documents) keep their kNN order at the end
+        missing = [NodeWithScore(node=node, score=score) for node_id, node, score in candidates if node_id not in full]
+        with_full = [(node_id, node) for node_id, node, _ in candidates if node_id in full]
+        if with_full:
+            scores = cosine(full_query, np.stack([full[node_id] for node_id, _ in with_full]))
+            scored = [NodeWithScore(node=node, score=float(s)) for (_, node), s in zip(with_full, scores)]
+            scored.sort(key=lambda n: n.score, reverse=True)
+        if missing:
+            logger.debug(f"{len(missing)} Kandidaten ohne {FULL_VECTOR_FIELD}, nicht neu bewertet")
+        return (scored + missing)[: self.similarity_top_k]
@@ -0,0 +1,160 @@
+import os
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from llama_index.core.vector_stores import FilterOperator, MetadataFilter
+
+# --- Structured opening hours ---
+# Besides the human-readable string, every POI with structured
+# openingHoursSpecification entries (opens/closes/dayOfWeek) gets
+#   open_days     bitmask of the weekdays it opens at all (bit 0 = Monday)
+#   open_minutes  minute-of-week ranges [gte, lt) (0 = Monday 00:00 local time),
+#                 mapped as integer_range
+# A term query on a range field matches every range containing the value, so
+# "open Sunday 15:00" is a single term filter that OpenSearch applies inside
+# the kNN search (efficient filtering) instead of post-filtering text.
+# Times are local (OPENING_HOURS_TZ). Only entries valid at ingest time
+# (validFrom <= today <= validThrough, either bound optional) count: the
+# ranges have no dates, so a past or coming season would make the POI look
+# open now. Seasons change with the next ingest (changed metadata, re-written).
+OPENING_HOURS_TZ = ZoneInfo(os.getenv("OPENING_HOURS_TZ", "Europe/Berlin"))
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+OPENING_HOURS_METADATA_KEYS = ["open_days", "open_minutes"]
+
+
+def _minutes(value: Any) -> Optional[int]:
+    """'10:00', '10:00:00' -> 600; '24:00' -> 1440."""
+    try:
+        hours, minutes = str(value).strip().split(":")[:2]
+        total = int(hours) * 60 + int(minutes)
+    except (ValueError, AttributeError):
+        return None
+    return total if 0 <= total <= MINUTES_PER_DAY else None
+
+
+def _days(raw_days: Any) -> List[int]:
+    if isinstance(raw_days, str):
+        raw_days = [raw_days]
+    days = []
+    for raw in raw_days or []:
+        # schema.org URLs (http://schema.org/Monday) or plain names
+        name = str(raw).rstrip("/").split("/")[-1]
+        if name in DAYS:
+            days.append(DAYS.index(name))
+    return sorted(set(days))
+
+
+def _valid_date(value: Any) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def _in_season(item: Dict[str, Any], today: date) -> bool:
+    """validFrom <= today <= validThrough; a missing or unreadable bound is open."""
+    valid_from, valid_through = _valid_date(item.get("validFrom")), _valid_date(item.get("validThrough"))
+    return (valid_from is None or valid_from <= today) and (valid_through is None or today <= valid_through)
+
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def opening_ranges(ohs_data: Any, today: Optional[date] = None) -> List[Tuple[int, int]]:
+    """Minute-of-week ranges [start, end) of all structured specifications valid `today`."""
+    if not ohs_data:
+        return []
+    if isinstance(ohs_data, dict):
+        ohs_data = [ohs_data]
+    today = today or datetime.now(OPENING_HOURS_TZ).date()
+
+    ranges = []
+    for item in ohs_data:
+        if not isinstance(item, dict) or not _in_season(item, today):
+            continue
+        opens, closes = _minutes(item.get("opens")), _minutes(item.get("closes"))
+        days = _days(item.get("dayOfWeek"))
+        if opens is None or closes is None or not days:
+            continue
+        if opens == closes:
+            # schema.org: 00:00-00:00 marks a closed day
+            continue
+        if closes == MINUTES_PER_DAY - 1:
+            # "closes 23:59" means until midnight
+            closes = MINUTES_PER_DAY
+        if closes < opens:
+            # past midnight (18:00-02:00) or until midnight (18:00-00:00)
+            closes += MINUTES_PER_DAY
+        for day in days:
+            start, end = day * MINUTES_PER_DAY + opens, day * MINUTES_PER_DAY + closes
+            if end > MINUTES_PER_WEEK:
+                # Sunday night into Monday morning
+                ranges.append((start, MINUTES_PER_WEEK))
+                ranges.append((0, end - MINUTES_PER_WEEK))
+            else:
+                ranges.append((start, end))
+    return merge_ranges(ranges)
+
+
+def day_mask(ranges: List[Tuple[int, int]]) -> int:
+    mask = 0
+    for start, end in ranges:
+        for day in range(start // MINUTES_PER_DAY, (end - 1) // MINUTES_PER_DAY + 1):
+            mask |= 1 << day
+    return mask
+
+
+def opening_hours_metadata(ohs_data: Any, today: Optional[date] = None) -> Dict[str, Any]:
+    """Metadata fields for a POI; empty if there are no structured times (unknown != closed)."""
+    ranges = opening_ranges(ohs_data, today)
+    if not ranges:
+        return {}
+    return {
+        "open_days": day_mask(ranges),
+        "open_minutes": [{"gte": start, "lt": end} for start, end in ranges],
+    }
+
+
+def opening_hours_mappings() -> Dict[str, Any]:
+    return {
+        "open_days": {"type": "integer"},
+        "open_minutes": {"type": "integer_range"},
+    }
+
+
+# --- query side ---
+
+def minute_of_week(when: datetime) -> int:
+    """Local minute of the week; naive datetimes are taken as local time."""
+    if when.tzinfo is not None:
+        when = when.astimezone(OPENING_HOURS_TZ)
+    return when.weekday() * MINUTES_PER_DAY + when.hour * 60 + when.minute
+
+
+def open_at_filter(when: datetime) -> MetadataFilter:
+    """Pre-filter for POIs open at `when`: term on the integer_range field."""
+    return MetadataFilter(key="open_minutes", value=minute_of_week(when), operator=FilterOperator.EQ)
+
+
+def is_open_at(metadata: Dict[str, Any], when: datetime) -> Optional[bool]:
+    """Same check on a result's metadata; None if the POI has no structured times."""
+    ranges = metadata.get("open_minutes")
+    if not ranges:
+        return None
+    minute = minute_of_week(when)
+    return any(r["gte"] <= minute < r["lt"] for r in ranges)
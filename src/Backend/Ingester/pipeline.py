@@ -0,0 +1,409 @@
+import os
+import time
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from opensearchpy import OpenSearch, helpers
+
+from llama_index.core import Document
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import BaseNode, MetadataMode, TransformComponent
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+
+from sources import SOURCE_FILE_KEY, iter_source_items
+from embedding_stage import EmbeddingStage
+from matryoshka import encode_full, truncate
+
+logger = logging.getLogger(__name__)
+
+# --- Pipelined ingestion ---
+# Documents are parsed lazily, chunked and embedded in fixed-size batches, and
+# each finished batch is bulk-written on a background thread while the next
+# batch is prepared. At most INGEST_MAX_PENDING_WRITES batches wait for
+# OpenSearch, so memory stays bounded by batch size, not corpus size.
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "128"))
+INGEST_MAX_PENDING_WRITES = int(os.getenv("INGEST_MAX_PENDING_WRITES", "2"))
+INGEST_BULK_MAX_CHUNK_BYTES = int(os.getenv("INGEST_BULK_MAX_CHUNK_BYTES", str(10 * 1024 * 1024)))
+
+# --- Parallel parsing ---
+# HTML cleaning, opening hours and WKT parsing are CPU bound. With more than one
+# worker, source items are sent in chunks of INGEST_PARSE_CHUNK to a process
+# pool and results come back in submission order, so the document order (and
+# thus batching, diffing and logging) is the same as with a single process.
+# 0 workers = one per CPU but one (for embedding and writing), at most
+# INGEST_PARSE_MAX_WORKERS; 1 = parse in-process.
+# Workers are started with forkserver (spawn where that is missing), never
+# fork: the ingester already runs threads, SQLite and possibly torch. `parse`
+# and `prepare` must therefore be importable module-level functions (or
+# staticmethods); scripts passing their own must not load models on import.
+# Create the pool once with parse_pool() and hand it to every iter_documents
+# call, the worker start-up is paid once per run.
+# An optional `prepare` function sees all items of a chunk at once (e.g. the
+# vectorized track geometry in geometry.py) and hands each item's share to
+# `parse` as a third argument; its per-item errors are counted as warnings,
+# the item itself is still parsed.
+INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", "0"))
+INGEST_PARSE_MAX_WORKERS = int(os.getenv("INGEST_PARSE_MAX_WORKERS", "8"))
+INGEST_PARSE_CHUNK = int(os.getenv("INGEST_PARSE_CHUNK", "256"))
+INGEST_PARSE_LOG_ERRORS = 20
+
+ParseFn = Callable[..., Document]
+# items, file_path -> one (value, error) per item
+PrepareFn = Callable[[List[Dict[str, Any]], str], List[Tuple[Any, Optional[str]]]]
+# (id, text, metadata, excluded_embed_metadata_keys, excluded_llm_metadata_keys)
+PackedDocument = Tuple[str, str, Dict[str, Any], List[str], List[str]]
+
+
+@dataclass
+class ParseReport:
+    items: int = 0
+    documents: int = 0
+    failed_files: List[str] = field(default_factory=list)
+    item_errors: int = 0
+    item_warnings: int = 0
+
+    def item_failed(self, file_path: str, message: str):
+        self.item_errors += 1
+        if self.item_errors <= INGEST_PARSE_LOG_ERRORS:
+            logger.warning(f"Parse-Fehler in {file_path}: {message}")
+
+    def item_warned(self, file_path: str, message: str):
+        self.item_warnings += 1
+        if self.item_warnings <= INGEST_PARSE_LOG_ERRORS:
+            logger.warning(f"Unvollständig in {file_path}: {message}")
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def chunk_id(i: int, doc: BaseNode) -> str:
+    """
+    Deterministic node id (`id_func` of the splitter): writing the same
+    document again overwrites its chunks instead of adding new ones.
+    """
+    return f"{doc.node_id}#{i}"
+
+
+def pack_document(doc: Document) -> PackedDocument:
+    return (doc.id_, doc.text, doc.metadata, doc.excluded_embed_metadata_keys, doc.excluded_llm_metadata_keys)
+
+
+def unpack_document(packed: PackedDocument) -> Document:
+    doc_id, text, metadata, excluded_embed, excluded_llm = packed
+    return Document(
+        id_=doc_id,
+        text=text,
+        metadata=metadata,
+        excluded_embed_metadata_keys=excluded_embed,
+        excluded_llm_metadata_keys=excluded_llm,
+    )
+
+
+def _item_id(item: Any) -> str:
+    return item.get("@id", "?") if isinstance(item, dict) else "?"
+
+
+def parse_chunk(
+    parse: ParseFn, items: List[Dict[str, Any]], file_path: str, prepare: Optional[PrepareFn] = None
+) -> Tuple[List[Tuple[Optional[PackedDocument], Optional[str]]], List[str]]:
+    """
+    Runs in a worker process; returns (packed document, None) or (None, error)
+    per item, plus the per-item warnings of `prepare`.
+    """
+    warnings: List[str] = []
+    prepared: Optional[List[Any]] = None
+    if prepare is not None:
+        try:
+            prepared = []
+            for item, (value, error) in zip(items, prepare(items, file_path)):
+                prepared.append(value)
+                if error is not None:
+                    warnings.append(f"{_item_id(item)}: {error}")
+        except Exception as e:
+            # a broken batch stage must not cost the documents, parse without it
+            warnings.append(f"prepare: {type(e).__name__}: {e}")
+            prepared = [None] * len(items)
+
+    results = []
+    for i, item in enumerate(items):
+        try:
+            doc = parse(item, file_path) if prepared is None else parse(item, file_path, prepared[i])
+            results.append((pack_document(doc), None))
+        except Exception as e:
+            results.append((None, f"{_item_id(item)}: {type(e).__name__}: {e}"))
+    return results, warnings
+
+
+def parse_workers(workers: int = INGEST_PARSE_WORKERS) -> int:
+    if workers > 0:
+        return workers
+    # the CPUs this process may use (container limits via affinity), one left for the pipeline
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    return max(1, min(cpus - 1, INGEST_PARSE_MAX_WORKERS))
+
+
+def parse_pool(workers: int = INGEST_PARSE_WORKERS) -> Optional[ProcessPoolExecutor]:
+    """Process pool for iter_documents; None if parsing runs in-process."""
+    workers = parse_workers(workers)
+    if workers == 1:
+        return None
+    methods = multiprocessing.get_all_start_methods()
+    method = "forkserver" if "forkserver" in methods else "spawn"
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+
+def iter_documents(
+    files: Sequence[str],
+    parse: ParseFn,
+    report: Optional[ParseReport] = None,
+    workers: int = INGEST_PARSE_WORKERS,
+    chunk_size: int = INGEST_PARSE_CHUNK,
+    prepare: Optional[PrepareFn] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+) -> Iterator[Document]:
+    """
+    Yields one Document per source item, in source order, with its file in
+    metadata[SOURCE_FILE_KEY] (kept out of embed and LLM text). Unparseable
+    items are skipped, broken files logged; both are counted in `report`.
+    Without `executor` a pool of `workers` processes is created for this
+    call and shut down afterwards. With a shared one (from parse_pool), pass
+    the `workers` it was built with: it sizes the window of chunks in flight.
+    """
+    report = report if report is not None else ParseReport()
+    workers = parse_workers(workers)
+
+    if executor is None and workers == 1:
+        for file_path in files:
+            try:
+                logger.info(f"Verarbeite: {file_path}")
+                for items in batched(iter_source_items(file_path), chunk_size):
+                    yield from _collect(parse_chunk(parse, items, file_path, prepare), file_path, report, len(items))
+            except Exception as e:
+                logger.error(f"Fehler in {file_path}: {e}")
+                report.failed_files.append(file_path)
+        return
+
+    if executor is None:
+        with parse_pool(workers) as executor:
+            yield from _iter_parallel(files, parse, report, workers, chunk_size, prepare, executor)
+    else:
+        yield from _iter_parallel(files, parse, report, workers, chunk_size, prepare, executor)
+
+
+def _iter_parallel(
+    files: Sequence[str],
+    parse: ParseFn,
+    report: ParseReport,
+    workers: int,
+    chunk_size: int,
+    prepare: Optional[PrepareFn],
+    executor: ProcessPoolExecutor,
+) -> Iterator[Document]:
+    # at most 2 chunks per worker in flight: bounded memory, workers never idle
+    pending: Deque[Tuple[Future, str, int]] = deque()
+    try:
+        for file_path in files:
+            try:
+                logger.info(f"Verarbeite: {file_path}")
+                for items in batched(iter_source_items(file_path), chunk_size):
+                    while len(pending) >= 2 * workers:
+                        yield from _collect_future(pending.popleft(), report)
+                    pending.append((executor.submit(parse_chunk, parse, items, file_path, prepare), file_path, len(items)))
+            except Exception as e:
+                logger.error(f"Fehler in {file_path}: {e}")
+                report.failed_files.append(file_path)
+        while pending:
+            yield from _collect_future(pending.popleft(), report)
+    finally:
+        # a shared pool outlives this call: drop what is still queued for it
+        for future, _, _ in pending:
+            future.cancel()
+
+
+def _collect(chunk, file_path: str, report: ParseReport, items: int) -> Iterator[Document]:
+    results, warnings = chunk
+    report.items += items
+    for warning in warnings:
+        report.item_warned(file_path, warning)
+    for packed, error in results:
+        if error is not None:
+            report.item_failed(file_path, error)
+            continue
+        doc = unpack_document(packed)
+        if doc.id_:
+            doc.metadata[SOURCE_FILE_KEY] = file_path
+            for keys in (doc.excluded_embed_metadata_keys, doc.excluded_llm_metadata_keys):
+                if SOURCE_FILE_KEY not in keys:
+                    keys.append(SOURCE_FILE_KEY)
+            report.documents += 1
+            yield doc
+
+
+def _collect_future(entry: Tuple[Future, str, int], report: ParseReport) -> Iterator[Document]:
+    future, file_path, items = entry
+    try:
+        chunk = future.result()
+    except Exception as e:
+        # the whole chunk was lost (worker crashed or results not picklable)
+        logger.error(f"Fehler in {file_path}: {e}")
+        if file_path not in report.failed_files:
+            report.failed_files.append(file_path)
+        return
+    yield from _collect(chunk, file_path, report, items)
+
+
+class OpenSearchBulkWriter:
+    """
+    Writes embedded nodes with the same document layout as LlamaIndex's
+    OpensearchVectorClient (embedding, text field, `metadata`), so the index
+    stays readable through OpensearchVectorStore. Unlike the LlamaIndex
+    client it does not refresh the index after every batch.
+    """
+
+    def __init__(
+        self,
+        os_client: OpenSearch,
+        index: str,
+        embedding_field: str = "embedding",
+        text_field: str = "description",
+        max_chunk_bytes: int = INGEST_BULK_MAX_CHUNK_BYTES,
+        vector_transform: Optional[Callable[[List[float]], List[Any]]] = None,
+        search_dim: Optional[int] = None,
+        full_vector_field: Optional[str] = None,
+    ):
+        self.os_client = os_client
+        self.index = index
+        self.embedding_field = embedding_field
+        self.text_field = text_field
+        self.max_chunk_bytes = max_chunk_bytes
+        # e.g. int8 quantization for byte-vector indices (vector_mapping.py)
+        self.vector_transform = vector_transform
+        # truncated search vector + float16 full copy for rescoring (matryoshka.py)
+        self.search_dim = search_dim
+        self.full_vector_field = full_vector_field
+
+    def to_action(self, node: BaseNode) -> Dict[str, Any]:
+        full = node.get_embedding()
+        embedding = truncate(full, self.search_dim) if self.search_dim else full
+        if self.vector_transform is not None:
+            embedding = self.vector_transform(embedding)
+        action = {
+            "_op_type": "index",
+            "_index": self.index,
+            "_id": node.node_id,
+            self.embedding_field: embedding,
+            self.text_field: node.get_content(metadata_mode=MetadataMode.NONE),
+            "metadata": node_to_metadata_dict(node, remove_text=True),
+        }
+        if self.full_vector_field:
+            action[self.full_vector_field] = encode_full(full)
+        return action
+
+    def write(self, nodes: Sequence[BaseNode]) -> int:
+        success, errors = helpers.bulk(
+            self.os_client,
+            (self.to_action(node) for node in nodes),
+            max_chunk_bytes=self.max_chunk_bytes,
+            raise_on_error=False,
+        )
+        if errors:
+            raise RuntimeError(f"Bulk write failed for {len(errors)} nodes, first error: {errors[0]}")
+        return success
+
+    def delete(self, ids: Sequence[str]) -> int:
+        if not ids:
+            return 0
+        success, errors = helpers.bulk(
+            self.os_client,
+            ({"_op_type": "delete", "_index": self.index, "_id": _id} for _id in ids),
+            max_chunk_bytes=self.max_chunk_bytes,
+            raise_on_error=False,
+        )
+        # already gone is fine, anything else is not
+        errors = [e for e in errors if e.get("delete", {}).get("status") != 404]
+        if errors:
+            raise RuntimeError(f"Bulk delete failed for {len(errors)} chunks, first error: {errors[0]}")
+        return success
+
+    def refresh(self):
+        self.os_client.indices.refresh(index=self.index)
+
+
+class IngestionPipeline:
+    def __init__(
+        self,
+        writer: OpenSearchBulkWriter,
+        transformations: List[TransformComponent],
+        embed_model: BaseEmbedding,
+        batch_size: int = INGEST_BATCH_SIZE,
+        max_pending_writes: int = INGEST_MAX_PENDING_WRITES,
+        embedder: Optional[EmbeddingStage] = None,
+    ):
+        self.writer = writer
+        self.transformations = transformations
+        self.embed_model = embed_model
+        self.embedder = embedder or EmbeddingStage(embed_model)
+        self.batch_size = batch_size
+        self.max_pending_writes = max(max_pending_writes, 1)
+
+    def prepare(self, documents: List[Document]) -> List[BaseNode]:
+        """Chunks and embeds one batch of documents."""
+        nodes: List[BaseNode] = list(documents)
+        for transform in self.transformations:
+            nodes = transform(nodes)
+
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        embeddings = self.embedder.embed(texts)
+        for node, embedding in zip(nodes, embeddings):
+            node.embedding = embedding
+        return nodes
+
+    def run(
+        self,
+        documents: Iterable[Document],
+        on_committed: Optional[Callable[[List[Document], List[BaseNode]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        `on_committed(documents, nodes)` is called on this thread, in batch
+        order, once the bulk write of a batch has succeeded (checkpoints).
+        """
+        stats = {"batches": 0, "documents": 0, "nodes": 0, "seconds": 0.0}
+        started = time.perf_counter()
+        pending: Deque[Tuple[Future, List[Document], List[BaseNode]]] = deque()
+
+        def wait_oldest():
+            future, batch_docs, batch_nodes = pending.popleft()
+            future.result()
+            if on_committed is not None:
+                on_committed(batch_docs, batch_nodes)
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk-writer") as executor:
+            for batch_no, batch in enumerate(batched(documents, self.batch_size), start=1):
+                nodes = self.prepare(batch)
+
+                # backpressure: wait for the oldest write before queueing another
+                while len(pending) >= self.max_pending_writes:
+                    wait_oldest()
+                pending.append((executor.submit(self.writer.write, nodes), batch, nodes))
+
+                stats["batches"] = batch_no
+                stats["documents"] += len(batch)
+                stats["nodes"] += len(nodes)
+                logger.info(f"Batch {batch_no}: {len(batch)} Dokumente, {len(nodes)} Chunks vorbereitet")
+
+            while pending:
+                wait_oldest()
+
+        if stats["nodes"]:
+            self.writer.refresh()
+        stats["seconds"] = round(time.perf_counter() - started, 2)
+        stats["embedding"] = self.embedder.summary()
+        return stats
@@ -0,0 +1,260 @@
+import os
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from opensearchpy import OpenSearch
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from matryoshka import truncate
+from opening_hours import minute_of_week
+from query_cache import SemanticResultCache
+
+logger = logging.getLogger(__name__)
+
+# --- Hybrid POI search ---
+# One OpenSearch request per query: a `hybrid` query with a BM25 part
+# (multi_match on name, description, city, type) and a kNN part on
+# `embedding`, both with the same filters (city, type, geo distance, open
+# at). The search pipeline POI_SEARCH_PIPELINE merges the two result lists:
+#   min_max  normalization-processor, scores min-max normalized and
+#            combined by arithmetic mean with weights
+#            [POI_SEARCH_LEXICAL_WEIGHT, 1 - POI_SEARCH_LEXICAL_WEIGHT]
+#   rrf      score-ranker-processor, reciprocal rank fusion (OpenSearch >= 2.19)
+# The pipeline is (re)created when the service starts. With EMBED_SEARCH_DIM
+# the kNN part searches on the truncated vector; there is no full-vector
+# rescoring here, the lexical part already reorders the candidates.
+# Query embeddings and (optionally) whole results are cached, see query_cache.py.
+# Long descriptions are split into several chunks (<id>#0, <id>#1, ...), so a
+# POI can match more than once. The search asks for POI_SEARCH_OVERFETCH hits
+# per result and keeps the best chunk of each POI (metadata.source_id).
+POI_SEARCH_PIPELINE = os.getenv("POI_SEARCH_PIPELINE", "poi-hybrid")
+POI_SEARCH_FUSION = os.getenv("POI_SEARCH_FUSION", "min_max")
+POI_SEARCH_LEXICAL_WEIGHT = float(os.getenv("POI_SEARCH_LEXICAL_WEIGHT", "0.3"))
+POI_SEARCH_RRF_RANK_CONSTANT = int(os.getenv("POI_SEARCH_RRF_RANK_CONSTANT", "60"))
+# kNN candidates per query (at least k)
+POI_SEARCH_CANDIDATES = int(os.getenv("POI_SEARCH_CANDIDATES", "50"))
+POI_SEARCH_OVERFETCH = int(os.getenv("POI_SEARCH_OVERFETCH", "3"))
+POI_SEARCH_SNIPPET_CHARS = int(os.getenv("POI_SEARCH_SNIPPET_CHARS", "300"))
+
+LEXICAL_FIELDS = ["metadata.name^3", "description", "metadata.city^2", "metadata.type"]
+
+# what a hit carries back: no vectors, no geometry
+COMPACT_SOURCE = [
+    "description",
+    "metadata.source_id",
+    "metadata.name",
+    "metadata.type",
+    "metadata.city",
+    "metadata.street",
+    "metadata.postal_code",
+    "metadata.location",
+    "metadata.website",
+    "metadata.telephone",
+    "metadata.openingHoursSpecification",
+    "metadata.startDate",
+    "metadata.endDate",
+]
+
+
+def search_pipeline_body(
+    fusion: str = POI_SEARCH_FUSION,
+    lexical_weight: float = POI_SEARCH_LEXICAL_WEIGHT,
+    rank_constant: int = POI_SEARCH_RRF_RANK_CONSTANT,
+) -> Dict[str, Any]:
+    if fusion == "rrf":
+        processor = {
+            "score-ranker-processor": {"combination": {"technique": "rrf", "rank_constant": rank_constant}}
+        }
+    elif fusion == "min_max":
+        processor = {
+            "normalization-processor": {
+                "normalization": {"technique": "min_max"},
+                "combination": {
+                    "technique": "arithmetic_mean",
+                    # same order as the sub-queries: lexical, kNN
+                    "parameters": {"weights": [lexical_weight, round(1.0 - lexical_weight, 6)]},
+                },
+            }
+        }
+    else:
+        raise ValueError(f"POI_SEARCH_FUSION muss 'min_max' oder 'rrf' sein, nicht '{fusion}'")
+    return {
+        "description": f"POI hybrid search: BM25 + kNN ({fusion})",
+        "phase_results_processors": [processor],
+    }
+
+
+def ensure_search_pipeline(os_client: OpenSearch, name: str = POI_SEARCH_PIPELINE, body: Optional[Dict[str, Any]] = None):
+    os_client.search_pipeline.put(id=name, body=body or search_pipeline_body())
+    logger.info(f"Search-Pipeline '{name}' gesetzt.")
+
+
+def check_embedding_dimension(os_client: OpenSearch, index: str, dim: int, field: str = "embedding"):
+    """
+    Fails fast when the index (or any index behind the alias) stores vectors
+    of another length than the query vectors: a different embedding model or
+    EMBED_SEARCH_DIM than at ingest would otherwise only fail per request.
+    """
+    if not os_client.indices.exists(index=index):
+        logger.warning(f"Index '{index}' existiert noch nicht, Vektor-Dimension ungeprüft.")
+        return
+    for name, mapping in os_client.indices.get_mapping(index=index).items():
+        vector = mapping.get("mappings", {}).get("properties", {}).get(field, {})
+        if "model_id" in vector:
+            # VECTOR_COMPRESSION=pq: the dimension comes from the trained model
+            continue
+        if vector.get("dimension") != dim:
+            raise RuntimeError(
+                f"Index '{name}': '{field}' hat {vector.get('dimension')} Dimensionen, die Suche {dim} "
+                "(EMBEDDING_PROVIDER, EMBED_DIM und EMBED_SEARCH_DIM müssen zum Ingest passen)"
+            )
+
+
+def filter_clauses(
+    city: Optional[str] = None,
+    types: Sequence[str] = (),
+    near: Optional[Tuple[float, float, float]] = None,
+    open_at: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Filter clauses for both sub-queries; near = (lat, lon, radius in km)."""
+    clauses: List[Dict[str, Any]] = []
+    if city:
+        clauses.append({"term": {"metadata.city.keyword": city}})
+    if types:
+        clauses.append({"terms": {"metadata.type.keyword": list(types)}})
+    if near is not None:
+        lat, lon, radius_km = near
+        clauses.append({"geo_distance": {"distance": f"{radius_km}km", "metadata.location": {"lat": lat, "lon": lon}}})
+    if open_at is not None:
+        # integer_range: matches the ranges containing the minute (see opening_hours.py)
+        clauses.append({"term": {"metadata.open_minutes": minute_of_week(open_at)}})
+    return clauses
+
+
+def hybrid_query(
+    text: str,
+    vector: Sequence[float],
+    size: int,
+    filters: Sequence[Dict[str, Any]] = (),
+    candidates: int = POI_SEARCH_CANDIDATES,
+) -> Dict[str, Any]:
+    lexical: Dict[str, Any] = {"bool": {"must": [{"multi_match": {"query": text, "fields": LEXICAL_FIELDS}}]}}
+    knn: Dict[str, Any] = {"vector": list(vector), "k": max(candidates, size)}
+    if filters:
+        lexical["bool"]["filter"] = list(filters)
+        # efficient filtering inside the kNN search, not a post-filter
+        knn["filter"] = {"bool": {"filter": list(filters)}}
+    return {
+        "size": size,
+        "_source": {"includes": COMPACT_SOURCE},
+        "query": {"hybrid": {"queries": [lexical, {"knn": {"embedding": knn}}]}},
+    }
+
+
+def compact_hit(hit: Dict[str, Any], snippet_chars: int = POI_SEARCH_SNIPPET_CHARS) -> Dict[str, Any]:
+    source = hit.get("_source", {})
+    metadata = source.get("metadata", {})
+    description = source.get("description") or ""
+    if len(description) > snippet_chars:
+        description = description[:snippet_chars].rsplit(" ", 1)[0] + " …"
+    return {
+        "id": hit["_id"],
+        "score": hit.get("_score"),
+        "source_id": metadata.get("source_id"),
+        "name": metadata.get("name"),
+        "type": metadata.get("type"),
+        "city": metadata.get("city"),
+        "street": metadata.get("street"),
+        "postal_code": metadata.get("postal_code"),
+        "location": metadata.get("location"),
+        "website": metadata.get("website"),
+        "telephone": metadata.get("telephone"),
+        "opening_hours": metadata.get("openingHoursSpecification"),
+        "start_date": metadata.get("startDate"),
+        "end_date": metadata.get("endDate"),
+        "snippet": description,
+    }
+
+
+def collapse_hits(hits: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+    """First (best) chunk per POI, at most k; hits come sorted by score."""
+    seen = set()
+    collapsed = []
+    for hit in hits:
+        key = hit.get("source_id") or hit["id"].split("#")[0]
+        if key in seen:
+            continue
+        seen.add(key)
+        collapsed.append(hit)
+        if len(collapsed) == k:
+            break
+    return collapsed
+
+
+class PoiSearch:
+    """
+    Keeps client and embedding model; one search = one query embedding + one
+    OpenSearch request, or none if `result_cache` has a near-identical query
+    with the same filters.
+    """
+
+    def __init__(
+        self,
+        os_client: OpenSearch,
+        index: str,
+        embed_model: BaseEmbedding,
+        dim: int,
+        query_transform: Optional[Callable[[List[float]], Sequence[float]]] = None,
+        pipeline: str = POI_SEARCH_PIPELINE,
+        candidates: int = POI_SEARCH_CANDIDATES,
+        result_cache: Optional[SemanticResultCache] = None,
+        overfetch: int = POI_SEARCH_OVERFETCH,
+    ):
+        self.os_client = os_client
+        self.index = index
+        self.embed_model = embed_model
+        self.dim = dim
+        # e.g. int8 quantization for byte-vector indices (vector_mapping.vector_transform)
+        self.query_transform = query_transform
+        self.pipeline = pipeline
+        self.candidates = candidates
+        self.result_cache = result_cache
+        self.overfetch = max(overfetch, 1)
+
+    def query_vector(self, text: str) -> List[float]:
+        return self.search_vector(self.embed_model.get_query_embedding(text))
+
+    def search_vector(self, vector: Sequence[float]) -> List[float]:
+        if len(vector) > self.dim:
+            vector = truncate(vector, self.dim)
+        if self.query_transform is not None:
+            vector = [float(v) for v in self.query_transform(vector)]
+        return list(vector)
+
+    def search(
+        self,
+        text: str,
+        k: int = 10,
+        city: Optional[str] = None,
+        types: Sequence[str] = (),
+        near: Optional[Tuple[float, float, float]] = None,
+        open_at: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        vector = self.embed_model.get_query_embedding(text)
+        filters = filter_clauses(city=city, types=types, near=near, open_at=open_at)
+        # the semantic cache compares full query vectors, but only between equal filters and k
+        cache_key = (k, json.dumps(filters, sort_keys=True))
+        if self.result_cache is not None:
+            cached = self.result_cache.get(vector, cache_key)
+            if cached is not None:
+                return cached
+
+        size = k * self.overfetch
+        body = hybrid_query(text, self.search_vector(vector), size=size, filters=filters, candidates=self.candidates)
+        response = self.os_client.search(index=self.index, body=body, params={"search_pipeline": self.pipeline})
+        hits = collapse_hits([compact_hit(hit) for hit in response["hits"]["hits"]], k)
+        if self.result_cache is not None:
+            self.result_cache.put(vector, cache_key, hits)
+        return hits
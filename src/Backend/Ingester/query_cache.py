@@ -0,0 +1,205 @@
+import os
+import re
+import time
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+# --- Query-side caches ---
+# QUERY_EMBED_CACHE_SIZE: in-memory LRU of query embeddings keyed by the
+# normalized query ("Wandern und Berge" == "wandern & berge"), in front of
+# the remote model (and of the SQLite cache in embedding_cache.py, which
+# only matches exact texts). 0 disables.
+# SEMANTIC_CACHE_*: result cache of the search service. A query whose
+# embedding has cosine >= SEMANTIC_CACHE_THRESHOLD to a cached query with
+# the same filters and k gets that query's results. Entries expire after
+# SEMANTIC_CACHE_TTL_SEC so re-ingested data shows up. Size 0 disables.
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "4096"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "0"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+SEMANTIC_CACHE_TTL_SEC = float(os.getenv("SEMANTIC_CACHE_TTL_SEC", "600"))
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize_query(text: str) -> str:
+    """Case, Unicode form, '&' vs 'und', punctuation and whitespace do not change the key."""
+    text = unicodedata.normalize("NFKC", text).casefold().replace("&", " und ")
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+
+def _hit_rate(hits: int, misses: int) -> Dict[str, Any]:
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "rate": round(hits / total, 3) if total else 0.0}
+
+
+class QueryEmbeddingLRU(BaseEmbedding):
+    """Query embeddings from a bounded in-memory LRU; text (document) embeddings pass through."""
+
+    max_entries: int = 0
+    _inner: BaseEmbedding = PrivateAttr()
+    _entries: "OrderedDict[str, Embedding]" = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr()
+    _hits: int = PrivateAttr(default=0)
+    _misses: int = PrivateAttr(default=0)
+
+    def __init__(self, inner: BaseEmbedding, max_entries: int = QUERY_EMBED_CACHE_SIZE, **kwargs: Any):
+        super().__init__(
+            model_name=inner.model_name,
+            embed_batch_size=inner.embed_batch_size,
+            max_entries=max_entries,
+            **kwargs,
+        )
+        self._inner = inner
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "QueryEmbeddingLRU"
+
+    @property
+    def inner(self) -> BaseEmbedding:
+        return self._inner
+
+    @property
+    def hit_rate(self) -> Dict[str, Any]:
+        return {**_hit_rate(self._hits, self._misses), "entries": len(self._entries)}
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        key = normalize_query(query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return vector
+            self._misses += 1
+
+        # outside the lock: concurrent misses for different queries do not wait on each other
+        vector = self._inner.get_query_embedding(query)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vector
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._inner.get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._inner.get_text_embedding_batch(texts)
+
+
+def with_query_cache(embed_model: BaseEmbedding, max_entries: int = QUERY_EMBED_CACHE_SIZE) -> BaseEmbedding:
+    if max_entries <= 0:
+        return embed_model
+    return QueryEmbeddingLRU(embed_model, max_entries=max_entries)
+
+
+class SemanticResultCache:
+    """
+    Bounded LRU of (query vector, filter key) -> results with TTL. A lookup
+    is a hit if a live entry with the same key has cosine similarity >=
+    threshold; the vectors are kept normalized in one matrix, so a lookup
+    is a single matrix-vector product.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SEMANTIC_CACHE_SIZE,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_sec: float = SEMANTIC_CACHE_TTL_SEC,
+    ):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        # row -> (key, stored at, last used, results); free rows are None
+        self._rows: List[Optional[Tuple[Hashable, float, float, Any]]] = []
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def hit_rate(self) -> Dict[str, Any]:
+        return {**_hit_rate(self._hits, self._misses), "entries": len(self)}
+
+    def __len__(self) -> int:
+        return sum(1 for row in self._rows if row is not None)
+
+    @staticmethod
+    def _normalized(vector: Sequence[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm else v
+
+    def get(self, vector: Sequence[float], key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        query = self._normalized(vector)
+        now = time.monotonic()
+        with self._lock:
+            best, best_score = None, self.threshold
+            if self._vectors is not None and self._vectors.shape[1] == query.shape[0]:
+                scores = self._vectors @ query
+                for row in np.flatnonzero(scores >= self.threshold):
+                    entry = self._rows[row]
+                    if entry is None or entry[0] != key:
+                        continue
+                    if now - entry[1] >= self.ttl_sec:
+                        self._rows[row] = None
+                        continue
+                    if scores[row] >= best_score:
+                        best, best_score = row, float(scores[row])
+            if best is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            entry = self._rows[best]
+            self._rows[best] = (entry[0], entry[1], now, entry[3])
+            return entry[3]
+
+    def put(self, vector: Sequence[float], key: Hashable, results: Any):
+        if not self.enabled:
+            return
+        v = self._normalized(vector)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != v.shape[0]:
+                self._vectors = np.zeros((self.max_entries, v.shape[0]), dtype=np.float32)
+                self._rows = [None] * self.max_entries
+            row = self._free_row(now)
+            self._vectors[row] = v
+            self._rows[row] = (key, now, now, results)
+
+    def _free_row(self, now: float) -> int:
+        # empty or expired row first, otherwise the least recently used one
+        oldest, oldest_used = 0, float("inf")
+        for i, entry in enumerate(self._rows):
+            if entry is None or now - entry[1] >= self.ttl_sec:
+                return i
+            if entry[2] < oldest_used:
+                oldest, oldest_used = i, entry[2]
+        return oldest
+
+    def clear(self):
+        with self._lock:
+            self._vectors = None
+            self._rows = []
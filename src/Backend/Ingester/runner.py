@@ -0,0 +1,352 @@
+"""
+Gemeinsamer Ablauf der Ingest-Skripte: Index anlegen, Ledger/Resume, --reindex
+über Index-Versionen, pipelined bzw. classic Ingestion.
+
+Die Skripte (ingestor_v2.py, ingest_with_llamaindex.py) liefern nur das, was
+sich unterscheidet: parse_to_document, das Index-Mapping und das Embedding-Modell.
+
+    runner.main(
+        "BayernCloud POIs in OpenSearch ingestieren",
+        parse=parse_to_document,
+        index_body=index_body,
+        load_embed_model=load_embed_model,
+        embed_dim=EMBED_DIM,
+    )
+
+parse (und prepare) müssen Modul-Funktionen sein: sie gehen an die Parse-Prozesse
+(forkserver/spawn, siehe pipeline.py), die das Skript dafür neu importieren.
+"""
+
+import os
+import logging
+import argparse
+from typing import Any, Callable, Dict, List, Optional
+
+from opensearchpy import OpenSearch, RequestsHttpConnection
+
+from llama_index.core import Document, Settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.node_parser import SentenceSplitter
+
+from sources import list_source_files
+from pipeline import IngestionPipeline, OpenSearchBulkWriter, ParseReport, chunk_id, iter_documents, parse_pool, parse_workers
+from embedding_stage import EmbeddingStage
+from vector_mapping import VECTOR_COMPRESSION, vector_transform
+from matryoshka import FULL_VECTOR_FIELD, search_dim
+from index_versions import IndexVersions
+from ingest_ledger import INGEST_LEDGER_PATH, IngestLedger, IngestRun
+from index_state import INGEST_DIFF, INGEST_DELETE_MISSING, DocumentDiff, fetch_indexed_documents
+
+# --- Konfiguration ---
+OPENSEARCH_HOST = os.getenv("OPENSEARCH_HOST", "localhost")
+OPENSEARCH_PORT = int(os.getenv("OPENSEARCH_PORT", "9200"))
+OPENSEARCH_AUTH = None
+
+DATA_DIR = os.getenv("BAYERNCLOUD_DATA_DIR", "../api-gateway/bayerncloud-data")
+FILE_PATTERN = os.getenv("BAYERNCLOUD_FILE_PATTERN", "bayerncloud*.json")
+
+# "pipelined": Batches parsen/embedden/schreiben (begrenzter Speicher, siehe pipeline.py)
+# "classic":   alle Dokumente laden, dann VectorStoreIndex.from_documents
+INGEST_MODE = os.getenv("INGEST_MODE", "pipelined")
+
+logger = logging.getLogger(__name__)
+
+
+def opensearch_client() -> OpenSearch:
+    return OpenSearch(
+        hosts=[{'host': OPENSEARCH_HOST, 'port': OPENSEARCH_PORT}],
+        http_auth=OPENSEARCH_AUTH,
+        use_ssl=False,
+        verify_certs=False,
+        connection_class=RequestsHttpConnection
+    )
+
+
+class IngestRunner:
+    """
+    os_client:   OpenSearch-Client
+    index_name:  POI_INDEX (Index oder Alias); bei --reindex die neue Version
+    index_body:  () -> Settings + Mappings für neue Indizes/Versionen
+    parse:       (raw_doc, filename[, geometry]) -> Document, picklebar
+    embed_model: fertiges (gecachtes) Embedding-Modell
+    embed_dim:   volle Vektorlänge des Modells (EMBED_DIM)
+    prepare:     optional (raw_docs, filename) -> [(extra, error)] pro Datei-Chunk
+    embedder:    optional eigene EmbeddingStage (z.B. lokales Modell mit max_in_flight=1)
+    """
+
+    def __init__(
+        self,
+        os_client: OpenSearch,
+        index_name: str,
+        index_body: Callable[[], Dict[str, Any]],
+        parse: Callable[..., Document],
+        embed_model: BaseEmbedding,
+        embed_dim: int,
+        prepare: Optional[Callable[[List[Dict], str], List]] = None,
+        embedder: Optional[EmbeddingStage] = None,
+    ):
+        self.os_client = os_client
+        self.index_name = index_name
+        self.index_body = index_body
+        self.parse = parse
+        self.prepare = prepare
+        self.embed_model = embed_model
+        self.embedder = embedder
+        self.embed_dim = embed_dim
+        # HNSW-Suchfeld mit weniger Dimensionen, Vollvektor nur zum Rescoring (EMBED_SEARCH_DIM)
+        self.search_dim = search_dim(embed_dim)
+        self.rescore = self.search_dim < embed_dim
+
+    def create_index_if_not_exists(self):
+        """Erstellt den Index manuell mit FAISS, bevor LlamaIndex ihn berührt."""
+        if not self.os_client.indices.exists(index=self.index_name):
+            self.os_client.indices.create(index=self.index_name, body=self.index_body())
+            logger.info(f"Index '{self.index_name}' erstellt.")
+        else:
+            logger.info(f"Index '{self.index_name}' existiert bereits.")
+
+    def run(self, resume: bool = False):
+        # 1. Index vorbereiten (FAISS + Mappings)
+        self.create_index_if_not_exists()
+        ledger = self.open_ledger(resume)
+        try:
+            run = self.open_run(ledger, self.index_name, resume)
+            stats = self.ingest(run)
+            if run is not None:
+                run.finish(stats)
+        finally:
+            if ledger is not None:
+                ledger.close()
+
+    def open_ledger(self, resume: bool) -> Optional[IngestLedger]:
+        """Fortschritts-Ledger (siehe ingest_ledger.py); None = ohne Checkpoints."""
+        if not INGEST_LEDGER_PATH or INGEST_MODE != "pipelined":
+            if resume:
+                raise ValueError("--resume braucht INGEST_LEDGER_PATH und INGEST_MODE=pipelined")
+            return None
+        return IngestLedger()
+
+    def open_run(self, ledger: Optional[IngestLedger], target: str, resume: bool) -> Optional[IngestRun]:
+        if ledger is None:
+            return None
+        unfinished = ledger.unfinished(target) if resume else None
+        if resume and unfinished is None:
+            logger.warning(f"Kein unfertiger Lauf für '{target}', starte neu.")
+        return ledger.begin(target, self.index_name, unfinished)
+
+    def reindex(self, resume: bool = False):
+        """Baut eine neue Index-Version und schwenkt den Alias erst danach um (siehe index_versions.py)."""
+        versions = IndexVersions(self.os_client)
+        target = f"reindex:{versions.alias}"
+        ledger = self.open_ledger(resume)
+        try:
+            self.build_version(versions, target, ledger, resume)
+        finally:
+            if ledger is not None:
+                ledger.close()
+
+    def build_version(self, versions: IndexVersions, target: str, ledger: Optional[IngestLedger], resume: bool):
+        # --resume: die unfertige Version des letzten Laufs weiterbauen
+        unfinished = ledger.unfinished(target) if resume and ledger is not None else None
+        reuse = bool(unfinished) and self.os_client.indices.exists(index=unfinished[1])
+        self.index_name = unfinished[1] if reuse else versions.new_index_name()
+        run = self.open_run(ledger, target, resume and reuse)
+        if run is not None:
+            # aufgegebene Läufe werden nie fortgesetzt: ihre halbfertigen Versionen löschen
+            for index in run.abandoned_indexes:
+                if index != self.index_name:
+                    versions.discard(index)
+        if reuse:
+            logger.info(f"Setze Index-Version '{self.index_name}' fort.")
+        else:
+            versions.create(self.index_name, self.index_body())
+
+        try:
+            stats = self.ingest(run)
+        except BaseException:
+            if run is None:
+                versions.discard(self.index_name)
+            else:
+                logger.error(
+                    f"Reindex abgebrochen, '{self.index_name}' bleibt für --reindex --resume erhalten "
+                    "(ein Lauf ohne --resume löscht die Version)."
+                )
+            raise
+
+        # Leere oder lückenhafte Versionen gehen nie live
+        if not (stats.get("documents") or stats.get("resumed_documents")) or stats.get("failed_files"):
+            versions.discard(self.index_name)
+            if run is not None:
+                run.finish(stats, status="failed")
+            raise RuntimeError(f"Reindex abgebrochen, Alias unverändert: {stats}")
+        versions.finalize(self.index_name)
+        if run is not None:
+            run.finish(stats)
+
+    def ingest(self, run: Optional[IngestRun] = None) -> Dict[str, Any]:
+        # 2. Dateien finden
+        files = list_source_files(DATA_DIR, FILE_PATTERN)
+        logger.info(f"Gefunden: {len(files)} Dateien.")
+
+        # Wir nutzen einen Splitter, um sicherzugehen, dass riesige Metadaten nicht crashen
+        # deterministische Chunk-IDs: erneutes Schreiben überschreibt statt zu duplizieren
+        splitter = SentenceSplitter(chunk_size=Settings.chunk_size, chunk_overlap=50, id_func=chunk_id)
+
+        if INGEST_MODE == "pipelined":
+            return self.run_pipelined(files, splitter, run)
+        return self.run_classic(files, splitter)
+
+    def run_pipelined(self, files, splitter, run: Optional[IngestRun] = None):
+        """Parst, chunked, embedded und schreibt in Batches (begrenzter Speicher)."""
+        writer = OpenSearchBulkWriter(
+            self.os_client,
+            self.index_name,
+            embedding_field="embedding",
+            text_field="description",
+            vector_transform=vector_transform(VECTOR_COMPRESSION),
+            search_dim=self.search_dim if self.rescore else None,
+            full_vector_field=FULL_VECTOR_FIELD if self.rescore else None,
+        )
+        pipeline = IngestionPipeline(
+            writer, transformations=[splitter], embed_model=self.embed_model, embedder=self.embedder
+        )
+
+        # der Pool startet einmal, bevor die Pipeline ihre Threads startet
+        report = ParseReport()
+        workers = parse_workers()
+        pool = parse_pool(workers)
+
+        def parse_files(paths):
+            return iter_documents(paths, self.parse, report, workers, prepare=self.prepare, executor=pool)
+
+        if run is not None:
+            # das Ledger erkennt fertige Dateien an metadata.source_file (und überspringt sie beim Fortsetzen)
+            documents = run.documents(files, parse_files, failed_files=report.failed_files)
+        else:
+            documents = parse_files(files)
+
+        # Diff: nur neue/geänderte Dokumente embedden, veraltete Chunks löschen
+        diff = None
+        if INGEST_DIFF:
+            indexed = fetch_indexed_documents(self.os_client, self.index_name)
+            logger.info(f"{len(indexed)} Dokumente bereits im Index '{self.index_name}'.")
+            diff = DocumentDiff(indexed)
+            documents = diff.filter(documents)
+        if run is not None:
+            documents = run.skip_committed(documents)
+
+        def on_committed(batch_docs, batch_nodes):
+            if run is not None:
+                run.commit(batch_docs, batch_nodes)
+            if diff is not None:
+                diff.written(node.node_id for node in batch_nodes)
+
+        try:
+            stats = pipeline.run(documents, on_committed=on_committed)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        if run is not None:
+            stats.update(run.stats)
+        if diff is not None:
+            if run is not None:
+                # Dateien, die ein früherer Versuch schon fertig geschrieben hat, sind nicht "verschwunden"
+                diff.seen.update(run.skipped_doc_ids)
+            # Fehlt eine Quelldatei (Lesefehler), wird nichts als "verschwunden" gelöscht
+            delete_missing = INGEST_DELETE_MISSING and not report.failed_files and bool(diff.seen)
+            stale = diff.stale_chunk_ids(delete_missing=delete_missing)
+            stats["deleted_chunks"] = writer.delete(stale)
+            if stale:
+                writer.refresh()
+            stats.update(diff.stats)
+        stats["parse_errors"] = report.item_errors
+        stats["parse_warnings"] = report.item_warnings
+        stats["failed_files"] = len(report.failed_files)
+
+        if stats["documents"] or stats.get("resumed_documents") or (diff is not None and diff.seen):
+            logger.info(f"Ingestion erfolgreich abgeschlossen: {stats}")
+        else:
+            logger.warning("Keine Dokumente gefunden.")
+        return stats
+
+    def run_classic(self, files, splitter):
+        if VECTOR_COMPRESSION == "byte":
+            raise ValueError("VECTOR_COMPRESSION=byte braucht INGEST_MODE=pipelined (int8-Quantisierung beim Schreiben)")
+        if self.rescore:
+            raise ValueError("EMBED_SEARCH_DIM braucht INGEST_MODE=pipelined (gekürzte Vektoren + Vollkopie beim Schreiben)")
+
+        from llama_index.core import StorageContext, VectorStoreIndex
+        from llama_index.vector_stores.opensearch import OpensearchVectorClient, OpensearchVectorStore
+
+        # LlamaIndex Client verbinden
+        client_wrapper = OpensearchVectorClient(
+            endpoint=f"http://{OPENSEARCH_HOST}:{OPENSEARCH_PORT}",
+            index=self.index_name,
+            dim=self.embed_dim,
+            embedding_field="embedding",
+            text_field="description",
+            method={"name": "hnsw", "engine": "faiss"}, # Wichtig!
+            os_client=self.os_client
+        )
+        vector_store = OpensearchVectorStore(client_wrapper)
+        storage_context = StorageContext.from_defaults(vector_store=vector_store)
+
+        all_documents = list(iter_documents(files, self.parse, prepare=self.prepare))
+
+        # Ingestieren mit Splitter (gegen Chunk-Size Fehler)
+        if all_documents:
+            logger.info(f"Starte Ingestion von {len(all_documents)} Dokumenten...")
+            VectorStoreIndex.from_documents(
+                all_documents,
+                storage_context=storage_context,
+                transformations=[splitter],
+                embed_model=self.embed_model,
+                show_progress=True
+            )
+            logger.info("Ingestion erfolgreich abgeschlossen!")
+        else:
+            logger.warning("Keine Dokumente gefunden.")
+        return {"documents": len(all_documents)}
+
+
+def main(
+    description: str,
+    parse: Callable[..., Document],
+    index_body: Callable[[], Dict[str, Any]],
+    load_embed_model: Callable[[], BaseEmbedding],
+    embed_dim: int,
+    index_name: str,
+    prepare: Optional[Callable[[List[Dict], str], List]] = None,
+    make_embedder: Optional[Callable[[BaseEmbedding], EmbeddingStage]] = None,
+):
+    """Kommandozeile der Ingest-Skripte (--reindex, --resume)."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--reindex",
+        action="store_true",
+        help="neue Index-Version bauen und den Alias POI_ALIAS atomar umschwenken",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="letzten abgebrochenen Lauf fortsetzen: fertige Dateien und geschriebene Dokumente überspringen",
+    )
+    args = parser.parse_args()
+
+    # Nicht beim Import: die Parse-Prozesse (forkserver/spawn) importieren das Skript neu
+    embed_model = load_embed_model()
+    ingestor = IngestRunner(
+        opensearch_client(),
+        index_name,
+        index_body,
+        parse,
+        embed_model,
+        embed_dim,
+        prepare=prepare,
+        embedder=make_embedder(embed_model) if make_embedder is not None else None,
+    )
+    if args.reindex:
+        ingestor.reindex(resume=args.resume)
+    else:
+        ingestor.run(resume=args.resume)
@@ -0,0 +1,133 @@
+"""
+POI search service: hybrid BM25 + kNN over the POI index (see poi_search.py).
+
+    uvicorn search_service:app --host 0.0.0.0 --port 8002
+
+Embedding model, OpenSearch client and search pipeline are set up once at
+start-up; a query is one embedding call plus one OpenSearch request.
+Repeated queries skip the embedding call (in-memory LRU), near-identical
+ones with SEMANTIC_CACHE_SIZE > 0 also the search (see query_cache.py).
+"""
+import os
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+from opensearchpy import OpenSearch, RequestsHttpConnection
+from opensearchpy.exceptions import OpenSearchException
+
+from embedding_cache import with_embedding_cache
+from embedding_models import EMBEDDING_PROVIDER, embed_dim, load_embedding
+from matryoshka import search_dim
+from vector_mapping import vector_transform
+from poi_search import PoiSearch, check_embedding_dimension, ensure_search_pipeline
+from query_cache import SemanticResultCache, with_query_cache
+
+logger = logging.getLogger(__name__)
+
+OPENSEARCH_HOST = os.getenv("OPENSEARCH_HOST", "localhost")
+OPENSEARCH_PORT = int(os.getenv("OPENSEARCH_PORT", "9200"))
+INDEX_NAME = os.getenv("POI_INDEX", "tourism-data")
+
+# Muss zum Ingest passen: azure = ingestor_v2.py, huggingface = ingest_with_llamaindex.py
+# (siehe embedding_models.py); beim Start gegen das Index-Mapping geprüft
+EMBED_DIM = embed_dim(EMBEDDING_PROVIDER)
+
+search: Optional[PoiSearch] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global search
+    # loaded at start-up, the endpoints only need a PoiSearch
+    embed_model = load_embedding(EMBEDDING_PROVIDER)
+    os_client = OpenSearch(
+        hosts=[{"host": OPENSEARCH_HOST, "port": OPENSEARCH_PORT}],
+        use_ssl=False,
+        verify_certs=False,
+        connection_class=RequestsHttpConnection,
+        # one keep-alive pool for all requests
+        pool_maxsize=int(os.getenv("POI_SEARCH_POOL_SIZE", "16")),
+    )
+    check_embedding_dimension(os_client, INDEX_NAME, search_dim(EMBED_DIM))
+    ensure_search_pipeline(os_client)
+    search = PoiSearch(
+        os_client,
+        INDEX_NAME,
+        # memory (normalized text) -> SQLite (exact text) -> model
+        embed_model=with_query_cache(with_embedding_cache(embed_model, EMBED_DIM)),
+        dim=search_dim(EMBED_DIM),
+        query_transform=vector_transform(),
+        result_cache=SemanticResultCache(),
+    )
+    yield
+    os_client.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+class Near(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lon: float = Field(ge=-180, le=180)
+    radius_km: float = Field(default=10, gt=0)
+
+
+class SearchRequest(BaseModel):
+    query: str = Field(min_length=1)
+    k: int = Field(default=10, ge=1, le=100)
+    city: Optional[str] = None
+    types: List[str] = []
+    near: Optional[Near] = None
+    open_at: Optional[datetime] = None  # naive = local time (OPENING_HOURS_TZ)
+
+
+class SearchHit(BaseModel):
+    id: str
+    score: Optional[float] = None
+    source_id: Optional[str] = None
+    name: Optional[str] = None
+    type: Optional[str] = None
+    city: Optional[str] = None
+    street: Optional[str] = None
+    postal_code: Optional[str] = None
+    location: Optional[str] = None
+    website: Optional[str] = None
+    telephone: Optional[str] = None
+    opening_hours: Optional[str] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    snippet: str = ""
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "index": INDEX_NAME}
+
+
+@app.get("/stats")
+def stats():
+    embed_model = search.embed_model
+    caches = {"result_cache": search.result_cache.hit_rate if search.result_cache.enabled else None}
+    # wrapped from the outside in: QueryEmbeddingLRU, CachedEmbedding, model
+    while embed_model is not None:
+        if hasattr(embed_model, "hit_rate"):
+            caches[embed_model.class_name()] = embed_model.hit_rate
+        embed_model = getattr(embed_model, "inner", None)
+    return caches
+
+
+@app.post("/search", response_model=List[SearchHit])
+def search_pois(request: SearchRequest):
+    # sync endpoint: runs in the threadpool, embedding and OpenSearch calls block
+    near = (request.near.lat, request.near.lon, request.near.radius_km) if request.near else None
+    try:
+        return search.search(
+            request.query, k=request.k, city=request.city, types=request.types, near=near, open_at=request.open_at
+        )
+    except OpenSearchException as e:
+        logger.error(f"Suche fehlgeschlagen: {e}")
+        raise HTTPException(status_code=502, detail="OpenSearch-Suche fehlgeschlagen")
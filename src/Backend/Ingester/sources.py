@@ -0,0 +1,125 @@
+import os
+import gzip
+import json
+import glob
+import mmap
+import zlib
+from typing import Any, Dict, Iterator, List, Optional
+
+# Reads the BayernCloud dumps written by the api_gateway:
+#   bayerncloud_<slug>.json        -> pretty-printed JSON-LD, items under "@graph"
+#   bayerncloud_<slug>.ndjson[.gz] -> one item per line (streamed, constant memory)
+#   bayerncloud_<slug>.corpus      -> compact block-compressed corpus + .corpus.idx offset index
+
+CORPUS_VERSION = 1
+
+# metadata key with the source file of a parsed document (set by pipeline.iter_documents)
+SOURCE_FILE_KEY = "source_file"
+
+
+def list_source_files(data_dir: str, pattern: str) -> List[str]:
+    # ".part" files are downloads still in progress, ".idx" belong to a .corpus
+    files = glob.glob(os.path.join(data_dir, pattern))
+    return sorted(f for f in files if not f.endswith((".part", ".idx")))
+
+
+def is_ndjson(file_path: str) -> bool:
+    return file_path.endswith(".ndjson") or file_path.endswith(".ndjson.gz")
+
+
+def is_corpus(file_path: str) -> bool:
+    return file_path.endswith(".corpus")
+
+
+class CorpusReader:
+    """
+    Memory-mapped reader for `.corpus` files (see api_gateway/writers.py,
+    CorpusCollectionWriter). Iteration decompresses one block at a time;
+    `get(source_id)` decompresses only the block holding that record.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path + ".idx", "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        if self.index.get("version") != CORPUS_VERSION:
+            raise ValueError(f"Unsupported corpus version {self.index.get('version')} in {path}")
+
+        self.blocks = self.index["blocks"]
+        self.ids = self.index["ids"]
+        self._file = open(path, "rb")
+        # the writer replaces the index before the data: a reader in between
+        # would pair the new index with the old blocks
+        size = os.fstat(self._file.fileno()).st_size
+        if size != self.index["bytes"]:
+            self._file.close()
+            raise ValueError(f"{path} does not match its index ({size} != {self.index['bytes']} bytes), being rewritten?")
+        # mmap of an empty file is not allowed
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.index["bytes"] else None
+        self._cached_block: Optional[int] = None
+        self._cached_lines: List[bytes] = []
+
+    def __len__(self) -> int:
+        return self.index["count"]
+
+    def __contains__(self, source_id: str) -> bool:
+        return source_id in self.ids
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _block_lines(self, block_no: int) -> List[bytes]:
+        if block_no != self._cached_block:
+            offset, length, _ = self.blocks[block_no]
+            raw = zlib.decompress(self._map[offset:offset + length])
+            self._cached_lines = raw.splitlines()
+            self._cached_block = block_no
+        return self._cached_lines
+
+    def get(self, source_id: str) -> Optional[Dict[str, Any]]:
+        position = self.ids.get(source_id)
+        if position is None:
+            return None
+        block_no, line_no = position
+        return json.loads(self._block_lines(block_no)[line_no])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for block_no in range(len(self.blocks)):
+            for line in self._block_lines(block_no):
+                yield json.loads(line)
+
+
+def iter_source_items(file_path: str) -> Iterator[Dict[str, Any]]:
+    if is_corpus(file_path):
+        with CorpusReader(file_path) as reader:
+            yield from reader
+        return
+
+    if is_ndjson(file_path):
+        opener = gzip.open if file_path.endswith(".gz") else open
+        with opener(file_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    items = data.get("@graph", [data]) if isinstance(data, dict) else data
+    if isinstance(items, list):
+        yield from items
+
+
+def collection_name(filename: str) -> str:
+    """'bayerncloud_food.ndjson.gz' -> 'bayerncloud_food'"""
+    return os.path.basename(filename).split(".")[0]
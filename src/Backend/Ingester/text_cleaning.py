@@ -0,0 +1,60 @@
+import os
+from functools import lru_cache
+from typing import Any
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+# --- HTML -> Text ---
+# Same output as BeautifulSoup(text, "lxml").get_text(separator=" ").strip(),
+# but plain text skips parsing entirely, markup goes through lxml directly
+# (no soup tree), and repeated inputs (boilerplate opening-hours notes,
+# shared descriptions) are answered from a bounded LRU cache.
+CLEAN_HTML_CACHE_SIZE = int(os.getenv("CLEAN_HTML_CACHE_SIZE", "4096"))
+
+# characters the HTML parser rewrites: markup, entities, "\r" -> "\n", NUL -> U+FFFD
+MARKUP_CHARS = ("<", "&", "\r", "\x00")
+# elements whose text BeautifulSoup's get_text() leaves out
+NON_TEXT_ELEMENTS = ("script", "style", "template")
+
+
+def clean_html_soup(text: Any) -> str:
+    """Reference implementation, kept for the benchmark and as fallback."""
+    if not text:
+        return ""
+    try:
+        soup = BeautifulSoup(text, "lxml")
+        return soup.get_text(separator=" ").strip()
+    except Exception:
+        return str(text)
+
+
+def has_markup(text: str) -> bool:
+    return any(ch in text for ch in MARKUP_CHARS)
+
+
+@lru_cache(maxsize=CLEAN_HTML_CACHE_SIZE)
+def _html_to_text(text: str) -> str:
+    try:
+        root = etree.HTML(text)
+    except (etree.ParserError, ValueError):
+        return clean_html_soup(text)
+    if root is None:
+        return ""
+    etree.strip_elements(root, *NON_TEXT_ELEMENTS, with_tail=False)
+    # Element filter: skips comments and processing instructions, like get_text()
+    return " ".join(root.itertext(etree.Element)).strip()
+
+
+def clean_html(text: Any) -> str:
+    if not text:
+        return ""
+    if not isinstance(text, str):
+        return clean_html_soup(text)
+    if not has_markup(text):
+        return text.strip()
+    return _html_to_text(text)
+
+
+def cache_info():
+    return _html_to_text.cache_info()
@@ -0,0 +1,171 @@
+import os
+import math
+import time
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+from opensearchpy import OpenSearch
+from pydantic import PrivateAttr
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+
+logger = logging.getLogger(__name__)
+
+# --- kNN vector compression ---
+# VECTOR_COMPRESSION selects how `embedding` is stored in the faiss HNSW graph:
+#   none  float32, 4 bytes/dim (3072 dims -> ~12 KB per chunk)
+#   fp16  faiss scalar quantization to float16, 2 bytes/dim, transparent to clients
+#   byte  knn_vector with data_type=byte, 1 byte/dim; vectors are scaled to int8
+#         when written (OpenSearchBulkWriter) and queried (ByteQueryEmbedding)
+#   pq    faiss product quantization, VECTOR_PQ_M bytes per vector (code_size 8);
+#         needs a model trained once from an index holding float vectors
+#         (train_pq_model, VECTOR_PQ_MODEL_ID)
+VECTOR_COMPRESSION = os.getenv("VECTOR_COMPRESSION", "none")
+VECTOR_COMPRESSIONS = ("none", "fp16", "byte", "pq")
+
+# empty = OpenSearch defaults (m=16)
+VECTOR_HNSW_M = os.getenv("VECTOR_HNSW_M", "")
+VECTOR_HNSW_EF_CONSTRUCTION = os.getenv("VECTOR_HNSW_EF_CONSTRUCTION", "")
+VECTOR_PQ_MODEL_ID = os.getenv("VECTOR_PQ_MODEL_ID", "")
+VECTOR_PQ_M = int(os.getenv("VECTOR_PQ_M", "384"))
+VECTOR_PQ_CODE_SIZE = 8
+# int8 scale; empty = clip unit-length vectors at 4 standard deviations per
+# component (|v_i| ~ 1/sqrt(dim)), which keeps far more resolution than 127 * v
+VECTOR_BYTE_SCALE = os.getenv("VECTOR_BYTE_SCALE", "")
+VECTOR_BYTE_CLIP_SIGMA = 4.0
+
+
+def hnsw_method(encoder: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    method: Dict[str, Any] = {"name": "hnsw", "engine": "faiss"}
+    parameters: Dict[str, Any] = {}
+    if VECTOR_HNSW_M:
+        parameters["m"] = int(VECTOR_HNSW_M)
+    if VECTOR_HNSW_EF_CONSTRUCTION:
+        parameters["ef_construction"] = int(VECTOR_HNSW_EF_CONSTRUCTION)
+    if encoder is not None:
+        parameters["encoder"] = encoder
+    if parameters:
+        method["parameters"] = parameters
+    return method
+
+
+def pq_encoder(m: int = VECTOR_PQ_M) -> Dict[str, Any]:
+    return {"name": "pq", "parameters": {"m": m, "code_size": VECTOR_PQ_CODE_SIZE}}
+
+
+def knn_vector_mapping(
+    dim: int,
+    compression: str = VECTOR_COMPRESSION,
+    pq_model_id: str = VECTOR_PQ_MODEL_ID,
+) -> Dict[str, Any]:
+    """Mapping of the `embedding` field for the selected compression."""
+    if compression == "none":
+        return {"type": "knn_vector", "dimension": dim, "method": hnsw_method()}
+    if compression == "fp16":
+        return {"type": "knn_vector", "dimension": dim, "method": hnsw_method({"name": "sq", "parameters": {"type": "fp16"}})}
+    if compression == "byte":
+        return {"type": "knn_vector", "dimension": dim, "data_type": "byte", "method": hnsw_method()}
+    if compression == "pq":
+        if not pq_model_id:
+            raise ValueError("VECTOR_COMPRESSION=pq needs VECTOR_PQ_MODEL_ID (see train_pq_model)")
+        # dimension and method come from the trained model
+        return {"type": "knn_vector", "model_id": pq_model_id}
+    raise ValueError(f"Unknown VECTOR_COMPRESSION '{compression}', expected one of {VECTOR_COMPRESSIONS}")
+
+
+def bytes_per_vector(dim: int, compression: str, pq_m: int = VECTOR_PQ_M) -> int:
+    return {"none": 4 * dim, "fp16": 2 * dim, "byte": dim, "pq": pq_m}[compression]
+
+
+def estimate_graph_bytes(
+    count: int, dim: int, compression: str, hnsw_m: int = int(VECTOR_HNSW_M or 16), pq_m: int = VECTOR_PQ_M
+) -> int:
+    """OpenSearch k-NN sizing formula: 1.1 * (vector bytes + 8 * M) per vector."""
+    return int(1.1 * (bytes_per_vector(dim, compression, pq_m) + 8 * hnsw_m) * count)
+
+
+def byte_scale(dim: int) -> float:
+    if VECTOR_BYTE_SCALE:
+        return float(VECTOR_BYTE_SCALE)
+    return 127.0 * math.sqrt(dim) / VECTOR_BYTE_CLIP_SIGMA
+
+
+def quantize_to_byte(vector: Sequence[float], scale: Optional[float] = None) -> List[int]:
+    scale = scale or byte_scale(len(vector))
+    return [max(-128, min(127, int(round(v * scale)))) for v in vector]
+
+
+def vector_transform(compression: str = VECTOR_COMPRESSION):
+    """What OpenSearchBulkWriter applies to each embedding before writing (None = as is)."""
+    return quantize_to_byte if compression == "byte" else None
+
+
+class ByteQueryEmbedding(BaseEmbedding):
+    """Quantizes query embeddings for a byte-vector index; text embeddings pass through."""
+
+    _inner: BaseEmbedding = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, **kwargs: Any):
+        super().__init__(model_name=inner.model_name, embed_batch_size=inner.embed_batch_size, **kwargs)
+        self._inner = inner
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ByteQueryEmbedding"
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return [float(v) for v in quantize_to_byte(self._inner.get_query_embedding(query))]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._inner.get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._inner.get_text_embedding_batch(texts)
+
+
+def with_query_quantization(embed_model: BaseEmbedding, compression: str = VECTOR_COMPRESSION) -> BaseEmbedding:
+    return ByteQueryEmbedding(embed_model) if compression == "byte" else embed_model
+
+
+def train_pq_model(
+    os_client: OpenSearch,
+    model_id: str,
+    training_index: str,
+    dim: int,
+    training_field: str = "embedding",
+    m: int = VECTOR_PQ_M,
+    max_training_vectors: Optional[int] = None,
+    timeout_sec: float = 1800,
+) -> Dict[str, Any]:
+    """
+    Trains a faiss HNSW+PQ model from the float vectors in `training_index`
+    (e.g. the current uncompressed index) and waits until it is usable.
+    """
+    if dim % m:
+        raise ValueError(f"PQ m={m} must divide the dimension {dim}")
+    body: Dict[str, Any] = {
+        "training_index": training_index,
+        "training_field": training_field,
+        "dimension": dim,
+        "description": f"HNSW+PQ m={m} code_size={VECTOR_PQ_CODE_SIZE} trained on {training_index}",
+        "method": hnsw_method(pq_encoder(m)),
+    }
+    if max_training_vectors:
+        body["max_training_vector_count"] = max_training_vectors
+
+    os_client.transport.perform_request("POST", f"/_plugins/_knn/models/{model_id}/_train", body=body)
+    logger.info(f"PQ-Training gestartet: {model_id} (Quelle: {training_index})")
+
+    deadline = time.monotonic() + timeout_sec
+    while True:
+        model = os_client.transport.perform_request("GET", f"/_plugins/_knn/models/{model_id}")
+        if model.get("state") == "created":
+            return model
+        if model.get("state") == "failed":
+            raise RuntimeError(f"PQ-Training fehlgeschlagen: {model.get('error')}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"PQ-Training {model_id} nach {timeout_sec}s nicht fertig")
+        time.sleep(5)
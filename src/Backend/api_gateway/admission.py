@@ -0,0 +1,133 @@
+import os
+import math
+import time
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Tuple
+
+from fastapi import HTTPException, Request
+
+# -----------------------------
+# Admission control / load shedding
+# -----------------------------
+# Per route:
+#   - per-client token bucket      -> 429 + Retry-After when a client exceeds its rate
+#   - concurrency limit for the    -> requests wait in a bounded queue up to a deadline,
+#     expensive backend work          503 + Retry-After when the queue is full or the deadline passes
+# Clients are identified by X-Client-Id (agent session) or the peer address.
+CLIENT_ID_HEADER = "x-client-id"
+MAX_TRACKED_CLIENTS = int(os.getenv("ADMISSION_MAX_TRACKED_CLIENTS", "10000"))
+
+
+class ClientBuckets:
+    """Non-blocking token buckets per client, bounded to the most recently seen clients."""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = MAX_TRACKED_CLIENTS):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def try_acquire(self, client_id: str) -> float:
+        """Takes a token; returns 0.0 on success, otherwise the seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(client_id, (float(self.capacity), now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+
+        self._buckets[client_id] = (tokens, now)
+        self._buckets.move_to_end(client_id)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout_sec: float,
+        client_rate_per_sec: float,
+        client_burst: int,
+        retry_after_sec: float = 1.0,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout_sec = queue_timeout_sec
+        self.retry_after_sec = retry_after_sec
+        self.clients = ClientBuckets(client_rate_per_sec, client_burst)
+        self._semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str, **defaults) -> "AdmissionController":
+        """Reads <PREFIX>_MAX_CONCURRENCY, _MAX_QUEUE, _QUEUE_TIMEOUT_SEC, _CLIENT_RATE_PER_SEC, _CLIENT_BURST."""
+        return cls(
+            name=name,
+            max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", str(defaults["max_concurrency"]))),
+            max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", str(defaults["max_queue"]))),
+            queue_timeout_sec=float(os.getenv(f"{prefix}_QUEUE_TIMEOUT_SEC", str(defaults["queue_timeout_sec"]))),
+            client_rate_per_sec=float(os.getenv(f"{prefix}_CLIENT_RATE_PER_SEC", str(defaults["client_rate_per_sec"]))),
+            client_burst=int(os.getenv(f"{prefix}_CLIENT_BURST", str(defaults["client_burst"]))),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrency > 0
+
+    def _reject(self, status_code: int, retry_after: float, detail: str) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(int(math.ceil(retry_after)), 1))},
+        )
+
+    async def rate_limit(self, request: Request):
+        """FastAPI dependency: per-client token bucket."""
+        client_id = request.headers.get(CLIENT_ID_HEADER) or (request.client.host if request.client else "unknown")
+        wait = self.clients.try_acquire(client_id)
+        if wait > 0:
+            raise self._reject(429, wait, f"Too many {self.name} requests from this client")
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds one of `max_concurrency` slots for the backend work, queueing up to the deadline."""
+        if not self.enabled:
+            yield
+            return
+
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                raise self._reject(503, self.retry_after_sec, f"{self.name} overloaded, queue full")
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout_sec)
+            except asyncio.TimeoutError:
+                raise self._reject(503, self.retry_after_sec, f"{self.name} overloaded, queue deadline exceeded")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
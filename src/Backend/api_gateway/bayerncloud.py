@@ -0,0 +1,364 @@
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from anyio import to_thread
+
+from Backend.api_gateway.writers import OUTPUT_FORMATS, DeltaCollectionWriter, make_writer
+from Backend.api_gateway.sync_state import hours_since, load_sync_state, state_path, utc_now
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# BayernCloud ingestion (gateway-owned for now)
+# -----------------------------
+BAYERNCLOUD_API_KEY = os.getenv("BAYERNCLOUD_API_KEY", "")
+BAYERNCLOUD_API_BASE_URL = os.getenv("BAYERNCLOUD_API_BASE_URL", "")
+BAYERNCLOUD_DATA_DIR = os.getenv("BAYERNCLOUD_DATA_DIR", "bayerncloud-data")
+# json | ndjson | ndjson.gz, see writers.py
+BAYERNCLOUD_OUTPUT_FORMAT = os.getenv("BAYERNCLOUD_OUTPUT_FORMAT", "json")
+
+# Incremental sync: by default every run lists the whole collection and diffs it
+# against the local state (detects deletions). With the updated-since filter only
+# items modified after the last sync are requested, plus a periodic full listing.
+BAYERNCLOUD_UPDATED_SINCE_FILTER = os.getenv("BAYERNCLOUD_UPDATED_SINCE_FILTER", "false").lower() == "true"
+BAYERNCLOUD_MODIFIED_ATTRIBUTE = os.getenv("BAYERNCLOUD_MODIFIED_ATTRIBUTE", "dct:modified")
+BAYERNCLOUD_FULL_SYNC_HOURS = float(os.getenv("BAYERNCLOUD_FULL_SYNC_HOURS", "168"))
+
+# Fetch scheduling: one concurrency cap and one token bucket for all endpoints
+BAYERNCLOUD_PAGE_SIZE = int(os.getenv("BAYERNCLOUD_PAGE_SIZE", "100"))
+BAYERNCLOUD_TIMEOUT_SEC = float(os.getenv("BAYERNCLOUD_TIMEOUT_SEC", "60"))
+BAYERNCLOUD_MAX_CONCURRENCY = int(os.getenv("BAYERNCLOUD_MAX_CONCURRENCY", "4"))
+BAYERNCLOUD_RATE_PER_SEC = float(os.getenv("BAYERNCLOUD_RATE_PER_SEC", "5"))
+BAYERNCLOUD_RATE_BURST = int(os.getenv("BAYERNCLOUD_RATE_BURST", "5"))
+BAYERNCLOUD_MAX_RETRIES = int(os.getenv("BAYERNCLOUD_MAX_RETRIES", "4"))
+BAYERNCLOUD_BACKOFF_BASE_SEC = float(os.getenv("BAYERNCLOUD_BACKOFF_BASE_SEC", "1"))
+BAYERNCLOUD_BACKOFF_MAX_SEC = float(os.getenv("BAYERNCLOUD_BACKOFF_MAX_SEC", "30"))
+
+os.makedirs(BAYERNCLOUD_DATA_DIR, exist_ok=True)
+
+ENDPOINT_IDS: List[str] = [
+    "915cbd6f-4434-4723-a54d-046b43ad52c5",  # list_attractions
+    "9d164080-9226-4f32-9d07-c5a83e970a58",  # list_retail
+    "cf5cce8d-cc0c-4835-816a-d7c22e32394f",  # list_food
+    "e0ed98a3-4137-4e62-9227-eb084e292151",  # list_mobility
+    "0f102b60-cca7-4b80-ad6e-31bea5ea641c",  # list_nature
+    "58056461-59dc-42e2-9025-3c16ce6968d7",  # list_tracks
+    "7a71084c-3802-42bc-88e7-f5c7bd22354c",  # list_accommodations
+    "36a736f7-9e2d-4be5-b0f0-45ada2ff7013",  # list_current_events
+]
+
+WITH_SUBTREES: List[str] = ["2db595fc-c60d-46fe-85d1-a4da648910da"]
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+PageCallback = Callable[[int, dict], Awaitable[None]]
+
+
+class BayernCloudFetchError(Exception):
+    pass
+
+
+def is_configured() -> bool:
+    return bool(BAYERNCLOUD_API_KEY and BAYERNCLOUD_API_BASE_URL)
+
+
+def log_progress(event: Dict[str, Any]):
+    logger.info(
+        f"[bayerncloud] {event['endpoint_id']} page {event['page']}/{event.get('pages_total') or '?'} "
+        f"{event['status']} (attempt {event['attempt']})"
+    )
+
+
+class TokenBucket:
+    """Async token bucket; `rate` tokens per second, up to `burst` at once."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        # reserve the token under the lock (the balance may go negative, later
+        # callers queue behind it), sleep for it outside
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+async def fetch_external_data(
+    client: httpx.AsyncClient,
+    endpoint_id: str,
+    with_subtree: str,
+    page: int,
+    size: int,
+    updated_since: Optional[str] = None,
+) -> Tuple[dict, int]:
+    url = f"{BAYERNCLOUD_API_BASE_URL}/{endpoint_id}"
+    params = {"page[size]": size, "page[number]": page}
+    payload = {
+        "filter": {"classifications": {"in": {"withSubtree": [with_subtree]}}},
+        "include": ["dc:additionalInformation", "dc:classification", "location", "address"],
+    }
+    if updated_since:
+        payload["filter"]["attribute"] = {
+            BAYERNCLOUD_MODIFIED_ATTRIBUTE: {"in": {"min": updated_since}}
+        }
+    headers = {
+        "Authorization": f"Bearer {BAYERNCLOUD_API_KEY}",
+        "Content-Type": "application/json",
+        "Accept": "application/ld+json",
+    }
+
+    response = await client.post(url, params=params, json=payload, headers=headers)
+    response.raise_for_status()
+    data = response.json()
+    total_items = data.get("meta", {}).get("total", 0)
+    return data, total_items
+
+
+class FetchScheduler:
+    """
+    Runs BayernCloud page requests under one shared concurrency limit and
+    rate limit, retrying throttled or failed pages with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        max_concurrency: int = BAYERNCLOUD_MAX_CONCURRENCY,
+        rate_per_sec: float = BAYERNCLOUD_RATE_PER_SEC,
+        rate_burst: int = BAYERNCLOUD_RATE_BURST,
+        max_retries: int = BAYERNCLOUD_MAX_RETRIES,
+        backoff_base_sec: float = BAYERNCLOUD_BACKOFF_BASE_SEC,
+        backoff_max_sec: float = BAYERNCLOUD_BACKOFF_MAX_SEC,
+        page_size: int = BAYERNCLOUD_PAGE_SIZE,
+        on_progress: Optional[ProgressCallback] = log_progress,
+    ):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+        self.bucket = TokenBucket(rate_per_sec, rate_burst)
+        self.max_retries = max_retries
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.page_size = page_size
+        self.on_progress = on_progress
+
+    def _report(self, **event):
+        if self.on_progress is not None:
+            self.on_progress(event)
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max_sec)
+        delay = min(self.backoff_max_sec, self.backoff_base_sec * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def fetch_page(
+        self,
+        endpoint_id: str,
+        subtree: str,
+        page: int,
+        pages_total: Optional[int] = None,
+        updated_since: Optional[str] = None,
+    ) -> Tuple[dict, int]:
+        attempt = 0
+        while True:
+            attempt += 1
+            response = None
+            try:
+                # wait for the rate limit before taking a slot, not while holding one
+                await self.bucket.acquire()
+                async with self.semaphore:
+                    data, total_items = await fetch_external_data(
+                        self.client, endpoint_id, subtree, page=page, size=self.page_size,
+                        updated_since=updated_since,
+                    )
+                self._report(
+                    endpoint_id=endpoint_id, page=page, pages_total=pages_total,
+                    status="ok", attempt=attempt, items=len(data.get("@graph", [])),
+                )
+                return data, total_items
+            except httpx.HTTPStatusError as e:
+                response = e.response
+                retryable = response.status_code in RETRYABLE_STATUS
+                error = f"HTTP {response.status_code}"
+            except (httpx.TransportError, json.JSONDecodeError) as e:
+                retryable = True
+                error = f"{type(e).__name__}: {e}"
+
+            if not retryable or attempt > self.max_retries:
+                self._report(
+                    endpoint_id=endpoint_id, page=page, pages_total=pages_total,
+                    status="failed", attempt=attempt, error=error,
+                )
+                raise BayernCloudFetchError(f"{endpoint_id} page {page}: {error}")
+
+            delay = self._backoff(attempt - 1, response)
+            self._report(
+                endpoint_id=endpoint_id, page=page, pages_total=pages_total,
+                status="retry", attempt=attempt, error=error, retry_in=round(delay, 2),
+            )
+            await asyncio.sleep(delay)
+
+    async def fetch_collection(
+        self,
+        endpoint_id: str,
+        subtree: str,
+        on_page: PageCallback,
+        updated_since: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Fetches all pages of one endpoint and hands each one to `on_page` as it
+        arrives (page 1 always first). Page 1 failing raises, later pages that
+        still fail after retries are listed in `failed_pages`.
+        """
+        first_page, total_items = await self.fetch_page(
+            endpoint_id, subtree, page=1, updated_since=updated_since
+        )
+        await on_page(1, first_page)
+        del first_page
+
+        pages_total = max(math.ceil((total_items or 0) / self.page_size), 1)
+        pages = list(range(2, pages_total + 1))
+
+        async def fetch_and_hand_over(page: int):
+            page_data, _ = await self.fetch_page(
+                endpoint_id, subtree, page=page, pages_total=pages_total, updated_since=updated_since
+            )
+            await on_page(page, page_data)
+
+        results = await asyncio.gather(*(fetch_and_hand_over(p) for p in pages), return_exceptions=True)
+
+        failed_pages = []
+        for page, result in zip(pages, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, BayernCloudFetchError):
+                    raise result
+                failed_pages.append(page)
+
+        return {"pages_total": pages_total, "failed_pages": failed_pages}
+
+
+def incremental_watermark(state: Dict[str, Any]) -> Optional[str]:
+    """
+    Returns the updated-since timestamp for an incremental run, or None when
+    the collection has to be listed in full (first run, filter disabled, or
+    the last full listing is older than BAYERNCLOUD_FULL_SYNC_HOURS so that
+    deletions get picked up).
+    """
+    if not BAYERNCLOUD_UPDATED_SINCE_FILTER or not state.get("last_sync"):
+        return None
+    since_full = hours_since(state.get("last_full_sync"))
+    if since_full is None or since_full >= BAYERNCLOUD_FULL_SYNC_HOURS:
+        return None
+    return state["last_sync"]
+
+
+def collection_basename(first_page: dict, endpoint_id: str) -> str:
+    meta_collection = first_page.get("meta", {}).get("collection", {})
+    endpoint_slug = meta_collection.get("slug") or meta_collection.get("name") or endpoint_id
+    return f"bayerncloud_{str(endpoint_slug).replace(' ', '_').lower()}"
+
+
+async def refresh_collections(
+    endpoint_ids: List[str] = ENDPOINT_IDS,
+    subtrees: List[str] = WITH_SUBTREES,
+    on_progress: Optional[ProgressCallback] = log_progress,
+    client: Optional[httpx.AsyncClient] = None,
+    output_format: Optional[str] = None,
+    incremental: bool = False,
+    on_collection_done: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Downloads all collections concurrently and writes one file per collection,
+    or with `incremental` only the delta against the local sync state.
+    `on_collection_done` receives each collection's file info as soon as it is written.
+    """
+    output_format = output_format or BAYERNCLOUD_OUTPUT_FORMAT
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}', use one of {list(OUTPUT_FORMATS)}")
+
+    async def refresh_one(scheduler: FetchScheduler, endpoint_id: str, subtree: str) -> Dict[str, Any]:
+        writer = None
+        lock = asyncio.Lock()
+        updated_since = None
+
+        if incremental:
+            state_file = state_path(BAYERNCLOUD_DATA_DIR, endpoint_id)
+            state = await to_thread.run_sync(load_sync_state, state_file)
+            started_at = utc_now()
+            updated_since = incremental_watermark(state)
+
+            def new_writer(base_name: str):
+                return DeltaCollectionWriter(
+                    BAYERNCLOUD_DATA_DIR, base_name, state, state_file,
+                    full_listing=updated_since is None, started_at=started_at,
+                    output_format=output_format,
+                )
+        else:
+            def new_writer(base_name: str):
+                return make_writer(output_format, BAYERNCLOUD_DATA_DIR, base_name)
+
+        async def on_page(page: int, data: dict):
+            nonlocal writer
+            async with lock:
+                if writer is None:
+                    writer = new_writer(collection_basename(data, endpoint_id))
+                    await to_thread.run_sync(writer.open, data)
+                await to_thread.run_sync(writer.write_page, page, data.get("@graph", []))
+
+        try:
+            result = await scheduler.fetch_collection(endpoint_id, subtree, on_page, updated_since=updated_since)
+        except BaseException as e:
+            if writer is not None:
+                await to_thread.run_sync(writer.abort)
+            if isinstance(e, BayernCloudFetchError):
+                return {"endpoint_id": endpoint_id, "error": str(e)}
+            raise
+
+        info = await to_thread.run_sync(writer.close, result["pages_total"], result["failed_pages"])
+        return {"endpoint_id": endpoint_id, **info}
+
+    async def refresh_and_report(scheduler: FetchScheduler, endpoint_id: str, subtree: str) -> Dict[str, Any]:
+        info = await refresh_one(scheduler, endpoint_id, subtree)
+        if on_collection_done is not None:
+            on_collection_done(info)
+        return info
+
+    async def run(http_client: httpx.AsyncClient) -> List[Dict[str, Any]]:
+        scheduler = FetchScheduler(http_client, on_progress=on_progress)
+        # a failing collection cancels the others and waits until they have
+        # aborted their writers (no fetches or .part files left behind)
+        try:
+            async with asyncio.TaskGroup() as group:
+                tasks = [
+                    group.create_task(refresh_and_report(scheduler, e, s))
+                    for e in endpoint_ids for s in subtrees
+                ]
+        except BaseExceptionGroup as e:
+            raise e.exceptions[0]
+        return [task.result() for task in tasks]
+
+    if client is not None:
+        return await run(client)
+    async with httpx.AsyncClient(timeout=BAYERNCLOUD_TIMEOUT_SEC) as http_client:
+        return await run(http_client)
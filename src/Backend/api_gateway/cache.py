@@ -0,0 +1,129 @@
+import time
+import asyncio
+import logging
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# X-Cache values
+CACHE_HIT = "HIT"
+CACHE_STALE = "STALE"
+CACHE_MISS = "MISS"
+CACHE_BYPASS = "BYPASS"
+
+
+def normalize_place(value: str) -> str:
+    """'  München  Hbf ' and 'münchen hbf' map to the same cache key part."""
+    return " ".join(unicodedata.normalize("NFKC", value).casefold().split())
+
+
+def time_bucket(time_str: Optional[str], bucket_minutes: int) -> Optional[int]:
+    """Maps 'HH:MM' to the start minute of its bucket, e.g. 07:40 -> 450 for 15 min buckets."""
+    if not time_str:
+        return None
+    try:
+        hours, minutes = time_str.strip().split(":")[:2]
+        minute_of_day = int(hours) * 60 + int(minutes)
+    except ValueError:
+        return None
+    bucket = max(bucket_minutes, 1)
+    return minute_of_day - minute_of_day % bucket
+
+
+class ResponseCache:
+    """
+    Bounded in-memory LRU cache with TTL and stale-while-revalidate.
+
+    - age < ttl:                 HIT, served from memory
+    - ttl <= age < ttl + stale:  STALE, served from memory, refreshed in the background
+    - otherwise:                 MISS, fetched (concurrent misses for a key share one fetch)
+    """
+
+    def __init__(self, ttl_sec: float, stale_sec: float, max_entries: int):
+        self.ttl_sec = ttl_sec
+        self.stale_sec = stale_sec
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._refreshes: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_sec > 0 and self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    def peek(self, key: Hashable) -> Tuple[Optional[Any], str, float]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, CACHE_MISS, 0.0
+
+        stored_at, value = entry
+        age = time.monotonic() - stored_at
+        if age < self.ttl_sec:
+            self._entries.move_to_end(key)
+            return value, CACHE_HIT, age
+        if age < self.ttl_sec + self.stale_sec:
+            self._entries.move_to_end(key)
+            return value, CACHE_STALE, age
+
+        del self._entries[key]
+        return None, CACHE_MISS, 0.0
+
+    def put(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_fetch(
+        self, key: Hashable, fetch: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, str, float]:
+        """Returns (value, cache status, age in seconds)."""
+        if not self.enabled:
+            return await fetch(), CACHE_BYPASS, 0.0
+
+        value, status, age = self.peek(key)
+        if status == CACHE_HIT:
+            return value, status, age
+        if status == CACHE_STALE:
+            self._refresh_in_background(key, fetch)
+            return value, status, age
+
+        return await self._fetch_once(key, fetch), CACHE_MISS, 0.0
+
+    async def _fetch_once(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await fetch()
+            self.put(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]):
+        if key in self._inflight:
+            return
+
+        async def refresh():
+            try:
+                await self._fetch_once(key, fetch)
+            except Exception as e:
+                # keep serving the stale entry until it expires
+                logger.warning(f"Background refresh failed for {key}: {e}")
+
+        task = asyncio.ensure_future(refresh())
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
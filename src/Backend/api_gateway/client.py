@@ -1,12 +1,27 @@
 import os
+import logging
+from typing import Optional
+
 import httpx
 from pydantic import BaseModel
 
+logger = logging.getLogger(__name__)
+
 TRIP_PLANNER_URL = os.getenv("TRIP_PLANNER_URL", "http://trip-planner:8001")
 
+# Connection pool for the gateway -> trip planner hop
+GATEWAY_TIMEOUT_SEC = float(os.getenv("GATEWAY_TIMEOUT_SEC", "30"))
+GATEWAY_CONNECT_TIMEOUT_SEC = float(os.getenv("GATEWAY_CONNECT_TIMEOUT_SEC", "5"))
+GATEWAY_MAX_CONNECTIONS = int(os.getenv("GATEWAY_MAX_CONNECTIONS", "100"))
+GATEWAY_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GATEWAY_MAX_KEEPALIVE_CONNECTIONS", "20"))
+GATEWAY_KEEPALIVE_EXPIRY_SEC = float(os.getenv("GATEWAY_KEEPALIVE_EXPIRY_SEC", "30"))
+GATEWAY_HTTP2 = os.getenv("GATEWAY_HTTP2", "false").lower() == "true"
+
 class TripRequest(BaseModel):
     origin: str
     destination: str
+    date: Optional[str] = None  # YYYY-MM-DD
+    time: Optional[str] = None  # HH:MM
 
 class TripResponse(BaseModel):
     trip_id: str
@@ -14,11 +29,59 @@ class TripResponse(BaseModel):
     destination: str
     duration_minutes: int
 
-async def call_trip_planner(req: TripRequest) -> TripResponse:
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{TRIP_PLANNER_URL}/plan-trip",
-            json=req.model_dump()
-        )
-        response.raise_for_status()
-        return TripResponse(**response.json())
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_trip_planner_client() -> httpx.AsyncClient:
+    http2 = GATEWAY_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("GATEWAY_HTTP2=true but 'h2' is not installed, falling back to HTTP/1.1")
+            http2 = False
+
+    return httpx.AsyncClient(
+        base_url=TRIP_PLANNER_URL,
+        timeout=httpx.Timeout(GATEWAY_TIMEOUT_SEC, connect=GATEWAY_CONNECT_TIMEOUT_SEC),
+        limits=httpx.Limits(
+            max_connections=GATEWAY_MAX_CONNECTIONS,
+            max_keepalive_connections=GATEWAY_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=GATEWAY_KEEPALIVE_EXPIRY_SEC,
+        ),
+        http2=http2,
+    )
+
+
+async def start_trip_planner_client():
+    """Opens the shared client; called from the gateway lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_trip_planner_client()
+
+
+async def close_trip_planner_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_trip_planner_client() -> httpx.AsyncClient:
+    # Falls back to lazy creation when the app runs without lifespan (e.g. tests)
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_trip_planner_client()
+    return _client
+
+
+async def call_trip_planner(req: TripRequest, timeout: Optional[float] = None) -> TripResponse:
+    client = get_trip_planner_client()
+    response = await client.post(
+        "/plan-trip",
+        json=req.model_dump(exclude_none=True),
+        timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+    )
+    response.raise_for_status()
+    return TripResponse(**response.json())
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from Backend.api_gateway import bayerncloud
+from Backend.api_gateway.sync_state import utc_now
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Background BayernCloud fetch jobs
+# -----------------------------
+# Job records are persisted to <data_dir>/jobs/<job_id>.json so progress
+# survives restarts; jobs still "running" at startup become "interrupted".
+BAYERNCLOUD_JOB_HISTORY = int(os.getenv("BAYERNCLOUD_JOB_HISTORY", "50"))
+BAYERNCLOUD_JOB_SAVE_INTERVAL_SEC = float(os.getenv("BAYERNCLOUD_JOB_SAVE_INTERVAL_SEC", "1"))
+
+JobStatus = Literal["queued", "running", "succeeded", "partial", "failed", "cancelled", "interrupted"]
+FINISHED = {"succeeded", "partial", "failed", "cancelled", "interrupted"}
+
+
+class JobConflictError(Exception):
+    def __init__(self, endpoint_ids: List[str], job_ids: List[str]):
+        super().__init__(f"Refresh already running for {endpoint_ids} (jobs: {job_ids})")
+        self.endpoint_ids = endpoint_ids
+        self.job_ids = job_ids
+
+
+class FetchJob(BaseModel):
+    job_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    status: JobStatus = "queued"
+    endpoint_ids: List[str]
+    output_format: Optional[str] = None
+    incremental: bool = False
+    created_at: str = Field(default_factory=utc_now)
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    pages_done: int = 0
+    pages_failed: int = 0
+    pages_total: Dict[str, int] = {}
+    results: List[Dict[str, Any]] = []
+    error: Optional[str] = None
+
+
+class JobManager:
+    """Runs BayernCloud refreshes as asyncio tasks, one refresh per collection at a time."""
+
+    def __init__(self, jobs_dir: str):
+        self.jobs_dir = jobs_dir
+        self.jobs: Dict[str, FetchJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._busy: Dict[str, str] = {}  # endpoint_id -> job_id (or "inline")
+        self._last_saved: Dict[str, float] = {}
+        self._load()
+
+    # --- persistence ---
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _load(self):
+        if not os.path.isdir(self.jobs_dir):
+            return
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), "r", encoding="utf-8") as f:
+                    job = FetchJob(**json.load(f))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable job file {name}: {e}")
+                continue
+            if job.status not in FINISHED:
+                job.status = "interrupted"
+                job.finished_at = job.finished_at or utc_now()
+                self._save(job, force=True)
+            self.jobs[job.job_id] = job
+
+    def _save(self, job: FetchJob, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_saved.get(job.job_id, 0.0) < BAYERNCLOUD_JOB_SAVE_INTERVAL_SEC:
+            return
+        self._last_saved[job.job_id] = now
+
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        tmp_path = self._path(job.job_id) + ".part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(job.model_dump_json(indent=2))
+        os.replace(tmp_path, self._path(job.job_id))
+
+    def _prune(self):
+        finished = sorted(
+            (j for j in self.jobs.values() if j.status in FINISHED),
+            key=lambda j: j.created_at,
+        )
+        for job in finished[: max(len(finished) - BAYERNCLOUD_JOB_HISTORY, 0)]:
+            self.jobs.pop(job.job_id, None)
+            self._last_saved.pop(job.job_id, None)
+            if os.path.exists(self._path(job.job_id)):
+                os.remove(self._path(job.job_id))
+
+    # --- per-collection exclusivity ---
+
+    def claim(self, endpoint_ids: List[str], owner: str):
+        busy = [e for e in endpoint_ids if e in self._busy]
+        if busy:
+            raise JobConflictError(busy, sorted({self._busy[e] for e in busy}))
+        for endpoint_id in endpoint_ids:
+            self._busy[endpoint_id] = owner
+
+    def release(self, endpoint_ids: List[str], owner: str):
+        for endpoint_id in endpoint_ids:
+            if self._busy.get(endpoint_id) == owner:
+                del self._busy[endpoint_id]
+
+    @contextmanager
+    def inline(self, endpoint_ids: List[str]):
+        """Claims the collections for a synchronous (non-job) refresh."""
+        owner = f"inline-{uuid.uuid4().hex[:8]}"
+        self.claim(endpoint_ids, owner)
+        try:
+            yield
+        finally:
+            self.release(endpoint_ids, owner)
+
+    # --- jobs ---
+
+    def get(self, job_id: str) -> Optional[FetchJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[FetchJob]:
+        return sorted(self.jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    def start(
+        self,
+        endpoint_ids: List[str],
+        output_format: Optional[str] = None,
+        incremental: bool = False,
+    ) -> FetchJob:
+        job = FetchJob(endpoint_ids=endpoint_ids, output_format=output_format, incremental=incremental)
+        self.claim(endpoint_ids, job.job_id)
+
+        self.jobs[job.job_id] = job
+        self._save(job, force=True)
+        self._prune()
+
+        task = asyncio.create_task(self._run(job), name=f"bayerncloud-job-{job.job_id}")
+        self._tasks[job.job_id] = task
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[FetchJob]:
+        """Cancels the job and waits until it has stopped, so the returned record is final."""
+        job = self.jobs.get(job_id)
+        task = self._tasks.get(job_id)
+        if job is None or task is None or task.done():
+            return job
+        task.cancel()
+        # asyncio.wait does not raise the task's CancelledError
+        await asyncio.wait([task])
+        if job.status not in FINISHED:
+            # cancelled before _run got to start: its cleanup never ran
+            self._finish(job, "cancelled")
+        return job
+
+    async def shutdown(self):
+        tasks = [t for t in self._tasks.values() if not t.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _on_progress(self, job: FetchJob, event: Dict[str, Any]):
+        bayerncloud.log_progress(event)
+        if event.get("pages_total"):
+            job.pages_total[event["endpoint_id"]] = event["pages_total"]
+        if event["status"] == "ok":
+            job.pages_done += 1
+        elif event["status"] == "failed":
+            job.pages_failed += 1
+        self._save(job)
+
+    def _on_collection_done(self, job: FetchJob, info: Dict[str, Any]):
+        if "pages_total" in info:
+            job.pages_total[info["endpoint_id"]] = info["pages_total"]
+        job.results.append(info)
+        self._save(job, force=True)
+
+    async def _run(self, job: FetchJob):
+        job.status = "running"
+        job.started_at = utc_now()
+        self._save(job, force=True)
+
+        try:
+            results = await bayerncloud.refresh_collections(
+                endpoint_ids=job.endpoint_ids,
+                output_format=job.output_format,
+                incremental=job.incremental,
+                on_progress=lambda event: self._on_progress(job, event),
+                on_collection_done=lambda info: self._on_collection_done(job, info),
+            )
+        except asyncio.CancelledError:
+            self._finish(job, "cancelled")
+            raise
+        except Exception as e:
+            logger.exception(f"BayernCloud job {job.job_id} failed")
+            job.error = str(e)
+            self._finish(job, "failed")
+            return
+        partial = any("error" in info or info.get("failed_pages") for info in results)
+        self._finish(job, "partial" if partial else "succeeded")
+
+    def _finish(self, job: FetchJob, status: JobStatus):
+        job.status = status
+        job.finished_at = utc_now()
+        self.release(job.endpoint_ids, job.job_id)
+        self._tasks.pop(job.job_id, None)
+        self._save(job, force=True)
@@ -1,16 +1,35 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import List
-import httpx
+from typing import List, Literal, Optional
 import os
-import json
-import asyncio
-import math
-from anyio import to_thread
+from contextlib import asynccontextmanager
 
-from Backend.api_gateway.client import TripRequest, TripResponse, call_trip_planner
+from Backend.api_gateway import bayerncloud
+from Backend.api_gateway.jobs import FetchJob, JobConflictError, JobManager
+from Backend.api_gateway.client import (
+    TripRequest,
+    TripResponse,
+    call_trip_planner,
+    start_trip_planner_client,
+    close_trip_planner_client,
+)
+from Backend.common.profiling import install_profiling
+from Backend.api_gateway.cache import CACHE_MISS, ResponseCache, normalize_place, time_bucket
+from Backend.api_gateway.admission import AdmissionController
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One keep-alive pool to the trip planner for the whole process
+    await start_trip_planner_client()
+    yield
+    await job_manager.shutdown()
+    await close_trip_planner_client()
+
+
+app = FastAPI(lifespan=lifespan)
+install_profiling(app)
 
 
 # -----------------------------
@@ -19,13 +38,62 @@ app = FastAPI()
 class PlanTripRequest(BaseModel):
     origin: str
     destination: str
+    date: Optional[str] = None  # YYYY-MM-DD
+    time: Optional[str] = None  # HH:MM
+
+
+PLAN_CACHE_TTL_SEC = float(os.getenv("PLAN_CACHE_TTL_SEC", "300"))
+PLAN_CACHE_STALE_SEC = float(os.getenv("PLAN_CACHE_STALE_SEC", "600"))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "1024"))
+PLAN_CACHE_TIME_BUCKET_MIN = int(os.getenv("PLAN_CACHE_TIME_BUCKET_MIN", "15"))
+
+plan_cache = ResponseCache(
+    ttl_sec=PLAN_CACHE_TTL_SEC,
+    stale_sec=PLAN_CACHE_STALE_SEC,
+    max_entries=PLAN_CACHE_MAX_ENTRIES,
+)
+
+
+# Cache hits (fresh or stale) are always served and cost nothing; a miss is
+# charged to the client's rate budget and takes a concurrency slot for the
+# trip planner call
+plan_trip_admission = AdmissionController.from_env(
+    "plan-trip",
+    prefix="PLAN_TRIP",
+    max_concurrency=32,
+    max_queue=64,
+    queue_timeout_sec=5,
+    client_rate_per_sec=2,
+    client_burst=10,
+)
+
+
+def plan_cache_key(request: PlanTripRequest) -> tuple:
+    return (
+        normalize_place(request.origin),
+        normalize_place(request.destination),
+        request.date,
+        time_bucket(request.time, PLAN_CACHE_TIME_BUCKET_MIN),
+    )
 
 
 @app.post("/plan-trip", response_model=TripResponse)
-async def plan_trip(request: PlanTripRequest):
+async def plan_trip(request: PlanTripRequest, response: Response, http_request: Request):
     # Forward request to Trip Planner Service (KR3.2)
     internal_request = TripRequest(**request.model_dump())
-    result = await call_trip_planner(internal_request)
+    key = plan_cache_key(request)
+    # checked here, not inside fetch(): concurrent misses share one fetch, and
+    # one client's 429 must not fail the others waiting on it
+    if plan_cache.peek(key)[1] == CACHE_MISS:
+        await plan_trip_admission.rate_limit(http_request)
+
+    async def fetch():
+        async with plan_trip_admission.slot():
+            return await call_trip_planner(internal_request)
+
+    result, cache_status, age = await plan_cache.get_or_fetch(key, fetch)
+    response.headers["X-Cache"] = cache_status
+    response.headers["Age"] = str(int(age))
     return result
 
 
@@ -34,110 +102,102 @@ async def plan_trip(request: PlanTripRequest):
 # -----------------------------
 class BayernCloudPOIRequest(BaseModel):
     retrieve_data: bool
+    output_format: Optional[Literal["json", "ndjson", "ndjson.gz", "corpus"]] = None  # default: BAYERNCLOUD_OUTPUT_FORMAT
+    # only write items added/changed/deleted since the last sync (see bayerncloud.py)
+    incremental: bool = False
+    # subset of bayerncloud.ENDPOINT_IDS, default: all collections
+    endpoint_ids: Optional[List[str]] = None
+    # run as a background job: returns 202 + job id, poll /poi/fetch-bayerncloud/jobs/{job_id}
+    background: bool = False
+
+
+job_manager = JobManager(jobs_dir=os.path.join(bayerncloud.BAYERNCLOUD_DATA_DIR, "jobs"))
 
+# Inline refreshes hold a slot for the whole download; background jobs are
+# bounded by the one-refresh-per-collection rule instead
+fetch_admission = AdmissionController.from_env(
+    "fetch-bayerncloud",
+    prefix="BAYERNCLOUD_FETCH",
+    max_concurrency=1,
+    max_queue=0,
+    queue_timeout_sec=0,
+    client_rate_per_sec=0.1,
+    client_burst=3,
+)
 
-BAYERNCLOUD_API_KEY = os.getenv("BAYERNCLOUD_API_KEY", "")
-BAYERNCLOUD_API_BASE_URL = os.getenv("BAYERNCLOUD_API_BASE_URL", "")
-BAYERNCLOUD_DATA_DIR = os.getenv("BAYERNCLOUD_DATA_DIR", "bayerncloud-data")
 
-os.makedirs(BAYERNCLOUD_DATA_DIR, exist_ok=True)
+async def fetch_rate_limit(request: Request):
+    await fetch_admission.rate_limit(request)
 
 
-@app.post("/poi/fetch-bayerncloud")
+def conflict(e: JobConflictError) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail={"message": str(e), "endpoint_ids": e.endpoint_ids, "job_ids": e.job_ids},
+    )
+
+
+@app.post("/poi/fetch-bayerncloud", dependencies=[Depends(fetch_rate_limit)])
 async def fetch_bayerncloud_pois(request: BayernCloudPOIRequest):
     if not request.retrieve_data:
         return {"detail": "retrieve_data is False"}
 
-    if not BAYERNCLOUD_API_KEY or not BAYERNCLOUD_API_BASE_URL:
+    if not bayerncloud.is_configured():
         raise HTTPException(
             status_code=500,
             detail="BayernCloud API not configured (set BAYERNCLOUD_API_KEY and BAYERNCLOUD_API_BASE_URL).",
         )
 
-    endpoint_ids: List[str] = [
-        "915cbd6f-4434-4723-a54d-046b43ad52c5",  # list_attractions
-        "9d164080-9226-4f32-9d07-c5a83e970a58",  # list_retail
-        "cf5cce8d-cc0c-4835-816a-d7c22e32394f",  # list_food
-        "e0ed98a3-4137-4e62-9227-eb084e292151",  # list_mobility
-        "0f102b60-cca7-4b80-ad6e-31bea5ea641c",  # list_nature
-        "58056461-59dc-42e2-9025-3c16ce6968d7",  # list_tracks
-        "7a71084c-3802-42bc-88e7-f5c7bd22354c",  # list_accommodations
-        "36a736f7-9e2d-4be5-b0f0-45ada2ff7013",  # list_current_events
-    ]
-
-    with_subtrees: List[str] = ["2db595fc-c60d-46fe-85d1-a4da648910da"]
-
-    PAGE_SIZE = 100
-    file_info = []
-
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        for endpoint_id in endpoint_ids:
-            for subtree in with_subtrees:
-                master_data, total_items = await fetch_external_data(
-                    client, endpoint_id, subtree, page=1, size=PAGE_SIZE
-                )
+    endpoint_ids = request.endpoint_ids or bayerncloud.ENDPOINT_IDS
+    unknown = [e for e in endpoint_ids if e not in bayerncloud.ENDPOINT_IDS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown endpoint_ids: {unknown}")
+
+    if request.background:
+        try:
+            job = job_manager.start(endpoint_ids, request.output_format, request.incremental)
+        except JobConflictError as e:
+            raise conflict(e)
+        return JSONResponse(
+            status_code=202,
+            content={
+                "job_id": job.job_id,
+                "status": job.status,
+                "status_url": f"/poi/fetch-bayerncloud/jobs/{job.job_id}",
+            },
+        )
 
-                if "error" in master_data:
-                    # keep going, but record failure
-                    file_info.append({"endpoint_id": endpoint_id, "error": master_data["error"]})
-                    continue
-
-                meta_collection = master_data.get("meta", {}).get("collection", {})
-                endpoint_slug = meta_collection.get("slug") or meta_collection.get("name") or endpoint_id
-                filename = f"bayerncloud_{str(endpoint_slug).replace(' ', '_').lower()}.json"
-
-                total_pages = math.ceil((total_items or 0) / PAGE_SIZE)
-                if total_pages > 1:
-                    tasks = [
-                        fetch_external_data(client, endpoint_id, subtree, page=p, size=PAGE_SIZE)
-                        for p in range(2, total_pages + 1)
-                    ]
-                    pages_results = await asyncio.gather(*tasks)
-
-                    for page_data, _ in pages_results:
-                        if isinstance(page_data, dict) and "@graph" in page_data:
-                            master_data["@graph"].extend(page_data["@graph"])
-
-                await to_thread.run_sync(
-                    save_json_file,
-                    master_data,
-                    os.path.join(BAYERNCLOUD_DATA_DIR, filename),
+    try:
+        async with fetch_admission.slot():
+            with job_manager.inline(endpoint_ids):
+                file_info = await bayerncloud.refresh_collections(
+                    endpoint_ids=endpoint_ids,
+                    output_format=request.output_format,
+                    incremental=request.incremental,
                 )
+    except JobConflictError as e:
+        raise conflict(e)
 
-                file_info.append({"file": filename, "count": len(master_data.get("@graph", []))})
-
-    return {"status": "success", "processed_files": file_info}
-
-
-async def fetch_external_data(
-    client: httpx.AsyncClient,
-    endpoint_id: str,
-    with_subtree: str,
-    page: int,
-    size: int,
-):
-    url = f"{BAYERNCLOUD_API_BASE_URL}/{endpoint_id}"
-    params = {"page[size]": size, "page[number]": page}
-    payload = {
-        "filter": {"classifications": {"in": {"withSubtree": [with_subtree]}}},
-        "include": ["dc:additionalInformation", "dc:classification", "location", "address"],
-    }
-    headers = {
-        "Authorization": f"Bearer {BAYERNCLOUD_API_KEY}",
-        "Content-Type": "application/json",
-        "Accept": "application/ld+json",
-    }
+    partial = any("error" in info or info.get("failed_pages") for info in file_info)
+    return {"status": "partial" if partial else "success", "processed_files": file_info}
 
-    try:
-        response = await client.post(url, params=params, json=payload, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        total_items = data.get("meta", {}).get("total", 0)
-        return data, total_items
-    except Exception as e:
-        return {"error": str(e)}, 0
-
-
-def save_json_file(data: dict, path: str):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+
+@app.get("/poi/fetch-bayerncloud/jobs", response_model=List[FetchJob])
+async def list_bayerncloud_jobs():
+    return job_manager.list()
+
+
+@app.get("/poi/fetch-bayerncloud/jobs/{job_id}", response_model=FetchJob)
+async def get_bayerncloud_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
+@app.post("/poi/fetch-bayerncloud/jobs/{job_id}/cancel", response_model=FetchJob)
+async def cancel_bayerncloud_job(job_id: str):
+    job = await job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
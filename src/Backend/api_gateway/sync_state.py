@@ -0,0 +1,60 @@
+import os
+import json
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# -----------------------------
+# Incremental sync state
+# -----------------------------
+# One file per endpoint under <data_dir>/state/, e.g.
+# {
+#   "last_sync": "2026-10-19T08:00:00+00:00",       # last run without failed pages
+#   "last_full_sync": "2026-10-12T08:00:00+00:00",  # last run that listed every item
+#   "items": {"<@id>": {"hash": "<sha256>", "modified": "<dct:modified>"}}
+# }
+STATE_DIR = "state"
+
+MODIFIED_KEYS = ("dct:modified", "dateModified")
+
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def item_hash(item: Dict[str, Any]) -> str:
+    canonical = json.dumps(item, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def item_modified(item: Dict[str, Any]) -> Optional[str]:
+    for key in MODIFIED_KEYS:
+        if item.get(key):
+            return str(item[key])
+    return None
+
+
+def state_path(data_dir: str, endpoint_id: str) -> str:
+    return os.path.join(data_dir, STATE_DIR, f"{endpoint_id}.json")
+
+
+def load_sync_state(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {"last_sync": None, "last_full_sync": None, "items": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_sync_state(path: str, state: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def hours_since(timestamp: Optional[str]) -> Optional[float]:
+    if not timestamp:
+        return None
+    then = datetime.fromisoformat(timestamp)
+    return (datetime.now(timezone.utc) - then).total_seconds() / 3600.0
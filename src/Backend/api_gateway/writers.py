@@ -0,0 +1,486 @@
+import os
+import gzip
+import json
+import zlib
+import hashlib
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from Backend.api_gateway.sync_state import item_hash, item_modified, save_sync_state
+
+# -----------------------------
+# Output writers for BayernCloud collections
+# -----------------------------
+# json:       one pretty-printed JSON-LD document per collection (legacy, buffered in memory)
+# ndjson:     one item per line, appended page by page as pages arrive
+# ndjson.gz:  same, gzip-compressed
+# corpus:     compact corpus of the fields the ingesters use, see CorpusCollectionWriter
+OUTPUT_FORMATS = ("json", "ndjson", "ndjson.gz", "corpus")
+
+MANIFEST_DIR = "manifests"
+DELTA_DIR = "deltas"
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class JsonCollectionWriter:
+    """Collects all pages and writes the original single-document format on close."""
+
+    extension = "json"
+
+    def __init__(self, data_dir: str, base_name: str):
+        self.data_dir = data_dir
+        self.filename = f"{base_name}.{self.extension}"
+        self.path = os.path.join(data_dir, self.filename)
+        self.document: Dict[str, Any] = {}
+        self.pages: Dict[int, List[dict]] = {}
+
+    def open(self, first_page: dict):
+        self.document = {k: v for k, v in first_page.items() if k != "@graph"}
+
+    def write_page(self, page: int, items: List[dict]):
+        self.pages[page] = items
+
+    def close(self, pages_total: int, failed_pages: List[int]) -> Dict[str, Any]:
+        self.document["@graph"] = [item for page in sorted(self.pages) for item in self.pages[page]]
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.document, f, ensure_ascii=False, indent=2)
+
+        info = {"file": self.filename, "count": len(self.document["@graph"]), "pages_total": pages_total}
+        if failed_pages:
+            info["failed_pages"] = failed_pages
+        return info
+
+    def abort(self):
+        self.pages.clear()
+
+
+class NdjsonCollectionWriter:
+    """
+    Streams items to `<base_name>.ndjson[.gz]` as pages arrive, so memory stays
+    at one page regardless of collection size. The file is written under a
+    `.part` name and renamed on close; a manifest with per-page counts and the
+    file checksum goes to `manifests/<base_name>.json`.
+    """
+
+    def __init__(self, data_dir: str, base_name: str, compress: bool = False):
+        self.data_dir = data_dir
+        self.base_name = base_name
+        self.compress = compress
+        self.filename = f"{base_name}.ndjson" + (".gz" if compress else "")
+        self.path = os.path.join(data_dir, self.filename)
+        self.part_path = self.path + ".part"
+        self.meta: Dict[str, Any] = {}
+        self.page_counts: Dict[int, int] = {}
+        self.count = 0
+        self._file = None
+
+    def open(self, first_page: dict):
+        self.meta = {k: v for k, v in first_page.items() if k != "@graph"}
+        if self.compress:
+            self._file = gzip.open(self.part_path, "wt", encoding="utf-8")
+        else:
+            self._file = open(self.part_path, "w", encoding="utf-8")
+
+    def write_page(self, page: int, items: List[dict]):
+        lines = [json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n" for item in items]
+        self._file.writelines(lines)
+        self.page_counts[page] = len(items)
+        self.count += len(items)
+
+    def close(self, pages_total: int, failed_pages: List[int]) -> Dict[str, Any]:
+        self._file.close()
+        os.replace(self.part_path, self.path)
+
+        manifest = {
+            "file": self.filename,
+            "format": "ndjson.gz" if self.compress else "ndjson",
+            "count": self.count,
+            "pages_total": pages_total,
+            "pages": {str(p): self.page_counts[p] for p in sorted(self.page_counts)},
+            "failed_pages": failed_pages,
+            "bytes": os.path.getsize(self.path),
+            "sha256": file_sha256(self.path),
+            "meta": self.meta,
+        }
+        manifest_dir = os.path.join(self.data_dir, MANIFEST_DIR)
+        os.makedirs(manifest_dir, exist_ok=True)
+        with open(os.path.join(manifest_dir, f"{self.base_name}.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        info = {"file": self.filename, "count": self.count, "pages_total": pages_total, "sha256": manifest["sha256"]}
+        if failed_pages:
+            info["failed_pages"] = failed_pages
+        return info
+
+    def abort(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+
+class DeltaCollectionWriter:
+    """
+    Incremental sync: compares every received item against the endpoint's
+    sync state and writes only added/changed items to
+    `deltas/<base_name>.<stamp>.ndjson`, plus `deltas/<base_name>.<stamp>.json`
+    with the added/changed ids and the tombstone list of deleted ids.
+
+    The delta is then merged into the collection's snapshot file (the one the
+    ingesters read, see merge_delta_into_snapshot): changed items replace
+    their old version, tombstoned ids are dropped. The ingester's diff mode
+    (INGEST_DIFF / INGEST_DELETE_MISSING) turns that into index updates and
+    deletions. The sync state is saved only after the merge succeeded.
+
+    Deletions can only be detected when the run listed the whole collection
+    (`full_listing`) and no page failed.
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        base_name: str,
+        state: Dict[str, Any],
+        state_file: str,
+        full_listing: bool,
+        started_at: str,
+        output_format: str = "json",
+    ):
+        self.data_dir = data_dir
+        # format of a new snapshot; an existing one keeps its format
+        self.output_format = output_format
+        self.base_name = base_name
+        self.state = state
+        self.state_file = state_file
+        self.full_listing = full_listing
+        self.started_at = started_at
+
+        stamp = started_at.replace("-", "").replace(":", "").split("+")[0]
+        self.delta_dir = os.path.join(data_dir, DELTA_DIR)
+        self.filename = f"{base_name}.{stamp}.ndjson"
+        self.path = os.path.join(self.delta_dir, self.filename)
+        self.part_path = self.path + ".part"
+        self.summary_path = os.path.join(self.delta_dir, f"{base_name}.{stamp}.json")
+
+        self.seen: Set[str] = set()
+        self.added: List[str] = []
+        self.changed: List[str] = []
+        self.updates: Dict[str, Dict[str, Any]] = {}
+        self.unchanged = 0
+        self.meta: Dict[str, Any] = {}
+        self._file = None
+
+    def open(self, first_page: dict):
+        self.meta = {k: v for k, v in first_page.items() if k != "@graph"}
+        os.makedirs(self.delta_dir, exist_ok=True)
+        self._file = open(self.part_path, "w", encoding="utf-8")
+
+    def write_page(self, page: int, items: List[dict]):
+        known = self.state["items"]
+        for item in items:
+            item_id = item.get("@id")
+            if not item_id:
+                continue
+            self.seen.add(item_id)
+
+            digest = item_hash(item)
+            previous = known.get(item_id)
+            if previous is not None and previous.get("hash") == digest:
+                self.unchanged += 1
+                continue
+
+            (self.added if previous is None else self.changed).append(item_id)
+            self.updates[item_id] = {"hash": digest, "modified": item_modified(item)}
+            self._file.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def close(self, pages_total: int, failed_pages: List[int]) -> Dict[str, Any]:
+        self._file.close()
+
+        complete = not failed_pages
+        deleted: List[str] = []
+        if self.full_listing and complete:
+            deleted = sorted(set(self.state["items"]) - self.seen)
+
+        self.state["items"].update(self.updates)
+        for item_id in deleted:
+            self.state["items"].pop(item_id, None)
+        if complete:
+            # failed pages keep the old watermark so they are picked up next time
+            self.state["last_sync"] = self.started_at
+            if self.full_listing:
+                self.state["last_full_sync"] = self.started_at
+
+        has_changes = bool(self.added or self.changed or deleted)
+        snapshot = None
+        if has_changes:
+            os.replace(self.part_path, self.path)
+            summary = {
+                "collection": self.base_name,
+                "synced_at": self.started_at,
+                "full_listing": self.full_listing,
+                "items_file": self.filename,
+                "added": self.added,
+                "changed": self.changed,
+                "deleted": deleted,
+                "failed_pages": failed_pages,
+            }
+            with open(self.summary_path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            snapshot = merge_delta_into_snapshot(
+                self.data_dir, self.base_name, self.path, set(self.added) | set(self.changed) | set(deleted),
+                self.output_format, self.meta,
+            )
+        else:
+            os.remove(self.part_path)
+
+        save_sync_state(self.state_file, self.state)
+
+        info = {
+            "collection": self.base_name,
+            "delta_file": self.filename if has_changes else None,
+            "snapshot_file": snapshot["file"] if snapshot else None,
+            "added": len(self.added),
+            "changed": len(self.changed),
+            "deleted": len(deleted),
+            "unchanged": self.unchanged,
+            "full_listing": self.full_listing,
+            "pages_total": pages_total,
+        }
+        if failed_pages:
+            info["failed_pages"] = failed_pages
+        return info
+
+    def abort(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+
+# Fields of a BayernCloud item that the ingesters read (top level -> nested keys, None = keep as is)
+CORPUS_FIELDS: Dict[str, Any] = {
+    "@id": None,
+    "name": None,
+    "description": None,
+    "url": None,
+    "telephone": None,
+    "startDate": None,
+    "endDate": None,
+    "dct:modified": None,
+    "address": ("streetAddress", "postalCode", "addressLocality", "addressCountry", "url", "telephone"),
+    "geo": ("latitude", "longitude", "line"),
+    # validFrom/validThrough: seasonal hours, see Ingester/opening_hours.py
+    "openingHoursSpecification": ("opens", "closes", "dayOfWeek", "validFrom", "validThrough", "description"),
+}
+CORPUS_VERSION = 1
+CORPUS_BLOCK_RECORDS = int(os.getenv("BAYERNCLOUD_CORPUS_BLOCK_RECORDS", "64"))
+
+
+def _project(value: Any, keys) -> Any:
+    if keys is None:
+        return value
+    if isinstance(value, list):
+        return [_project(v, keys) for v in value]
+    if isinstance(value, dict):
+        return {k: value[k] for k in keys if value.get(k) not in (None, "", [])}
+    return value
+
+
+def normalize_corpus_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    record = {}
+    for field, keys in CORPUS_FIELDS.items():
+        value = item.get(field)
+        if value in (None, "", [], {}):
+            continue
+        record[field] = _project(value, keys)
+    return record
+
+
+class CorpusCollectionWriter:
+    """
+    Compact corpus: `<base_name>.corpus` holds zlib-compressed blocks of up to
+    CORPUS_BLOCK_RECORDS newline-separated JSON records, reduced to
+    CORPUS_FIELDS. `<base_name>.corpus.idx` (JSON) lists the blocks as
+    [offset, length, records] and maps every @id to [block, line], so
+    readers can mmap the corpus, decompress one block to fetch a record by
+    id, or stream block by block. Read with Ingester/sources.CorpusReader.
+    """
+
+    def __init__(self, data_dir: str, base_name: str):
+        self.data_dir = data_dir
+        self.filename = f"{base_name}.corpus"
+        self.path = os.path.join(data_dir, self.filename)
+        self.part_path = self.path + ".part"
+        self.index_path = self.path + ".idx"
+        self.meta: Dict[str, Any] = {}
+        self.blocks: List[List[int]] = []
+        self.ids: Dict[str, List[int]] = {}
+        self.count = 0
+        self.raw_bytes = 0
+        self._pending: List[bytes] = []
+        self._offset = 0
+        self._digest = hashlib.sha256()
+        self._file = None
+
+    def open(self, first_page: dict):
+        self.meta = {k: v for k, v in first_page.items() if k not in ("@graph", "links")}
+        self._file = open(self.part_path, "wb")
+
+    def _flush_block(self):
+        if not self._pending:
+            return
+        raw = b"".join(self._pending)
+        block = zlib.compress(raw, 9)
+        self._file.write(block)
+        self._digest.update(block)
+        self.blocks.append([self._offset, len(block), len(self._pending)])
+        self._offset += len(block)
+        self.raw_bytes += len(raw)
+        self._pending = []
+
+    def write_page(self, page: int, items: List[dict]):
+        for item in items:
+            record = normalize_corpus_item(item)
+            if record.get("@id"):
+                self.ids[record["@id"]] = [len(self.blocks), len(self._pending)]
+            self._pending.append(
+                json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+            )
+            self.count += 1
+            if len(self._pending) >= CORPUS_BLOCK_RECORDS:
+                self._flush_block()
+
+    def close(self, pages_total: int, failed_pages: List[int]) -> Dict[str, Any]:
+        self._flush_block()
+        self._file.close()
+
+        index = {
+            "version": CORPUS_VERSION,
+            "file": self.filename,
+            "count": self.count,
+            "fields": list(CORPUS_FIELDS),
+            "raw_bytes": self.raw_bytes,
+            "bytes": self._offset,
+            "sha256": self._digest.hexdigest(),
+            "pages_total": pages_total,
+            "failed_pages": failed_pages,
+            "meta": self.meta,
+            "blocks": self.blocks,
+            "ids": self.ids,
+        }
+        with open(self.index_path + ".part", "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+        # index first, then the data: new blocks never appear next to the old
+        # index. Between the two renames a reader sees the new index with the
+        # old data, which CorpusReader rejects by comparing sizes.
+        os.replace(self.index_path + ".part", self.index_path)
+        os.replace(self.part_path, self.path)
+
+        info = {"file": self.filename, "count": self.count, "pages_total": pages_total, "sha256": index["sha256"]}
+        if failed_pages:
+            info["failed_pages"] = failed_pages
+        return info
+
+    def abort(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        for path in (self.part_path, self.index_path + ".part"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# snapshot file suffixes, most compact first (a collection normally has one)
+SNAPSHOT_FORMATS = (("corpus", ".corpus"), ("ndjson.gz", ".ndjson.gz"), ("ndjson", ".ndjson"), ("json", ".json"))
+SNAPSHOT_PAGE_ITEMS = 1000
+
+
+def find_snapshot(data_dir: str, base_name: str) -> Optional[Tuple[str, str]]:
+    """(path, format) of the collection's current snapshot file, if any."""
+    for output_format, suffix in SNAPSHOT_FORMATS:
+        path = os.path.join(data_dir, base_name + suffix)
+        if os.path.exists(path):
+            return path, output_format
+    return None
+
+
+def iter_snapshot_items(path: str, output_format: str) -> Iterator[Dict[str, Any]]:
+    if output_format == "corpus":
+        with open(path + ".idx", "r", encoding="utf-8") as f:
+            index = json.load(f)
+        with open(path, "rb") as f:
+            for offset, length, _ in index["blocks"]:
+                f.seek(offset)
+                for line in zlib.decompress(f.read(length)).splitlines():
+                    yield json.loads(line)
+        return
+
+    if output_format in ("ndjson", "ndjson.gz"):
+        opener = gzip.open if output_format == "ndjson.gz" else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    yield from data.get("@graph", []) if isinstance(data, dict) else data
+
+
+def merge_delta_into_snapshot(
+    data_dir: str,
+    base_name: str,
+    delta_path: str,
+    replaced_ids: Set[str],
+    output_format: str,
+    meta: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Rewrites the snapshot as: old items whose id is not in `replaced_ids`
+    (changed or deleted), then the items of the delta file. Written through
+    the normal writer of the snapshot's format (.part + rename, manifest/idx).
+    """
+    existing = find_snapshot(data_dir, base_name)
+    if existing is not None:
+        output_format = existing[1]
+    writer = make_writer(output_format, data_dir, base_name)
+    writer.open(meta)
+    page = 0
+    try:
+        def items() -> Iterator[Dict[str, Any]]:
+            if existing is not None:
+                for item in iter_snapshot_items(*existing):
+                    if item.get("@id") not in replaced_ids:
+                        yield item
+            yield from iter_snapshot_items(delta_path, "ndjson")
+
+        batch: List[dict] = []
+        for item in items():
+            batch.append(item)
+            if len(batch) >= SNAPSHOT_PAGE_ITEMS:
+                page += 1
+                writer.write_page(page, batch)
+                batch = []
+        if batch or not page:
+            page += 1
+            writer.write_page(page, batch)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close(page, [])
+
+
+def make_writer(output_format: str, data_dir: str, base_name: str):
+    if output_format == "corpus":
+        return CorpusCollectionWriter(data_dir, base_name)
+    if output_format == "json":
+        return JsonCollectionWriter(data_dir, base_name)
+    if output_format in ("ndjson", "ndjson.gz"):
+        return NdjsonCollectionWriter(data_dir, base_name, compress=output_format == "ndjson.gz")
+    raise ValueError(f"Unknown output format '{output_format}', use one of {list(OUTPUT_FORMATS)}")
@@ -0,0 +1,268 @@
+import os
+import sys
+import asyncio
+import hmac
+import json
+import time
+import uuid
+import inspect
+import functools
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.routing import APIRoute
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+
+# -----------------------------
+# On-demand request profiling
+# -----------------------------
+# Disabled unless PROFILING_TOKEN is set. A request opts in with
+#   X-Profile: collapsed|speedscope   (or ?profile=...)
+#   X-Profile-Token: <PROFILING_TOKEN> (or ?profile_token=...)
+# Without PROFILING_STORE_DIR the profile replaces the response body,
+# otherwise it is written there and the normal response is returned.
+#
+# Only the threads handling the profiled request are sampled: the event loop
+# thread running the request (which also runs other requests' coroutines
+# while this one awaits), and for sync endpoints the worker thread while it
+# runs the endpoint. Other concurrent requests' threads stay out.
+#
+# Shared by the API gateway and the trip planner: both images are built from
+# src/ and copy Backend/common (see their Dockerfiles).
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_STORE_DIR = os.getenv("PROFILING_STORE_DIR", "")
+
+PROFILE_FORMATS = ("collapsed", "speedscope")
+
+# innermost frames of threads that are just waiting for work
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+Frame = Tuple[str, str, int]
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of the registered threads at a fixed interval."""
+
+    def __init__(self, interval_ms: float = PROFILING_INTERVAL_MS, threads: Iterable[int] = ()):
+        self.interval = max(interval_ms, 0.5) / 1000.0
+        self.samples: Counter = Counter()
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._threads: Set[int] = set(threads)
+        self._threads_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def add_thread(self, ident: int):
+        with self._threads_lock:
+            self._threads.add(ident)
+
+    def remove_thread(self, ident: int):
+        with self._threads_lock:
+            self._threads.discard(ident)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        with self._threads_lock:
+            threads = set(self._threads)
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+
+        for ident, frame in sys._current_frames().items():
+            if ident not in threads or _is_idle(frame):
+                continue
+
+            stack: List[Frame] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+
+            stack.append((f"thread {thread_names.get(ident, ident)}", "", 0))
+            stack.reverse()
+            self.samples[tuple(stack)] += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format, readable by flamegraph.pl and speedscope."""
+        lines = []
+        for stack, count in self.samples.most_common():
+            names = ";".join(_frame_label(f) for f in stack)
+            lines.append(f"{names} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str) -> dict:
+        frame_index: Dict[Frame, int] = {}
+        frames = []
+        samples = []
+        weights = []
+
+        for stack, count in self.samples.items():
+            indices = []
+            for f in stack:
+                if f not in frame_index:
+                    frame_index[f] = len(frames)
+                    frames.append({"name": f[0], "file": f[1], "line": f[2]})
+                indices.append(frame_index[f])
+            samples.append(indices)
+            weights.append(count * self.interval * 1000.0)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "kira-request-profiler",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": self.duration * 1000.0,
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+
+# profiler of the request being handled; copied into worker threads with the context
+_active_profiler: ContextVar[Optional[SamplingProfiler]] = ContextVar("active_profiler", default=None)
+
+
+def _sampled_in_worker(endpoint: Callable) -> Callable:
+    """Registers the worker thread running a sync endpoint with the request's profiler."""
+
+    @functools.wraps(endpoint)
+    def run(*args, **kwargs):
+        profiler = _active_profiler.get()
+        if profiler is None:
+            return endpoint(*args, **kwargs)
+        ident = threading.get_ident()
+        profiler.add_thread(ident)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profiler.remove_thread(ident)
+
+    return run
+
+
+class ProfiledRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if not inspect.iscoroutinefunction(endpoint):
+            # sync endpoints run in the threadpool; signature is kept via __wrapped__
+            endpoint = _sampled_in_worker(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+def _frame_label(frame: Frame) -> str:
+    name, filename, line = frame
+    if not filename:
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def _requested_format(request: Request) -> str:
+    return (request.headers.get("x-profile") or request.query_params.get("profile") or "").lower()
+
+
+def _is_authorized(request: Request) -> bool:
+    if not PROFILING_TOKEN:
+        return False
+    token = request.headers.get("x-profile-token") or request.query_params.get("profile_token") or ""
+    return hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode())
+
+
+def _store_profile(directory: str, filename: str, content: str):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, filename), "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def install_profiling(app: FastAPI):
+    """Registers the opt-in profiling middleware on `app`; call before declaring routes."""
+    app.router.route_class = ProfiledRoute
+
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        fmt = _requested_format(request)
+        if not fmt:
+            return await call_next(request)
+
+        if fmt not in PROFILE_FORMATS:
+            return JSONResponse(
+                status_code=400,
+                content={"detail": f"Unknown profile format '{fmt}', use one of {list(PROFILE_FORMATS)}"},
+            )
+        if not _is_authorized(request):
+            return JSONResponse(status_code=403, content={"detail": "Profiling not authorized"})
+
+        # the event loop thread; call_next copies the context, so worker threads see the profiler
+        profiler = SamplingProfiler(threads=[threading.get_ident()])
+        token = _active_profiler.set(profiler)
+        profiler.start()
+        try:
+            response = await call_next(request)
+            # drain the body inside the profiled window so serialization is included
+            body = b"".join([chunk async for chunk in response.body_iterator])
+        finally:
+            profiler.stop()
+            _active_profiler.reset(token)
+
+        name = f"{request.method} {request.url.path}"
+        if fmt == "collapsed":
+            content = profiler.collapsed()
+            media_type = "text/plain"
+        else:
+            content = json.dumps(profiler.speedscope(name))
+            media_type = "application/json"
+
+        profile_headers = {
+            "X-Profile-Samples": str(sum(profiler.samples.values())),
+            "X-Profile-Duration-Ms": f"{profiler.duration * 1000.0:.1f}",
+        }
+
+        if PROFILING_STORE_DIR:
+            ext = "txt" if fmt == "collapsed" else "speedscope.json"
+            filename = f"profile_{int(time.time())}_{uuid.uuid4().hex[:8]}.{ext}"
+            # file I/O off the event loop
+            await asyncio.to_thread(_store_profile, PROFILING_STORE_DIR, filename, content)
+
+            # the original response with its body replayed: headers stay as they are,
+            # including repeated ones such as Set-Cookie
+            async def replay():
+                yield body
+
+            response.body_iterator = replay()
+            response.headers.update(profile_headers)
+            response.headers["X-Profile-File"] = filename
+            return response
+
+        profile_headers["X-Profiled-Status"] = str(response.status_code)
+        if fmt == "collapsed":
+            return PlainTextResponse(content, headers=profile_headers)
+        return Response(content, media_type=media_type, headers=profile_headers)
@@ -9,10 +9,12 @@ from otp_service import get_stop_coords
 from models import Trip, Day
 from storage_opensearch import store_trip
 from otp_service import extract_primary_transit_leg_from_plan
+from Backend.common.profiling import install_profiling
 
 
 
 app = FastAPI()
+install_profiling(app)
 
 
 @app.get("/health")
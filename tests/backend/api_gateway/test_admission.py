@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from Backend.api_gateway import main as gateway
+from Backend.api_gateway.admission import AdmissionController, ClientBuckets
+from Backend.api_gateway.client import TripResponse
+
+
+def controller(**overrides) -> AdmissionController:
+    options = dict(
+        max_concurrency=1, max_queue=1, queue_timeout_sec=0.05,
+        client_rate_per_sec=0, client_burst=1,
+    )
+    options.update(overrides)
+    return AdmissionController("test", **options)
+
+
+@pytest.mark.asyncio
+async def test_slot_queues_then_sheds():
+    admission = controller()
+    release = asyncio.Event()
+
+    async def hold():
+        async with admission.slot():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as shed:
+        async with admission.slot():
+            pass
+    assert shed.value.status_code == 503
+    assert shed.value.headers["Retry-After"] == "1"
+
+    release.set()
+    await asyncio.gather(holder, queued)
+    assert admission.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_deadline_returns_503():
+    admission = controller(max_queue=5, queue_timeout_sec=0.01)
+    release = asyncio.Event()
+
+    async def hold():
+        async with admission.slot():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    with pytest.raises(HTTPException) as shed:
+        async with admission.slot():
+            pass
+    assert shed.value.status_code == 503
+    assert admission.waiting == 0
+
+    release.set()
+    await holder
+
+
+def test_client_buckets_are_per_client():
+    buckets = ClientBuckets(rate=1, burst=2)
+    assert buckets.try_acquire("a") == 0
+    assert buckets.try_acquire("a") == 0
+    assert buckets.try_acquire("a") > 0
+    assert buckets.try_acquire("b") == 0
+
+
+@pytest.mark.asyncio
+async def test_plan_trip_rate_limited_per_client(gateway_client, monkeypatch):
+    monkeypatch.setattr(gateway, "plan_trip_admission", controller(client_rate_per_sec=0.01, client_burst=1))
+
+    async def fake_call_trip_planner(req):
+        return TripResponse(trip_id="t", origin=req.origin, destination=req.destination, duration_minutes=1)
+
+    monkeypatch.setattr(gateway, "call_trip_planner", fake_call_trip_planner)
+    gateway.plan_cache.clear()
+
+    first = await gateway_client.post(
+        "/plan-trip", json={"origin": "Fischen", "destination": "Sonthofen"}, headers={"X-Client-Id": "agent-1"}
+    )
+    second = await gateway_client.post(
+        "/plan-trip", json={"origin": "Fischen", "destination": "Oberstdorf"}, headers={"X-Client-Id": "agent-1"}
+    )
+    other = await gateway_client.post(
+        "/plan-trip", json={"origin": "Fischen", "destination": "Oberstdorf"}, headers={"X-Client-Id": "agent-2"}
+    )
+    gateway.plan_cache.clear()
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert int(second.headers["Retry-After"]) >= 1
+    assert other.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_plan_trip_cache_hits_skip_the_rate_limit(gateway_client, monkeypatch):
+    monkeypatch.setattr(gateway, "plan_trip_admission", controller(client_rate_per_sec=0.01, client_burst=1))
+
+    async def fake_call_trip_planner(req):
+        return TripResponse(trip_id="t", origin=req.origin, destination=req.destination, duration_minutes=1)
+
+    monkeypatch.setattr(gateway, "call_trip_planner", fake_call_trip_planner)
+    gateway.plan_cache.clear()
+
+    body = {"origin": "Fischen", "destination": "Sonthofen"}
+    miss = await gateway_client.post("/plan-trip", json=body, headers={"X-Client-Id": "agent-1"})
+    hit = await gateway_client.post("/plan-trip", json=body, headers={"X-Client-Id": "agent-1"})
+    gateway.plan_cache.clear()
+
+    assert miss.status_code == 200
+    assert (hit.status_code, hit.headers["X-Cache"]) == (200, "HIT")
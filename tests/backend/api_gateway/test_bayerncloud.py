@@ -0,0 +1,297 @@
+import gzip
+import json
+import asyncio
+
+import httpx
+import pytest
+
+from Backend.api_gateway import bayerncloud, writers
+
+
+@pytest.fixture
+def bayerncloud_api(monkeypatch, tmp_path):
+    monkeypatch.setattr(bayerncloud, "BAYERNCLOUD_API_BASE_URL", "http://bayerncloud.test/api")
+    monkeypatch.setattr(bayerncloud, "BAYERNCLOUD_API_KEY", "key")
+    monkeypatch.setattr(bayerncloud, "BAYERNCLOUD_DATA_DIR", str(tmp_path))
+    return tmp_path
+
+
+def page_response(page: int, total: int = 250, size: int = 100) -> httpx.Response:
+    start = (page - 1) * size
+    items = [{"@id": f"poi-{i}"} for i in range(start, min(start + size, total))]
+    return httpx.Response(
+        200,
+        json={"@graph": items, "meta": {"total": total, "collection": {"slug": "Test Food"}}},
+    )
+
+
+class PageCollector:
+    def __init__(self):
+        self.pages = {}
+
+    async def __call__(self, page: int, data: dict):
+        self.pages[page] = data.get("@graph", [])
+
+    @property
+    def items(self):
+        return [item for page in sorted(self.pages) for item in self.pages[page]]
+
+
+def make_scheduler(handler, **kwargs) -> bayerncloud.FetchScheduler:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    options = dict(rate_per_sec=0, backoff_base_sec=0, page_size=100, on_progress=None)
+    options.update(kwargs)
+    return bayerncloud.FetchScheduler(client, **options)
+
+
+@pytest.mark.asyncio
+async def test_fetch_collection_retries_throttled_pages(bayerncloud_api):
+    attempts = {}
+    events = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params["page[number]"])
+        attempts[page] = attempts.get(page, 0) + 1
+        if page == 2 and attempts[page] == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return page_response(page)
+
+    scheduler = make_scheduler(handler, on_progress=events.append)
+    collector = PageCollector()
+    result = await scheduler.fetch_collection("food", "subtree", collector)
+
+    assert len(collector.items) == 250
+    assert result["failed_pages"] == []
+    assert attempts == {1: 1, 2: 2, 3: 1}
+    assert [e["status"] for e in events].count("retry") == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_pages_are_reported_not_dropped(bayerncloud_api):
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params["page[number]"])
+        if page == 3:
+            return httpx.Response(503)
+        return page_response(page)
+
+    scheduler = make_scheduler(handler, max_retries=2)
+    collector = PageCollector()
+    result = await scheduler.fetch_collection("food", "subtree", collector)
+
+    assert result["failed_pages"] == [3]
+    assert len(collector.items) == 200
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(bayerncloud_api):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(401)
+
+    scheduler = make_scheduler(handler)
+    with pytest.raises(bayerncloud.BayernCloudFetchError):
+        await scheduler.fetch_collection("food", "subtree", PageCollector())
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded_across_endpoints(bayerncloud_api):
+    in_flight = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.005)
+        in_flight -= 1
+        return page_response(int(request.url.params["page[number]"]), total=1000)
+
+    scheduler = make_scheduler(handler, max_concurrency=3)
+    await asyncio.gather(*(scheduler.fetch_collection(e, "subtree", PageCollector()) for e in ["a", "b"]))
+
+    assert peak == 3
+
+
+def paged_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda r: page_response(int(r.url.params["page[number]"]))
+    ))
+
+
+@pytest.mark.asyncio
+async def test_refresh_collections_writes_json(bayerncloud_api):
+    file_info = await bayerncloud.refresh_collections(
+        endpoint_ids=["food"], subtrees=["subtree"], on_progress=None,
+        client=paged_client(), output_format="json",
+    )
+
+    assert file_info == [
+        {"endpoint_id": "food", "file": "bayerncloud_test_food.json", "count": 250, "pages_total": 3}
+    ]
+    with open(bayerncloud_api / "bayerncloud_test_food.json", encoding="utf-8") as f:
+        graph = json.load(f)["@graph"]
+    assert [item["@id"] for item in graph] == [f"poi-{i}" for i in range(250)]
+
+
+@pytest.mark.asyncio
+async def test_refresh_collections_streams_ndjson_gz(bayerncloud_api):
+    file_info = await bayerncloud.refresh_collections(
+        endpoint_ids=["food"], subtrees=["subtree"], on_progress=None,
+        client=paged_client(), output_format="ndjson.gz",
+    )
+
+    assert file_info[0]["file"] == "bayerncloud_test_food.ndjson.gz"
+    assert file_info[0]["count"] == 250
+    with gzip.open(bayerncloud_api / "bayerncloud_test_food.ndjson.gz", "rt", encoding="utf-8") as f:
+        ids = sorted(json.loads(line)["@id"] for line in f)
+    assert ids == sorted(f"poi-{i}" for i in range(250))
+
+    with open(bayerncloud_api / "manifests" / "bayerncloud_test_food.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert manifest["count"] == 250
+    assert manifest["pages"] == {"1": 100, "2": 100, "3": 50}
+    assert manifest["sha256"] == file_info[0]["sha256"]
+    assert not list(bayerncloud_api.glob("*.part"))
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_cancels_the_other_collections(bayerncloud_api):
+    slow_writing = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        endpoint = request.url.path.rsplit("/", 1)[-1]
+        page = int(request.url.params["page[number]"])
+        if endpoint == "slow" and page > 1:
+            # page 1 is in the slow collection's .part file by now
+            slow_writing.set()
+            await asyncio.sleep(5)
+        if endpoint == "fast" and page == 1:
+            await slow_writing.wait()
+        response = page_response(page)
+        data = json.loads(response.content)
+        data["meta"]["collection"]["slug"] = endpoint
+        return httpx.Response(200, json=data)
+
+    def on_collection_done(info):
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError, match="disk full"):
+        await asyncio.wait_for(bayerncloud.refresh_collections(
+            endpoint_ids=["fast", "slow"], subtrees=["subtree"], on_progress=None,
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), output_format="ndjson",
+            on_collection_done=on_collection_done,
+        ), timeout=2)
+
+    # the slow collection was cancelled and aborted its writer before the error surfaced
+    assert not list(bayerncloud_api.glob("*.part"))
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_sleeps_outside_its_lock():
+    bucket = bayerncloud.TokenBucket(rate=20, burst=1)
+    started = asyncio.get_running_loop().time()
+    waiters = [asyncio.create_task(bucket.acquire()) for _ in range(3)]
+    await asyncio.sleep(0.01)
+
+    assert not bucket._lock.locked()
+    await asyncio.gather(*waiters)
+    # one token at once, then one every 50 ms
+    assert asyncio.get_running_loop().time() - started >= 0.09
+
+
+def catalogue_client(items, requests_seen=None) -> httpx.AsyncClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if requests_seen is not None:
+            requests_seen.append(json.loads(request.content))
+        return httpx.Response(
+            200,
+            json={"@graph": items, "meta": {"total": len(items), "collection": {"slug": "Test Food"}}},
+        )
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_incremental_sync_writes_only_delta(bayerncloud_api):
+    first = [{"@id": "a", "name": "A"}, {"@id": "b", "name": "B"}, {"@id": "c", "name": "C"}]
+    info = await bayerncloud.refresh_collections(
+        endpoint_ids=["food"], subtrees=["s"], on_progress=None,
+        client=catalogue_client(first), incremental=True,
+    )
+    assert (info[0]["added"], info[0]["changed"], info[0]["deleted"]) == (3, 0, 0)
+
+    second = [{"@id": "a", "name": "A"}, {"@id": "b", "name": "B2"}, {"@id": "d", "name": "D"}]
+    info = (await bayerncloud.refresh_collections(
+        endpoint_ids=["food"], subtrees=["s"], on_progress=None,
+        client=catalogue_client(second), incremental=True,
+    ))[0]
+    assert (info["added"], info["changed"], info["deleted"], info["unchanged"]) == (1, 1, 1, 1)
+
+    deltas = bayerncloud_api / "deltas"
+    with open(deltas / info["delta_file"], encoding="utf-8") as f:
+        assert sorted(json.loads(line)["@id"] for line in f) == ["b", "d"]
+    summary_file = info["delta_file"].replace(".ndjson", ".json")
+    with open(deltas / summary_file, encoding="utf-8") as f:
+        assert json.load(f)["deleted"] == ["c"]
+
+    # the snapshot the ingesters read has the changes and no longer has the tombstoned item
+    with open(bayerncloud_api / info["snapshot_file"], encoding="utf-8") as f:
+        snapshot = json.load(f)["@graph"]
+    assert {item["@id"]: item["name"] for item in snapshot} == {"a": "A", "b": "B2", "d": "D"}
+
+    info = (await bayerncloud.refresh_collections(
+        endpoint_ids=["food"], subtrees=["s"], on_progress=None,
+        client=catalogue_client(second), incremental=True,
+    ))[0]
+    assert info["delta_file"] is None
+    assert info["unchanged"] == 3
+
+
+@pytest.mark.asyncio
+async def test_incremental_sync_uses_updated_since_filter(bayerncloud_api, monkeypatch):
+    monkeypatch.setattr(bayerncloud, "BAYERNCLOUD_UPDATED_SINCE_FILTER", True)
+    items = [{"@id": "a", "name": "A"}]
+    await bayerncloud.refresh_collections(
+        endpoint_ids=["food"], subtrees=["s"], on_progress=None,
+        client=catalogue_client(items), incremental=True,
+    )
+
+    payloads = []
+    info = (await bayerncloud.refresh_collections(
+        endpoint_ids=["food"], subtrees=["s"], on_progress=None,
+        client=catalogue_client([], payloads), incremental=True,
+    ))[0]
+
+    assert "dct:modified" in payloads[0]["filter"]["attribute"]
+    assert info["full_listing"] is False
+    assert info["deleted"] == 0
+
+
+@pytest.mark.asyncio
+async def test_incremental_sync_merges_into_existing_corpus(bayerncloud_api):
+    first = [{"@id": f"poi-{i}", "name": f"P{i}"} for i in range(5)]
+    await bayerncloud.refresh_collections(
+        endpoint_ids=["food"], subtrees=["s"], on_progress=None,
+        client=catalogue_client(first), output_format="corpus",
+    )
+    await bayerncloud.refresh_collections(
+        endpoint_ids=["food"], subtrees=["s"], on_progress=None,
+        client=catalogue_client(first), incremental=True,
+    )
+
+    second = [{"@id": "poi-0", "name": "P0 neu"}] + first[1:4] + [{"@id": "poi-9", "name": "P9"}]
+    info = (await bayerncloud.refresh_collections(
+        endpoint_ids=["food"], subtrees=["s"], on_progress=None,
+        client=catalogue_client(second), incremental=True,
+    ))[0]
+
+    # the existing snapshot keeps its format (the default here would be json)
+    assert info["snapshot_file"] == "bayerncloud_test_food.corpus"
+    assert not (bayerncloud_api / "bayerncloud_test_food.json").exists()
+    items = list(writers.iter_snapshot_items(str(bayerncloud_api / info["snapshot_file"]), "corpus"))
+    assert {item["@id"]: item["name"] for item in items} == {
+        "poi-0": "P0 neu", "poi-1": "P1", "poi-2": "P2", "poi-3": "P3", "poi-9": "P9",
+    }
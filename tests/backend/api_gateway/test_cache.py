@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from Backend.api_gateway import main as gateway
+from Backend.api_gateway.cache import ResponseCache, normalize_place, time_bucket
+from Backend.api_gateway.client import TripResponse
+
+
+@pytest.fixture
+def planner_calls(monkeypatch):
+    calls = []
+
+    async def fake_call_trip_planner(req):
+        calls.append(req)
+        return TripResponse(
+            trip_id=f"t{len(calls)}",
+            origin=req.origin,
+            destination=req.destination,
+            duration_minutes=12,
+        )
+
+    monkeypatch.setattr(gateway, "call_trip_planner", fake_call_trip_planner)
+    gateway.plan_cache.clear()
+    yield calls
+    gateway.plan_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_plan_trip_served_from_cache(gateway_client, planner_calls):
+    first = await gateway_client.post("/plan-trip", json={"origin": "Fischen", "destination": "Sonthofen"})
+    second = await gateway_client.post("/plan-trip", json={"origin": " fischen ", "destination": "SONTHOFEN"})
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json()
+    assert len(planner_calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_plan_trip_cache_keyed_by_time_bucket(gateway_client, planner_calls):
+    body = {"origin": "Fischen", "destination": "Sonthofen", "date": "2026-01-10"}
+    await gateway_client.post("/plan-trip", json={**body, "time": "07:31"})
+    same_bucket = await gateway_client.post("/plan-trip", json={**body, "time": "07:44"})
+    next_bucket = await gateway_client.post("/plan-trip", json={**body, "time": "07:45"})
+
+    assert same_bucket.headers["X-Cache"] == "HIT"
+    assert next_bucket.headers["X-Cache"] == "MISS"
+    assert len(planner_calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_served_while_refreshing():
+    cache = ResponseCache(ttl_sec=0.01, stale_sec=60, max_entries=10)
+    values = iter(["old", "new"])
+
+    async def fetch():
+        return next(values)
+
+    assert await cache.get_or_fetch("k", fetch) == ("old", "MISS", 0.0)
+    await asyncio.sleep(0.02)
+
+    value, status, _ = await cache.get_or_fetch("k", fetch)
+    assert (value, status) == ("old", "STALE")
+
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    value, status, _ = await cache.get_or_fetch("k", fetch)
+    assert (value, status) == ("new", "HIT")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_fetch():
+    cache = ResponseCache(ttl_sec=60, stale_sec=0, max_entries=10)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*(cache.get_or_fetch("k", fetch) for _ in range(5)))
+    assert [r[0] for r in results] == ["value"] * 5
+    assert len(calls) == 1
+
+
+def test_cache_is_size_bounded():
+    cache = ResponseCache(ttl_sec=60, stale_sec=0, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.peek("a")
+    cache.put("c", 3)
+
+    assert len(cache) == 2
+    assert cache.peek("b")[1] == "MISS"
+    assert cache.peek("a")[0] == 1
+
+
+def test_key_normalization():
+    assert normalize_place("  München   Hbf ") == normalize_place("münchen hbf")
+    assert time_bucket("07:44", 15) == 7 * 60 + 30
+    assert time_bucket(None, 15) is None
@@ -0,0 +1,45 @@
+import httpx
+import pytest
+
+from Backend.api_gateway import client as trip_client
+from Backend.api_gateway.client import TripRequest, call_trip_planner
+
+
+@pytest.fixture
+def planner_calls(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(
+            200,
+            json={"trip_id": "t1", "origin": "Fischen", "destination": "Sonthofen", "duration_minutes": 12},
+        )
+
+    shared = httpx.AsyncClient(base_url="http://trip-planner", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(trip_client, "_client", shared)
+    yield calls
+    monkeypatch.setattr(trip_client, "_client", None)
+
+
+@pytest.mark.asyncio
+async def test_call_trip_planner_reuses_shared_client(planner_calls):
+    first = trip_client.get_trip_planner_client()
+    result = await call_trip_planner(TripRequest(origin="Fischen", destination="Sonthofen"))
+    await call_trip_planner(TripRequest(origin="Fischen", destination="Sonthofen"), timeout=2.0)
+
+    assert result.duration_minutes == 12
+    assert trip_client.get_trip_planner_client() is first
+    assert [c.url.path for c in planner_calls] == ["/plan-trip", "/plan-trip"]
+    assert planner_calls[1].extensions["timeout"]["read"] == 2.0
+
+
+@pytest.mark.asyncio
+async def test_lifespan_client_is_closed_and_recreated():
+    await trip_client.start_trip_planner_client()
+    opened = trip_client.get_trip_planner_client()
+    await trip_client.close_trip_planner_client()
+
+    assert opened.is_closed
+    assert trip_client.get_trip_planner_client() is not opened
+    await trip_client.close_trip_planner_client()
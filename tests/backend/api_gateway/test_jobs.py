@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+import pytest
+
+from Backend.api_gateway import bayerncloud
+from Backend.api_gateway import main as gateway
+from Backend.api_gateway.jobs import JobManager
+
+FOOD = bayerncloud.ENDPOINT_IDS[2]
+TRACKS = bayerncloud.ENDPOINT_IDS[5]
+
+
+@pytest.fixture
+def job_manager(monkeypatch, tmp_path):
+    manager = JobManager(jobs_dir=str(tmp_path / "jobs"))
+    monkeypatch.setattr(gateway, "job_manager", manager)
+    monkeypatch.setattr(bayerncloud, "is_configured", lambda: True)
+    return manager
+
+
+@pytest.fixture
+def release(monkeypatch):
+    """Fake refresh that reports one page per collection and waits until released."""
+    event = asyncio.Event()
+
+    async def fake_refresh_collections(endpoint_ids, on_progress=None, on_collection_done=None, **kwargs):
+        results = []
+        for endpoint_id in endpoint_ids:
+            on_progress({"endpoint_id": endpoint_id, "page": 1, "pages_total": 2, "status": "ok", "attempt": 1})
+            info = {"endpoint_id": endpoint_id, "file": f"{endpoint_id}.json", "count": 1, "pages_total": 2}
+            on_collection_done(info)
+            results.append(info)
+        await event.wait()
+        return results
+
+    monkeypatch.setattr(bayerncloud, "refresh_collections", fake_refresh_collections)
+    return event
+
+
+async def wait_for_status(client, job_id, statuses):
+    for _ in range(100):
+        job = (await client.get(f"/poi/fetch-bayerncloud/jobs/{job_id}")).json()
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job stuck in {job['status']}")
+
+
+@pytest.mark.asyncio
+async def test_background_job_reports_progress(gateway_client, job_manager, release, tmp_path):
+    response = await gateway_client.post(
+        "/poi/fetch-bayerncloud",
+        json={"retrieve_data": True, "background": True, "endpoint_ids": [FOOD]},
+    )
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    await wait_for_status(gateway_client, job_id, {"running"})
+    await asyncio.sleep(0.01)
+    running = (await gateway_client.get(f"/poi/fetch-bayerncloud/jobs/{job_id}")).json()
+    assert running["pages_done"] == 1
+    assert running["results"][0]["file"] == f"{FOOD}.json"
+
+    release.set()
+    done = await wait_for_status(gateway_client, job_id, {"succeeded"})
+    assert done["finished_at"] is not None
+
+    with open(tmp_path / "jobs" / f"{job_id}.json", encoding="utf-8") as f:
+        assert json.load(f)["status"] == "succeeded"
+
+
+@pytest.mark.asyncio
+async def test_one_refresh_per_collection(gateway_client, job_manager, release):
+    first = await gateway_client.post(
+        "/poi/fetch-bayerncloud",
+        json={"retrieve_data": True, "background": True, "endpoint_ids": [FOOD]},
+    )
+    second = await gateway_client.post(
+        "/poi/fetch-bayerncloud",
+        json={"retrieve_data": True, "background": True, "endpoint_ids": [FOOD, TRACKS]},
+    )
+    other = await gateway_client.post(
+        "/poi/fetch-bayerncloud",
+        json={"retrieve_data": True, "background": True, "endpoint_ids": [TRACKS]},
+    )
+
+    assert first.status_code == 202
+    assert second.status_code == 409
+    assert second.json()["detail"]["job_ids"] == [first.json()["job_id"]]
+    assert other.status_code == 202
+    release.set()
+
+
+@pytest.mark.asyncio
+async def test_cancel_job(gateway_client, job_manager, release):
+    response = await gateway_client.post(
+        "/poi/fetch-bayerncloud",
+        json={"retrieve_data": True, "background": True, "endpoint_ids": [FOOD]},
+    )
+    job_id = response.json()["job_id"]
+    await wait_for_status(gateway_client, job_id, {"running"})
+
+    cancelled = await gateway_client.post(f"/poi/fetch-bayerncloud/jobs/{job_id}/cancel")
+    assert cancelled.json()["status"] == "cancelled"
+    assert cancelled.json()["finished_at"] is not None
+
+    retry = await gateway_client.post(
+        "/poi/fetch-bayerncloud",
+        json={"retrieve_data": True, "background": True, "endpoint_ids": [FOOD]},
+    )
+    assert retry.status_code == 202
+    release.set()
+
+
+@pytest.mark.asyncio
+async def test_cancel_propagates_to_the_task(job_manager, release):
+    job = job_manager.start([FOOD])
+    task = job_manager._tasks[job.job_id]
+
+    # cancelled before the task ever ran
+    cancelled = await job_manager.cancel(job.job_id)
+    assert cancelled.status == "cancelled"
+    assert task.cancelled()
+    assert job_manager.start([FOOD]).status == "queued"
+    release.set()
+
+
+def test_running_jobs_marked_interrupted_on_restart(tmp_path):
+    jobs_dir = tmp_path / "jobs"
+    jobs_dir.mkdir()
+    (jobs_dir / "abc.json").write_text(json.dumps({"job_id": "abc", "status": "running", "endpoint_ids": [FOOD]}))
+
+    manager = JobManager(jobs_dir=str(jobs_dir))
+    assert manager.get("abc").status == "interrupted"
@@ -0,0 +1,130 @@
+import json
+import time
+import threading
+
+import pytest
+from fastapi import FastAPI, Response
+from httpx import ASGITransport, AsyncClient
+
+from Backend.common import profiling
+
+
+@pytest.fixture
+def profiling_token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILING_STORE_DIR", "")
+    return "secret"
+
+
+@pytest.mark.asyncio
+async def test_profile_requires_token(gateway_client, profiling_token):
+    response = await gateway_client.post(
+        "/poi/fetch-bayerncloud",
+        json={"retrieve_data": False},
+        headers={"X-Profile": "collapsed", "X-Profile-Token": "wrong"},
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_profile_disabled_without_config(gateway_client, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "")
+    response = await gateway_client.post(
+        "/poi/fetch-bayerncloud?profile=collapsed&profile_token=",
+        json={"retrieve_data": False},
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_profile_returns_speedscope(gateway_client, profiling_token):
+    response = await gateway_client.post(
+        "/poi/fetch-bayerncloud?profile=speedscope",
+        json={"retrieve_data": False},
+        headers={"X-Profile-Token": profiling_token},
+    )
+    assert response.status_code == 200
+    assert response.headers["X-Profiled-Status"] == "200"
+
+    data = json.loads(response.text)
+    assert data["profiles"][0]["type"] == "sampled"
+    assert "frames" in data["shared"]
+
+
+@pytest.mark.asyncio
+async def test_profile_stored_to_disk(gateway_client, profiling_token, monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILING_STORE_DIR", str(tmp_path))
+    response = await gateway_client.post(
+        "/poi/fetch-bayerncloud",
+        json={"retrieve_data": False},
+        headers={"X-Profile": "collapsed", "X-Profile-Token": profiling_token},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"detail": "retrieve_data is False"}
+    assert (tmp_path / response.headers["X-Profile-File"]).exists()
+
+
+def test_collapsed_output_format():
+    profiler = profiling.SamplingProfiler(interval_ms=1)
+    profiler.samples[(("thread main", "", 0), ("handler", "/app/main.py", 10))] = 3
+
+    assert profiler.collapsed() == "thread main;handler (main.py:10) 3\n"
+
+
+def _spin_in_endpoint(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _spin_elsewhere(stop):
+    while not stop.is_set():
+        pass
+
+
+@pytest.mark.asyncio
+async def test_profile_samples_only_the_request_threads(profiling_token):
+    app = FastAPI()
+    profiling.install_profiling(app)
+
+    @app.get("/work")
+    def work():
+        # sync endpoint: runs in a threadpool worker
+        _spin_in_endpoint(0.2)
+        return {"ok": True}
+
+    stop = threading.Event()
+    other = threading.Thread(target=_spin_elsewhere, args=(stop,))
+    other.start()
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get(
+                "/work", headers={"X-Profile": "collapsed", "X-Profile-Token": profiling_token}
+            )
+    finally:
+        stop.set()
+        other.join()
+
+    assert response.status_code == 200
+    assert "_spin_in_endpoint" in response.text
+    assert "_spin_elsewhere" not in response.text
+
+
+@pytest.mark.asyncio
+async def test_stored_profile_keeps_repeated_headers(profiling_token, monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILING_STORE_DIR", str(tmp_path))
+    app = FastAPI()
+    profiling.install_profiling(app)
+
+    @app.get("/login")
+    async def login(response: Response):
+        response.set_cookie("session", "a")
+        response.set_cookie("csrf", "b")
+        return {"ok": True}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/login", headers={"X-Profile": "collapsed", "X-Profile-Token": profiling_token})
+
+    assert response.json() == {"ok": True}
+    assert len(response.headers.get_list("set-cookie")) == 2
+    assert (tmp_path / response.headers["X-Profile-File"]).exists()
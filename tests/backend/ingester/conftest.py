@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The ingester scripts run from their own directory and import their helpers flat
+# ("from sources import ..."), so make that directory importable for the tests.
+INGESTER_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "src", "Backend", "Ingester")
+sys.path.insert(0, os.path.abspath(INGESTER_DIR))
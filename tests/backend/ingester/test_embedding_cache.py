@@ -0,0 +1,86 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from llama_index.core.embeddings import MockEmbedding
+
+from embedding_cache import CachedEmbedding, EmbeddingCache
+
+
+class CountingEmbedding(MockEmbedding):
+    calls: int = 0
+    texts: int = 0
+
+    def _get_text_embeddings(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        return [[float(len(t)), 0.5, 0.25] for t in texts]
+
+    def _get_query_embedding(self, query):
+        self.calls += 1
+        return [1.0, 1.0, 1.0]
+
+
+def test_cache_roundtrip_is_float16(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_many("m", 3, "text", ["a", "b"], [[0.1, 0.2, 0.3], [1, 2, 3]])
+
+    got = cache.get_many("m", 3, "text", ["b", "c", "a"])
+
+    assert got[1] is None
+    assert got[2] == np.asarray([0.1, 0.2, 0.3], dtype=np.float16).astype(np.float32).tolist()
+    assert got[0] == [1.0, 2.0, 3.0]
+    # keyed by model and dimension
+    assert cache.get_many("other", 3, "text", ["a"]) == [None]
+    assert cache.get_many("m", 1536, "text", ["a"]) == [None]
+    assert cache.stats() == [{"model": "m", "dim": 3, "kind": "text", "entries": 2, "vector_bytes": 12}]
+
+
+def test_cached_embedding_only_embeds_misses(tmp_path):
+    inner = CountingEmbedding(embed_dim=3)
+    model = CachedEmbedding(inner, EmbeddingCache(str(tmp_path / "cache.sqlite3")), dim=3)
+
+    first = model.get_text_embedding_batch(["Pizza", "Sauna"])
+    second = model.get_text_embedding_batch(["Sauna", "Pizza", "Berge"])
+
+    assert inner.texts == 3
+    assert second[0] == first[1] and second[1] == first[0]
+    assert model.hit_rate == {"hits": 2, "misses": 3, "rate": 0.4}
+
+    model.get_query_embedding("Pizza")
+    model.get_query_embedding("Pizza")
+    assert inner.calls == 3  # two text batches + one query
+
+
+def test_miss_and_hit_return_the_same_vector(tmp_path):
+    inner = CountingEmbedding(embed_dim=3)
+    model = CachedEmbedding(inner, EmbeddingCache(str(tmp_path / "cache.sqlite3")), dim=3)
+
+    miss = model.get_text_embedding("Sauna")
+    hit = model.get_text_embedding("Sauna")
+
+    assert miss == hit == np.asarray([5.0, 0.5, 0.25], dtype=np.float16).astype(np.float32).tolist()
+    assert model.get_query_embedding("Pizza") == model.get_query_embedding("Pizza")
+
+
+def test_hit_counters_are_thread_safe(tmp_path):
+    model = CachedEmbedding(CountingEmbedding(embed_dim=3), EmbeddingCache(str(tmp_path / "cache.sqlite3")), dim=3)
+    model.get_text_embedding("Pizza")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: model.get_text_embedding("Pizza"), range(400)))
+
+    assert model.hit_rate["hits"] == 400
+    assert model.hit_rate["misses"] == 1
+
+
+def test_compact(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_many("m", 3, "text", ["old"], [[1, 1, 1]])
+    cache._conn.execute("UPDATE embeddings SET last_used = ?", (int(time.time()) - 40 * 86400,))
+    cache.put_many("m", 3, "text", ["a", "b", "c"], [[1, 1, 1]] * 3)
+
+    assert cache.compact(older_than_days=30) == 1
+    assert cache.compact(max_entries=2) == 1
+    assert sum(row["entries"] for row in cache.stats()) == 2
+    assert cache.compact(model="m") == 2
@@ -0,0 +1,93 @@
+import pytest
+from llama_index.core.embeddings import MockEmbedding
+
+from embedding_stage import EmbeddingStage, EmbeddingThrottled, RateLimitedStandIn, classify_error
+
+
+class FlakyEmbedding(MockEmbedding):
+    """Fails the first `failures` calls with the given exception."""
+
+    failures: int = 0
+    error: Exception = None
+    calls: int = 0
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_text_embeddings(self, texts):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return [[float(t.split("-")[1])] * 2 for t in texts]
+
+
+def texts(n):
+    return [f"text-{i}" for i in range(n)]
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_classify_error():
+    assert classify_error(EmbeddingThrottled(retry_after=2.0)) == ("throttled", 2.0)
+    assert classify_error(StatusError(503)) == ("transient", None)
+    assert classify_error(TimeoutError()) == ("transient", None)
+    assert classify_error(StatusError(400)) == (None, None)
+    assert classify_error(ValueError("bad input")) == (None, None)
+
+
+def test_embed_keeps_order_and_reports_metrics():
+    metrics = []
+    stage = EmbeddingStage(
+        FlakyEmbedding(embed_dim=2), batch_size=8, min_batch=4, max_batch=32, max_in_flight=3, on_metrics=metrics.append
+    )
+
+    vectors = stage.embed(texts(100))
+
+    assert [v[0] for v in vectors] == [float(i) for i in range(100)]
+    assert sum(m["texts"] for m in metrics) == 100
+    # grows while requests are fast, never beyond max_batch
+    assert max(m["texts"] for m in metrics) > 8
+    assert stage.batch_size <= 32
+    assert stage.summary()["requests"] == len(metrics)
+
+
+def test_throttling_shrinks_batch_and_retries():
+    sleeps = []
+    model = FlakyEmbedding(embed_dim=2, failures=2, error=EmbeddingThrottled(retry_after=0.5))
+    stage = EmbeddingStage(model, batch_size=64, min_batch=8, max_batch=64, max_in_flight=1, sleep=sleeps.append)
+
+    vectors = stage.embed(texts(10))
+
+    assert len(vectors) == 10
+    assert sleeps == [0.5, 0.5]
+    assert stage.summary()["throttled"] == 2
+    assert stage.batch_size < 64
+
+
+def test_gives_up_after_max_retries_and_on_client_errors():
+    stage = EmbeddingStage(
+        FlakyEmbedding(embed_dim=2, failures=10, error=StatusError(503)), max_retries=2, sleep=lambda s: None
+    )
+    with pytest.raises(StatusError):
+        stage.embed(texts(3))
+
+    bad_request = FlakyEmbedding(embed_dim=2, failures=1, error=StatusError(400))
+    with pytest.raises(StatusError):
+        EmbeddingStage(bad_request, sleep=lambda s: None).embed(texts(3))
+    assert bad_request.calls == 1
+
+
+def test_against_rate_limited_stand_in():
+    backend = RateLimitedStandIn(requests_per_sec=50, dim=4)
+    stage = EmbeddingStage(backend, batch_size=8, min_batch=4, max_batch=64, max_in_flight=4, backoff_max_sec=0.1)
+
+    vectors = stage.embed(texts(1000))
+
+    assert len(vectors) == 1000
+    assert vectors[3] == backend._vector("text-3")
+    summary = stage.summary()
+    assert summary["texts"] == 1000
+    assert summary["throttled"] == backend.throttled
@@ -0,0 +1,124 @@
+from datetime import datetime, timezone
+
+import pytest
+from llama_index.core.vector_stores import FilterCondition, FilterOperator
+from llama_index.vector_stores.opensearch import OpensearchVectorClient
+
+from event_dates import EventExpiry, event_date_metadata, event_window_filters, expired_events_query
+
+
+def test_event_dates_from_schema_org_values():
+    assert event_date_metadata("2025-06-14T19:00:00+02:00", "2025-06-14T23:00:00+02:00") == {
+        "event_dates": {"gte": "2025-06-14T19:00:00+02:00", "lte": "2025-06-14T23:00:00+02:00"}
+    }
+    # plain dates cover whole days, naive values are local time
+    assert event_date_metadata("2025-06-14", "2025-06-15") == {
+        "event_dates": {"gte": "2025-06-14T00:00:00+02:00", "lte": "2025-06-15T23:59:59+02:00"}
+    }
+    assert event_date_metadata("2025-01-10T20:00:00Z", None) == {
+        "event_dates": {"gte": "2025-01-10T20:00:00+00:00", "lte": "2025-01-10T23:59:59+01:00"}
+    }
+
+
+def test_event_dates_missing_or_broken():
+    assert event_date_metadata(None, None) == {}
+    assert event_date_metadata("demnächst", "") == {}
+    # end before start: a point in time
+    dates = event_date_metadata("2025-06-14T19:00:00+02:00", "2025-06-14T18:00:00+02:00")["event_dates"]
+    assert dates["gte"] == dates["lte"]
+
+
+def test_window_filters_translate_to_intersecting_ranges():
+    filters = event_window_filters("2025-06-14", "2025-06-15")
+    assert [(f.key, f.operator) for f in filters.filters] == [
+        ("event_dates", FilterOperator.GTE),
+        ("event_dates", FilterOperator.LTE),
+    ]
+    assert [f.value for f in filters.filters] == ["2025-06-14T00:00:00+02:00", "2025-06-15T23:59:59+02:00"]
+
+    # the translation LlamaIndex puts into the kNN query
+    query = OpensearchVectorClient.__new__(OpensearchVectorClient)._parse_filters_recursively(filters)
+    assert query == {"bool": {"must": [
+        {"range": {"metadata.event_dates": {"gte": "2025-06-14T00:00:00+02:00"}}},
+        {"range": {"metadata.event_dates": {"lte": "2025-06-15T23:59:59+02:00"}}},
+    ]}}
+
+    assert event_window_filters() is None
+    with pytest.raises(ValueError):
+        event_window_filters("bald")
+
+
+def test_window_filters_can_keep_undated_documents():
+    filters = event_window_filters(start=datetime(2025, 6, 14, 12, 0, tzinfo=timezone.utc), include_undated=True)
+    assert filters.condition == FilterCondition.OR
+    assert filters.filters[1].operator == FilterOperator.IS_EMPTY
+
+
+class FakeIndices:
+    def __init__(self):
+        self.created = {}
+
+    def exists(self, index):
+        return index in self.created
+
+    def get_mapping(self, index):
+        return {"tourism-data-20250101-000000": {"mappings": {"properties": {"embedding": {"type": "knn_vector"}}}}}
+
+    def create(self, index, body):
+        self.created[index] = body
+
+
+class FakeOpenSearch:
+    def __init__(self, expired=2, failures=()):
+        self.indices = FakeIndices()
+        self.expired = expired
+        self.failures = list(failures)
+        self.calls = []
+
+    def count(self, index, body):
+        self.calls.append(("count", index, body["query"]))
+        return {"count": self.expired}
+
+    def reindex(self, body, **kwargs):
+        self.calls.append(("reindex", body["source"]["index"], body["dest"]["index"]))
+        return {"created": self.expired, "updated": 0, "failures": self.failures}
+
+    def delete_by_query(self, index, body, **kwargs):
+        self.calls.append(("delete", index, body["query"]))
+        return {"deleted": self.expired}
+
+
+NOW = datetime(2025, 6, 16, 12, 0, tzinfo=timezone.utc)
+
+
+def test_expiry_deletes_events_that_ended_before_the_grace_period():
+    client = FakeOpenSearch()
+    stats = EventExpiry(client, "tourism-data", mode="delete", grace_hours=6).run(now=NOW)
+
+    query = expired_events_query(datetime(2025, 6, 16, 6, 0, tzinfo=timezone.utc))
+    assert query == {"range": {"metadata.event_dates": {"lt": "2025-06-16T06:00:00+00:00", "relation": "within"}}}
+    assert client.calls == [("count", "tourism-data", query), ("delete", "tourism-data", query)]
+    assert stats == {"cutoff": "2025-06-16T06:00:00+00:00", "expired": 2, "archived": 0, "deleted": 2}
+
+
+def test_expiry_archives_before_deleting():
+    client = FakeOpenSearch()
+    stats = EventExpiry(client, "tourism-data", mode="archive", archive_index="events-archive").run(now=NOW)
+
+    assert [c[0] for c in client.calls] == ["count", "reindex", "delete"]
+    assert client.indices.created["events-archive"]["mappings"]["properties"]["embedding"]["type"] == "knn_vector"
+    assert stats["archived"] == stats["deleted"] == 2
+
+
+def test_expiry_keeps_events_when_archiving_fails_or_dry_run():
+    client = FakeOpenSearch(failures=[{"cause": "mapper_parsing_exception"}])
+    stats = EventExpiry(client, "tourism-data", mode="archive").run(now=NOW)
+    assert [c[0] for c in client.calls] == ["count", "reindex"]
+    assert stats["deleted"] == 0
+
+    client = FakeOpenSearch()
+    assert EventExpiry(client, "tourism-data").run(now=NOW, dry_run=True)["expired"] == 2
+    assert [c[0] for c in client.calls] == ["count"]
+
+    with pytest.raises(ValueError):
+        EventExpiry(client, "tourism-data", mode="purge")
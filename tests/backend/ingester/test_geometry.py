@@ -0,0 +1,125 @@
+import math
+
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import LineString, MultiLineString
+
+from geometry import (
+    GeometryStore,
+    length_m,
+    length_m_batch,
+    load_full_geometry,
+    parse_track_wkt,
+    simplify_m,
+    simplify_m_batch,
+    track_geometry,
+    track_metadata,
+)
+
+
+def wiggly_track(n=2000):
+    # ~11 km eastwards near 47.5°N with sub-metre zig-zag noise and elevation
+    lon = np.linspace(11.0, 11.15, n)
+    lat = 47.5 + 0.000002 * np.sin(np.arange(n))
+    z = np.linspace(600, 900, n)
+    return MultiLineString([list(zip(lon, lat, z))])
+
+
+def test_parse_track_wkt_keeps_elevation():
+    geom = parse_track_wkt("MULTILINESTRING Z ((11.0 47.5 881.0, 11.01 47.51 890.0))")
+    assert geom.geom_type == "MultiLineString"
+    assert geom.has_z
+
+
+def test_simplify_removes_noise_within_tolerance():
+    track = wiggly_track()
+    simplified = simplify_m(track, 5)
+
+    assert shapely.get_num_coordinates(simplified) < 10
+    assert simplified.has_z
+    # line ends stay where they were (to the 7 stored decimals)
+    assert simplified.geoms[0].coords[0] == pytest.approx(track.geoms[0].coords[0], abs=1e-7)
+    assert simplified.geoms[0].coords[-1] == pytest.approx(track.geoms[0].coords[-1], abs=1e-7)
+    # every original vertex is within the tolerance of the simplified line (~1e-5 deg per metre)
+    assert track.hausdorff_distance(simplified) < 5 / 111_000 * 1.5
+
+
+def test_simplify_zero_tolerance_is_a_noop():
+    track = wiggly_track(50)
+    assert simplify_m(track, 0) is track
+
+
+def test_length_matches_haversine():
+    # one degree of latitude along a meridian
+    assert length_m(LineString([(11.0, 47.0), (11.0, 48.0)])) == pytest.approx(math.radians(1) * 6371008.8, rel=1e-6)
+    track = wiggly_track()
+    expected = 0.15 * math.radians(1) * 6371008.8 * math.cos(math.radians(47.5))
+    assert length_m(track) == pytest.approx(expected, rel=1e-3)
+
+
+def test_track_metadata_summaries():
+    track = wiggly_track()
+    metadata = track_metadata(track, "track-1", tolerance_m=5)
+
+    assert metadata["geo_line"]["type"] == "MultiLineString"
+    assert metadata["geo_vertices"] == shapely.get_num_coordinates(simplify_m(track, 5))
+    assert metadata["geo_bbox"]["type"] == "envelope"
+    (min_lon, max_lat), (max_lon, min_lat) = metadata["geo_bbox"]["coordinates"]
+    assert (min_lon, max_lon) == pytest.approx((11.0, 11.15))
+    assert min_lat <= 47.5 <= max_lat
+    lat, lon = map(float, metadata["geo_centroid"].split(","))
+    assert (lat, lon) == pytest.approx((47.5, 11.075), abs=1e-4)
+    # start point, "lat,lon"
+    assert metadata["location"] == "47.5,11.0"
+    assert metadata["geo_length_m"] > 11_000
+    assert "geo_line_full" not in metadata
+
+
+def test_full_geometry_side_store(tmp_path):
+    store = GeometryStore(str(tmp_path))
+    track = wiggly_track(300)
+
+    metadata = track_metadata(track, "track-1", tolerance_m=5, store=store)
+    ref = metadata["geo_line_full"]
+
+    full = load_full_geometry(ref, store)
+    assert shapely.get_num_coordinates(full) == 300
+    assert full.equals(track)
+    assert load_full_geometry(store.ref("unknown"), store) is None
+
+
+def test_track_geometry_batch_matches_per_item_and_reports_errors():
+    track = wiggly_track(200)
+    flat = LineString([(11.0, 48.0), (11.001, 48.0005), (11.002, 48.0)])
+    lines = [
+        track.wkt,
+        None,
+        "MULTILINESTRING Z ((11.0 47.5 600, oops))",
+        flat.wkt,
+        "POINT (11 47)",
+        "LINESTRING (200 47, 201 47)",
+        "MULTILINESTRING EMPTY",
+    ]
+
+    results = track_geometry(lines, [f"t-{i}" for i in range(len(lines))], tolerance_m=5)
+
+    assert results[0] == (track_metadata(track, "t-0", tolerance_m=5), None)
+    assert results[1] == (None, None)
+    assert results[2] == (None, "invalid WKT")
+    assert results[3][0] == track_metadata(flat, "t-3", tolerance_m=5)
+    assert results[3][0]["geo_line"]["type"] == "LineString"
+    assert "got Point" in results[4][1]
+    assert "out of range" in results[5][1]
+    assert results[6] == (None, "empty line")
+
+
+def test_batch_helpers_handle_mixed_dimensions():
+    lines = [wiggly_track(100), LineString([(11.0, 48.0), (11.0, 48.001)])]
+
+    simplified = simplify_m_batch(lines, 5)
+    lengths = length_m_batch(lines)
+
+    assert simplified[0].has_z and not simplified[1].has_z
+    assert lengths[1] == pytest.approx(length_m(lines[1]))
+    assert lengths[0] == pytest.approx(length_m(lines[0]))
@@ -0,0 +1,88 @@
+from llama_index.core import Document
+from llama_index.core.schema import MetadataMode
+
+import index_state
+from index_state import DocumentDiff, IndexedDocument, content_hash, fetch_indexed_documents, tag_content_hash
+
+
+def make_doc(doc_id, text="Ort im Allgäu", city="Fischen"):
+    return Document(
+        text=text,
+        id_=doc_id,
+        metadata={"name": doc_id, "city": city, "location": "47.4,10.2"},
+        excluded_embed_metadata_keys=["location"],
+    )
+
+
+def test_content_hash_covers_text_and_metadata():
+    base = content_hash(make_doc("a"))
+    assert content_hash(make_doc("a")) == base
+    assert content_hash(make_doc("a", text="Anderer Text")) != base
+    assert content_hash(make_doc("a", city="Oberstdorf")) != base
+
+    # excluded-from-embedding metadata is still stored, so it counts too
+    moved = make_doc("a")
+    moved.metadata["location"] = "47.5,10.3"
+    assert content_hash(moved) != base
+
+    # ... but not the file it was read from
+    relocated = make_doc("a")
+    relocated.metadata["source_file"] = "/data/bayerncloud_food.ndjson"
+    relocated.excluded_embed_metadata_keys.append("source_file")
+    assert content_hash(relocated) == base
+
+
+def test_tagged_hash_does_not_change_embed_text_or_hash():
+    doc = make_doc("a")
+    embed_text = doc.get_content(metadata_mode=MetadataMode.EMBED)
+
+    digest = tag_content_hash(doc)
+
+    assert doc.metadata["content_hash"] == digest
+    assert doc.get_content(metadata_mode=MetadataMode.EMBED) == embed_text
+    assert content_hash(doc) == digest
+
+
+def test_fetch_indexed_documents_groups_chunks(monkeypatch):
+    hits = [
+        {"_id": "c1", "_source": {"metadata": {"doc_id": "a", "content_hash": "h1"}}},
+        {"_id": "c2", "_source": {"metadata": {"doc_id": "a", "content_hash": "h1"}}},
+        {"_id": "c3", "_source": {"metadata": {"doc_id": "b"}}},
+        {"_id": "c4", "_source": {}},
+    ]
+    monkeypatch.setattr(index_state.helpers, "scan", lambda *args, **kwargs: iter(hits))
+
+    indexed = fetch_indexed_documents(os_client=None, index="pois")
+
+    assert set(indexed) == {"a", "b"}
+    assert indexed["a"].chunk_ids == ["c1", "c2"]
+    assert indexed["a"].content_hash == "h1"
+    assert indexed["b"].content_hash is None
+
+
+def test_document_diff():
+    unchanged, changed, new = make_doc("same"), make_doc("changed"), make_doc("new")
+    indexed = {
+        "same": IndexedDocument(chunk_ids=["s1"], hashes={content_hash(make_doc("same"))}),
+        "changed": IndexedDocument(chunk_ids=["c1", "c2"], hashes={"old-hash"}),
+        "gone": IndexedDocument(chunk_ids=["g1"], hashes={"h"}),
+    }
+    diff = DocumentDiff(indexed)
+
+    passed = list(diff.filter([unchanged, changed, new, make_doc("new")]))
+
+    assert [d.id_ for d in passed] == ["changed", "new"]
+    assert diff.stale_chunk_ids(delete_missing=False) == ["c1", "c2"]
+    assert diff.stale_chunk_ids(delete_missing=True) == ["c1", "c2", "g1"]
+    assert diff.stats == {"new": 1, "changed": 1, "unchanged": 1, "missing": 1}
+
+
+def test_rewritten_chunk_ids_are_not_stale():
+    old = content_hash(make_doc("a", text="Alt"))
+    diff = DocumentDiff({"a": IndexedDocument(chunk_ids=["a#0", "a#1", "a#2"], hashes={old})})
+
+    assert [d.id_ for d in diff.filter([make_doc("a", text="Neu")])] == ["a"]
+    # the new version has two chunks with deterministic ids, only the third old one is stale
+    diff.written(["a#0", "a#1", "b#0"])
+
+    assert diff.stale_chunk_ids(delete_missing=False) == ["a#2"]
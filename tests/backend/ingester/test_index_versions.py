@@ -0,0 +1,117 @@
+import pytest
+
+from index_versions import BULK_SETTINGS, IndexVersions
+
+
+class FakeIndices:
+    def __init__(self):
+        self.indices = {}  # name -> {"body": ..., "settings": ...}
+        self.aliases = {}  # alias -> index
+        self.calls = []
+
+    def exists(self, index):
+        return index in self.indices or index in self.aliases
+
+    def exists_alias(self, name):
+        return name in self.aliases
+
+    def get_alias(self, name):
+        return {self.aliases[name]: {"aliases": {name: {}}}}
+
+    def get(self, index, **kwargs):
+        prefix = index.rstrip("*")
+        return {name: {} for name in self.indices if name.startswith(prefix)}
+
+    def create(self, index, body):
+        self.indices[index] = {"body": body, "settings": dict(body["settings"]["index"])}
+
+    def delete(self, index, ignore=None):
+        self.calls.append(("delete", index))
+        self.indices.pop(index, None)
+
+    def refresh(self, index):
+        self.calls.append(("refresh", index))
+
+    def forcemerge(self, index, max_num_segments, request_timeout=None):
+        self.calls.append(("forcemerge", index, max_num_segments))
+
+    def put_settings(self, index, body):
+        self.indices[index]["settings"].update(body["index"])
+
+    def update_aliases(self, body):
+        self.calls.append(("aliases", body["actions"]))
+        for action in body["actions"]:
+            if "remove" in action:
+                self.aliases.pop(action["remove"]["alias"], None)
+            if "add" in action:
+                self.aliases[action["add"]["alias"]] = action["add"]["index"]
+
+
+class FakeCluster:
+    def health(self, **kwargs):
+        return {"status": "yellow"}
+
+
+class FakeOpenSearch:
+    def __init__(self):
+        self.indices = FakeIndices()
+        self.cluster = FakeCluster()
+
+
+def build(versions, name):
+    versions.create(name, {"settings": {"index": {"knn": True}}, "mappings": {}})
+    versions.finalize(name)
+
+
+def test_create_uses_bulk_settings_and_finalize_restores_them():
+    client = FakeOpenSearch()
+    versions = IndexVersions(client, alias="pois", keep=1, replicas=1, refresh_interval="1s")
+
+    versions.create("pois-1", {"settings": {"index": {"knn": True}}, "mappings": {}})
+    assert client.indices.indices["pois-1"]["settings"] == {"knn": True, **BULK_SETTINGS}
+    assert versions.current() is None
+
+    versions.finalize("pois-1")
+    assert client.indices.indices["pois-1"]["settings"] == {"knn": True, "refresh_interval": "1s", "number_of_replicas": 1}
+    assert ("forcemerge", "pois-1", 1) in client.indices.calls
+    assert versions.current() == "pois-1"
+
+
+def test_swap_is_one_atomic_call_and_old_versions_are_pruned():
+    client = FakeOpenSearch()
+    versions = IndexVersions(client, alias="pois", keep=1)
+
+    for name in ("pois-1", "pois-2", "pois-3"):
+        build(versions, name)
+
+    assert versions.current() == "pois-3"
+    assert sorted(client.indices.indices) == ["pois-2", "pois-3"]
+    last_swap = [c for c in client.indices.calls if c[0] == "aliases"][-1][1]
+    assert last_swap == [
+        {"remove": {"index": "pois-2", "alias": "pois"}},
+        {"add": {"index": "pois-3", "alias": "pois"}},
+    ]
+
+    assert versions.rollback() == "pois-2"
+    assert versions.current() == "pois-2"
+    # the newer version is kept while the alias points to an older one
+    assert versions.prune() == []
+
+
+def test_discard_never_drops_the_live_version():
+    client = FakeOpenSearch()
+    versions = IndexVersions(client, alias="pois")
+    build(versions, "pois-1")
+    versions.create("pois-2", {"settings": {"index": {}}})
+
+    versions.discard("pois-2")
+    versions.discard("pois-1")
+
+    assert list(client.indices.indices) == ["pois-1"]
+
+
+def test_refuses_alias_name_of_a_concrete_index():
+    client = FakeOpenSearch()
+    client.indices.indices["pois"] = {}
+    with pytest.raises(ValueError):
+        IndexVersions(client, alias="pois").create("pois-1", {"settings": {"index": {}}})
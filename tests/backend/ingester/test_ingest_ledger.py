@@ -0,0 +1,156 @@
+import json
+import os
+
+import pytest
+from llama_index.core import Document
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.node_parser import SentenceSplitter
+
+from ingest_ledger import IngestLedger
+from pipeline import IngestionPipeline, ParseReport, chunk_id, iter_documents, parse_pool
+
+
+class FlakyWriter:
+    """Keeps the index as a dict like OpenSearch (writes by _id), fails on the n-th write."""
+
+    def __init__(self, index, fail_on_write=None):
+        self.index = index
+        self.fail_on_write = fail_on_write
+        self.writes = 0
+
+    def write(self, nodes):
+        self.writes += 1
+        if self.writes == self.fail_on_write:
+            raise ConnectionError("OpenSearch hiccup")
+        for node in nodes:
+            self.index[node.node_id] = node.ref_doc_id
+        return len(nodes)
+
+    def refresh(self):
+        pass
+
+
+class CountingEmbedding(MockEmbedding):
+    embedded: int = 0
+
+    def _get_text_embeddings(self, texts):
+        self.embedded += len(texts)
+        return super()._get_text_embeddings(texts)
+
+
+def parse_item(item, file_path):
+    return Document(text=item["name"], doc_id=item["@id"], metadata={"name": item["name"]})
+
+
+def write_sources(tmp_path, files=3, per_file=4):
+    paths = []
+    for f in range(files):
+        path = tmp_path / f"bayerncloud_{f}.ndjson"
+        path.write_text("\n".join(json.dumps({"@id": f"poi-{f}-{i}", "name": f"POI {f}/{i}"}) for i in range(per_file)))
+        paths.append(str(path))
+    return paths
+
+
+def ingest(ledger, files, index, resume, fail_on_write=None, pool=None):
+    unfinished = ledger.unfinished("test-index") if resume else None
+    run = ledger.begin("test-index", "test-index", unfinished)
+    embed_model = CountingEmbedding(embed_dim=4)
+    pipeline = IngestionPipeline(
+        FlakyWriter(index, fail_on_write),
+        transformations=[SentenceSplitter(chunk_size=256, chunk_overlap=0, id_func=chunk_id)],
+        embed_model=embed_model,
+        batch_size=3,
+        max_pending_writes=1,
+    )
+    report = ParseReport()
+    documents = run.documents(
+        files,
+        lambda paths: iter_documents(paths, parse_item, report, workers=2 if pool else 1, executor=pool),
+        failed_files=report.failed_files,
+    )
+    stats = pipeline.run(run.skip_committed(documents), on_committed=run.commit)
+    stats.update(run.stats)
+    run.finish(stats)
+    return run, stats, embed_model
+
+
+def test_resume_skips_committed_work(tmp_path):
+    files = write_sources(tmp_path)
+    ledger = IngestLedger(str(tmp_path / "ledger.sqlite3"))
+    index = {}
+
+    # 12 documents in batches of 3: the 3rd write fails, batches 1+2 (6 documents) are committed
+    with pytest.raises(ConnectionError):
+        ingest(ledger, files, index, resume=False, fail_on_write=3)
+    assert len(index) == 6
+    run_id, _ = ledger.unfinished("test-index")
+    [status] = ledger.runs()
+    assert (status["batches"], status["documents"], status["files_done"]) == (2, 6, 1)
+
+    run, stats, embed_model = ingest(ledger, files, index, resume=True)
+
+    assert run.id == run_id
+    # file 0 is skipped entirely, 2 committed documents of file 1 are dropped before embedding
+    assert stats["resumed_files"] == 1
+    assert stats["resumed_documents"] == 6
+    assert stats["documents"] == embed_model.embedded == 6
+    # deterministic ids: no duplicates, every document exactly once
+    assert sorted(index) == sorted(f"poi-{f}-{i}#0" for f in range(3) for i in range(4))
+    assert ledger.unfinished("test-index") is None
+    assert ledger.runs()[0]["documents"] == 12
+
+
+def test_resume_reads_changed_files_again(tmp_path):
+    files = write_sources(tmp_path, files=2, per_file=3)
+    ledger = IngestLedger(str(tmp_path / "ledger.sqlite3"))
+    index = {}
+    with pytest.raises(ConnectionError):
+        ingest(ledger, files, index, resume=False, fail_on_write=2)
+
+    # file 0 was finished, but changed afterwards: its changed document is written again
+    with open(files[0], "w") as f:
+        f.write("\n".join(json.dumps({"@id": f"poi-0-{i}", "name": f"Neu {i}" if i == 0 else f"POI 0/{i}"}) for i in range(3)))
+    os.utime(files[0], (1, 1))
+
+    _, stats, embed_model = ingest(ledger, files, index, resume=True)
+
+    assert stats["resumed_files"] == 0
+    assert embed_model.embedded == 1 + 3
+
+
+def test_new_run_abandons_unfinished(tmp_path):
+    files = write_sources(tmp_path, files=1)
+    ledger = IngestLedger(str(tmp_path / "ledger.sqlite3"))
+    with pytest.raises(ConnectionError):
+        ingest(ledger, files, {}, resume=False, fail_on_write=1)
+
+    run, stats, _ = ingest(ledger, files, {}, resume=False)
+
+    assert stats["resumed_documents"] == 0
+    assert run.abandoned_indexes == ["test-index"]
+    assert [r["status"] for r in ledger.runs()] == ["finished", "abandoned"]
+    assert ledger.prune(keep=1) == 1
+
+
+def test_file_boundaries_from_one_shared_pool(tmp_path):
+    files = write_sources(tmp_path)
+    empty = tmp_path / "bayerncloud_empty.ndjson"
+    empty.write_text("")
+    files.insert(1, str(empty))
+    ledger = IngestLedger(str(tmp_path / "ledger.sqlite3"))
+    index = {}
+
+    pool = parse_pool(2)
+    try:
+        with pytest.raises(ConnectionError):
+            ingest(ledger, files, index, resume=False, fail_on_write=3, pool=pool)
+        # batches 1+2 hold file 0 and half of file 1; the empty file in between is done as well
+        assert ledger.runs()[0]["files_done"] == 2
+
+        _, stats, _ = ingest(ledger, files, index, resume=True, pool=pool)
+    finally:
+        pool.shutdown()
+
+    assert stats["resumed_files"] == 2
+    assert sorted(index) == sorted(f"poi-{f}-{i}#0" for f in range(3) for i in range(4))
+    assert ledger.runs()[0]["files_done"] == 4
@@ -0,0 +1,77 @@
+import numpy as np
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import VectorStoreQueryResult
+
+from matryoshka import FULL_VECTOR_FIELD, RescoringRetriever, decode_full, encode_full, search_dim, truncate
+from pipeline import OpenSearchBulkWriter
+
+
+def test_truncate_renormalizes():
+    vector = truncate([3.0, 4.0, 100.0], 2)
+    assert np.allclose(vector, [0.6, 0.8])
+    assert truncate([0.0, 0.0, 1.0], 2) == [0.0, 0.0]
+
+
+def test_search_dim():
+    assert search_dim(3072, 0) == 3072
+    assert search_dim(3072, 1024) == 1024
+    assert search_dim(384, 1024) == 384
+
+
+def test_full_vector_roundtrip_is_float16():
+    vector = [0.1, -0.25, 0.5]
+    assert np.allclose(decode_full(encode_full(vector)), vector, atol=1e-3)
+    assert len(encode_full([0.0] * 3072)) == 4 * 2 * 3072 // 3
+
+
+def test_writer_stores_truncated_and_full_vector():
+    writer = OpenSearchBulkWriter(os_client=None, index="pois", search_dim=2, full_vector_field=FULL_VECTOR_FIELD)
+    action = writer.to_action(TextNode(text="Ort", embedding=[3.0, 4.0, 1.0]))
+
+    assert np.allclose(action["embedding"], [0.6, 0.8])
+    assert np.allclose(decode_full(action[FULL_VECTOR_FIELD]), [3.0, 4.0, 1.0])
+
+
+class FakeVectorStore:
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.queries = []
+
+    def query(self, query):
+        self.queries.append(query)
+        # truncated search puts "far" first
+        return VectorStoreQueryResult(
+            nodes=self.nodes, ids=[n.node_id for n in self.nodes], similarities=[0.9, 0.8, 0.7]
+        )
+
+
+class FakeOpenSearch:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def mget(self, index, body, _source_includes):
+        return {
+            "docs": [
+                {"_id": i, "found": i in self.vectors, "_source": {FULL_VECTOR_FIELD: encode_full(self.vectors[i])}}
+                if i in self.vectors
+                else {"_id": i, "found": False}
+                for i in body["ids"]
+            ]
+        }
+
+
+def test_rescoring_retriever_reranks_by_full_vector():
+    embed_model = MockEmbedding(embed_dim=4)
+    query = np.asarray(embed_model.get_query_embedding("Pizza"))
+    nodes = [TextNode(text=name, id_=name) for name in ("far", "near", "legacy")]
+    store = FakeVectorStore(nodes)
+    os_client = FakeOpenSearch({"far": (-query).tolist(), "near": query.tolist()})
+
+    retriever = RescoringRetriever(store, os_client, "pois", embed_model, dim=2, similarity_top_k=3, oversample=4)
+    results = retriever.retrieve("Pizza")
+
+    assert [r.node.node_id for r in results] == ["near", "far", "legacy"]
+    assert np.isclose(results[0].score, 1.0, atol=1e-3)
+    assert store.queries[0].similarity_top_k == 12
+    assert len(store.queries[0].query_embedding) == 2
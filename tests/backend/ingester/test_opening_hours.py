@@ -0,0 +1,112 @@
+from datetime import date, datetime
+
+from llama_index.core.vector_stores import FilterOperator
+
+from Backend.api_gateway.writers import CorpusCollectionWriter
+from sources import iter_source_items
+from opening_hours import (
+    MINUTES_PER_DAY,
+    MINUTES_PER_WEEK,
+    day_mask,
+    is_open_at,
+    open_at_filter,
+    opening_hours_metadata,
+    opening_ranges,
+)
+
+TODAY = date(2025, 6, 1)
+MON, TUE, SAT, SUN = 0, 1, 5, 6
+
+
+def spec(days, opens, closes, **extra):
+    return {"@type": "OpeningHoursSpecification", "dayOfWeek": days, "opens": opens, "closes": closes, **extra}
+
+
+def at(day, hhmm):
+    hours, minutes = map(int, hhmm.split(":"))
+    return day * MINUTES_PER_DAY + hours * 60 + minutes
+
+
+def test_weekly_ranges_from_schema_org_days():
+    ohs = [
+        spec(["http://schema.org/Monday", "Tuesday"], "10:00:00", "17:00:00"),
+        spec("https://schema.org/Sunday", "13:00", "18:00"),
+    ]
+    assert opening_ranges(ohs, TODAY) == [
+        (at(MON, "10:00"), at(MON, "17:00")),
+        (at(TUE, "10:00"), at(TUE, "17:00")),
+        (at(SUN, "13:00"), at(SUN, "18:00")),
+    ]
+
+
+def test_overlapping_entries_are_merged():
+    ohs = [spec(["Saturday"], "09:00", "12:00"), spec(["Saturday"], "11:00", "14:00")]
+    assert opening_ranges(ohs, TODAY) == [(at(SAT, "09:00"), at(SAT, "14:00"))]
+
+
+def test_past_midnight_and_sunday_into_monday():
+    ohs = [spec(["Saturday", "Sunday"], "20:00", "02:00")]
+    assert opening_ranges(ohs, TODAY) == [
+        (0, at(MON, "02:00")),
+        (at(SAT, "20:00"), at(SUN, "02:00")),
+        (at(SUN, "20:00"), MINUTES_PER_WEEK),
+    ]
+
+
+def test_closed_and_until_midnight():
+    assert opening_ranges([spec(["Monday"], "00:00", "00:00")], TODAY) == []
+    assert opening_ranges([spec(["Monday"], "18:00", "00:00")], TODAY) == [(at(MON, "18:00"), at(TUE, "00:00"))]
+    assert opening_ranges([spec(["Monday"], "00:00", "23:59")], TODAY) == [(0, MINUTES_PER_DAY)]
+
+
+def test_out_of_season_and_unstructured_entries_are_ignored():
+    ohs = [
+        spec(["Monday"], "10:00", "12:00", validThrough="2025-05-31"),
+        spec(["Tuesday"], "10:00", "12:00", validThrough="2025-10-31"),
+        spec(["Saturday"], "10:00", "12:00", validFrom="2025-11-01", validThrough="2026-03-31"),
+        spec(["Sunday"], "10:00", "12:00", validFrom="2025-06-01", validThrough="2025-06-01"),
+        spec([], "10:00", "12:00"),
+        {"description": "nach Vereinbarung"},
+        "Mo-Fr 9-17",
+    ]
+    assert opening_ranges(ohs, TODAY) == [(at(TUE, "10:00"), at(TUE, "12:00")), (at(SUN, "10:00"), at(SUN, "12:00"))]
+    assert opening_hours_metadata(ohs[4:], TODAY) == {}
+
+
+def test_seasons_survive_the_corpus_format(tmp_path):
+    summer = spec(["Sunday"], "10:00", "18:00", validFrom="2025-04-01", validThrough="2025-10-31")
+    winter = spec(["Sunday"], "11:00", "15:00", validFrom="2025-11-01", validThrough="2026-03-31")
+    writer = CorpusCollectionWriter(str(tmp_path), "bayerncloud_places")
+    writer.open({"@graph": [], "meta": {"total": 1}})
+    writer.write_page(1, [{"@id": "poi-1", "name": "Museum", "openingHoursSpecification": [summer, winter]}])
+    writer.close(pages_total=1, failed_pages=[])
+
+    [item] = iter_source_items(str(tmp_path / "bayerncloud_places.corpus"))
+
+    ohs = item["openingHoursSpecification"]
+    assert [(o["validFrom"], o["validThrough"]) for o in ohs] == [("2025-04-01", "2025-10-31"), ("2025-11-01", "2026-03-31")]
+    assert opening_ranges(ohs, TODAY) == [(at(SUN, "10:00"), at(SUN, "18:00"))]
+    assert opening_ranges(ohs, date(2025, 12, 1)) == [(at(SUN, "11:00"), at(SUN, "15:00"))]
+
+
+def test_metadata_and_day_mask():
+    ohs = [spec(["Monday", "Sunday"], "22:00", "01:00")]
+    metadata = opening_hours_metadata(ohs, TODAY)
+    # Monday evening, Sunday evening and the spill-over into Monday morning / Tuesday
+    assert metadata["open_days"] == (1 << MON) | (1 << TUE) | (1 << SUN)
+    assert metadata["open_minutes"][0] == {"gte": 0, "lt": 60}
+    assert day_mask([(at(MON, "10:00"), at(MON, "17:00"))]) == 1 << MON
+
+
+def test_open_at_filter_and_check():
+    metadata = opening_hours_metadata([spec(["Sunday"], "13:00", "18:00")], TODAY)
+    sunday_3pm = datetime(2025, 6, 15, 15, 0)
+
+    condition = open_at_filter(sunday_3pm)
+    assert condition.key == "open_minutes"
+    assert condition.operator == FilterOperator.EQ
+    assert condition.value == at(SUN, "15:00")
+
+    assert is_open_at(metadata, sunday_3pm) is True
+    assert is_open_at(metadata, datetime(2025, 6, 15, 18, 0)) is False
+    assert is_open_at({}, sunday_3pm) is None
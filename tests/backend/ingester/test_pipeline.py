@@ -0,0 +1,196 @@
+import json
+import threading
+
+import pytest
+from llama_index.core import Document
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode
+
+from pipeline import (
+    IngestionPipeline,
+    OpenSearchBulkWriter,
+    ParseReport,
+    batched,
+    iter_documents,
+    pack_document,
+    parse_pool,
+    parse_workers,
+    unpack_document,
+)
+
+
+class FakeWriter:
+    def __init__(self, fail_on_batch=None):
+        self.batches = []
+        self.refreshed = 0
+        self.fail_on_batch = fail_on_batch
+        self.threads = set()
+
+    def write(self, nodes):
+        self.threads.add(threading.current_thread().name)
+        if self.fail_on_batch is not None and len(self.batches) == self.fail_on_batch:
+            raise RuntimeError("bulk failed")
+        self.batches.append(list(nodes))
+        return len(nodes)
+
+    def refresh(self):
+        self.refreshed += 1
+
+
+def make_docs(n):
+    return [Document(text=f"Ort {i} im Allgäu", doc_id=f"poi-{i}", metadata={"city": "Fischen"}) for i in range(n)]
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(batched([], 3)) == []
+
+
+def parse_item(item, file_path):
+    if item["@id"] == "poi-1":
+        raise ValueError("bad item")
+    return Document(text=item["name"], doc_id=item["@id"], metadata={"file": file_path})
+
+
+def write_sources(tmp_path, n=3):
+    good = tmp_path / "bayerncloud_a.ndjson"
+    good.write_text("\n".join(json.dumps({"@id": f"poi-{i}", "name": f"POI {i}"}) for i in range(n)))
+    broken = tmp_path / "bayerncloud_b.json"
+    broken.write_text("{not json")
+    return [str(good), str(broken)]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_iter_documents_skips_bad_items_and_files(tmp_path, workers):
+    files = write_sources(tmp_path)
+    report = ParseReport()
+
+    docs = list(iter_documents(files, parse_item, report, workers=workers, chunk_size=2))
+
+    assert [d.id_ for d in docs] == ["poi-0", "poi-2"]
+    assert docs[0].metadata == {"file": files[0], "source_file": files[0]}
+    assert "source_file" not in docs[0].get_content(metadata_mode=MetadataMode.EMBED)
+    assert report.items == 3
+    assert report.documents == 2
+    assert report.item_errors == 1
+    assert report.failed_files == [files[1]]
+
+
+def test_parallel_parsing_keeps_source_order(tmp_path):
+    files = write_sources(tmp_path, n=50)[:1]
+
+    serial = list(iter_documents(files, parse_item, workers=1, chunk_size=3))
+    parallel = list(iter_documents(files, parse_item, workers=3, chunk_size=3))
+
+    assert [d.id_ for d in parallel] == [d.id_ for d in serial]
+    assert len(parallel) == 49
+
+
+def test_one_pool_for_several_calls(tmp_path):
+    files = write_sources(tmp_path, n=20)[:1]
+
+    pool = parse_pool(2)
+    try:
+        assert pool._mp_context.get_start_method() != "fork"
+        first = list(iter_documents(files, parse_item, workers=2, chunk_size=3, executor=pool))
+        second = list(iter_documents(files, parse_item, workers=2, chunk_size=3, executor=pool))
+    finally:
+        pool.shutdown()
+
+    assert [d.id_ for d in first] == [d.id_ for d in second]
+    assert len(first) == 19
+
+
+def test_default_parse_workers_are_capped(monkeypatch):
+    monkeypatch.setattr("pipeline.INGEST_PARSE_MAX_WORKERS", 4)
+    monkeypatch.setattr("os.sched_getaffinity", lambda pid: set(range(64)), raising=False)
+
+    assert parse_workers(0) == 4
+    assert parse_workers(6) == 6
+    monkeypatch.setattr("os.sched_getaffinity", lambda pid: {0}, raising=False)
+    assert parse_workers(0) == 1
+    assert parse_pool(1) is None
+
+
+def prepare_names(items, file_path):
+    # one batch call per chunk; a per-item error only costs that item's extra
+    return [(None, "no name") if item["@id"] == "poi-2" else (item["name"].upper(), None) for item in items]
+
+
+def parse_prepared(item, file_path, prepared):
+    return Document(text=item["name"], doc_id=item["@id"], metadata={"upper": prepared})
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_prepare_runs_per_chunk_and_reports_warnings(tmp_path, workers):
+    files = write_sources(tmp_path, n=4)[:1]
+    report = ParseReport()
+
+    docs = list(iter_documents(files, parse_prepared, report, workers=workers, chunk_size=3, prepare=prepare_names))
+
+    assert [d.metadata["upper"] for d in docs] == ["POI 0", "POI 1", None, "POI 3"]
+    assert report.documents == 4
+    assert report.item_errors == 0
+    assert report.item_warnings == 1
+
+
+def test_pack_document_roundtrip():
+    doc = Document(
+        text="Ort",
+        id_="poi-1",
+        metadata={"city": "Fischen", "location": "47.4,10.2"},
+        excluded_embed_metadata_keys=["location"],
+        excluded_llm_metadata_keys=["location"],
+    )
+
+    restored = unpack_document(pack_document(doc))
+
+    assert restored.id_ == doc.id_
+    assert restored.get_content(metadata_mode=MetadataMode.EMBED) == doc.get_content(metadata_mode=MetadataMode.EMBED)
+    assert restored.metadata == doc.metadata
+
+
+def test_pipeline_batches_embeds_and_refreshes_once():
+    writer = FakeWriter()
+    pipeline = IngestionPipeline(
+        writer,
+        transformations=[SentenceSplitter(chunk_size=512, chunk_overlap=0)],
+        embed_model=MockEmbedding(embed_dim=8),
+        batch_size=4,
+        max_pending_writes=1,
+    )
+
+    stats = pipeline.run(iter(make_docs(10)))
+
+    assert stats["batches"] == 3
+    assert stats["documents"] == 10
+    assert stats["nodes"] == sum(len(b) for b in writer.batches) == 10
+    assert [len(b) for b in writer.batches] == [4, 4, 2]
+    assert all(len(node.get_embedding()) == 8 for b in writer.batches for node in b)
+    assert writer.refreshed == 1
+    assert all(name.startswith("bulk-writer") for name in writer.threads)
+
+
+def test_pipeline_propagates_write_errors():
+    writer = FakeWriter(fail_on_batch=1)
+    pipeline = IngestionPipeline(writer, [], MockEmbedding(embed_dim=4), batch_size=2)
+
+    with pytest.raises(RuntimeError, match="bulk failed"):
+        pipeline.run(iter(make_docs(6)))
+    assert writer.refreshed == 0
+
+
+def test_bulk_writer_action_matches_llamaindex_layout():
+    writer = OpenSearchBulkWriter(os_client=None, index="pois")
+    node = SentenceSplitter(chunk_size=512, chunk_overlap=0)(make_docs(1))[0]
+    node.embedding = [0.1, 0.2]
+
+    action = writer.to_action(node)
+
+    assert action["_index"] == "pois"
+    assert action["_id"] == node.node_id
+    assert action["embedding"] == [0.1, 0.2]
+    assert action["description"] == "Ort 0 im Allgäu"
+    assert action["metadata"]["city"] == "Fischen"
+    assert action["metadata"]["doc_id"] == "poi-0"
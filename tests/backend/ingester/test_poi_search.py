@@ -0,0 +1,137 @@
+from datetime import datetime
+
+import pytest
+
+from poi_search import PoiSearch, check_embedding_dimension, collapse_hits, compact_hit, filter_clauses, hybrid_query, search_pipeline_body
+
+
+def test_pipeline_bodies():
+    processor = search_pipeline_body("min_max", lexical_weight=0.3)["phase_results_processors"][0]
+    combination = processor["normalization-processor"]["combination"]
+    assert combination["parameters"]["weights"] == [0.3, 0.7]
+
+    processor = search_pipeline_body("rrf", rank_constant=60)["phase_results_processors"][0]
+    assert processor["score-ranker-processor"]["combination"] == {"technique": "rrf", "rank_constant": 60}
+
+    with pytest.raises(ValueError):
+        search_pipeline_body("max")
+
+
+def test_filters_apply_to_both_sub_queries():
+    filters = filter_clauses(
+        city="Oberstdorf", types=["Gastronomie"], near=(47.4, 10.27, 5), open_at=datetime(2025, 6, 15, 15, 0)
+    )
+    assert filters == [
+        {"term": {"metadata.city.keyword": "Oberstdorf"}},
+        {"terms": {"metadata.type.keyword": ["Gastronomie"]}},
+        {"geo_distance": {"distance": "5km", "metadata.location": {"lat": 47.4, "lon": 10.27}}},
+        {"term": {"metadata.open_minutes": 6 * 1440 + 15 * 60}},
+    ]
+
+    body = hybrid_query("pizza", [0.1, 0.2], size=5, filters=filters, candidates=50)
+    lexical, knn = body["query"]["hybrid"]["queries"]
+    assert lexical["bool"]["filter"] == filters
+    assert knn["knn"]["embedding"]["filter"] == {"bool": {"filter": filters}}
+    assert knn["knn"]["embedding"]["k"] == 50
+    assert body["size"] == 5
+    assert "embedding" not in body["_source"]["includes"]
+
+
+def test_unfiltered_query_has_no_filter_clauses():
+    body = hybrid_query("wandern", [0.1], size=80, candidates=50)
+    lexical, knn = body["query"]["hybrid"]["queries"]
+    assert "filter" not in lexical["bool"]
+    assert "filter" not in knn["knn"]["embedding"]
+    assert knn["knn"]["embedding"]["k"] == 80
+
+
+def test_compact_hit_shortens_the_description():
+    hit = {
+        "_id": "abc#0",
+        "_score": 0.8,
+        "_source": {"description": "Berge " * 100, "metadata": {"name": "Nebelhorn", "city": "Oberstdorf"}},
+    }
+    compact = compact_hit(hit, snippet_chars=20)
+    assert compact["name"] == "Nebelhorn"
+    assert compact["snippet"] == "Berge Berge Berge …"
+    assert compact["website"] is None
+
+
+class FakeEmbedding:
+    def get_query_embedding(self, text):
+        return [3.0, 4.0, 12.0]
+
+
+def chunk_hit(doc_id, chunk, score):
+    return {"_id": f"{doc_id}#{chunk}", "_score": score, "_source": {"metadata": {"name": doc_id.upper(), "source_id": doc_id}}}
+
+
+class FakeOpenSearch:
+    def __init__(self, hits=None):
+        self.requests = []
+        self.hits = hits or [{"_id": "x#0", "_score": 1.0, "_source": {"metadata": {"name": "X"}}}]
+
+    def search(self, index, body, params=None):
+        self.requests.append((index, body, params))
+        return {"hits": {"hits": self.hits[: body["size"]]}}
+
+
+def test_search_is_one_request_through_the_pipeline():
+    client = FakeOpenSearch()
+    search = PoiSearch(client, "tourism-data", FakeEmbedding(), dim=2, pipeline="poi-hybrid")
+
+    hits = search.search("pizza", k=3, city="Fischen")
+
+    assert [h["name"] for h in hits] == ["X"]
+    (index, body, params), = client.requests
+    assert index == "tourism-data"
+    assert params == {"search_pipeline": "poi-hybrid"}
+    # truncated to the search dimension and re-normalized
+    assert body["query"]["hybrid"]["queries"][1]["knn"]["embedding"]["vector"] == pytest.approx([0.6, 0.8])
+
+
+def test_chunks_of_one_poi_fill_one_slot():
+    client = FakeOpenSearch(
+        [chunk_hit("a", 0, 0.9), chunk_hit("a", 1, 0.8), chunk_hit("b", 0, 0.7), chunk_hit("a", 2, 0.6), chunk_hit("c", 1, 0.5)]
+    )
+    search = PoiSearch(client, "tourism-data", FakeEmbedding(), dim=3, overfetch=3)
+
+    hits = search.search("museum", k=2)
+
+    assert [(h["id"], h["score"]) for h in hits] == [("a#0", 0.9), ("b#0", 0.7)]
+    # over-fetched: one request for k * overfetch hits
+    assert client.requests[0][1]["size"] == 6
+
+
+def test_collapse_without_source_id_uses_the_document_id():
+    hits = [compact_hit({"_id": "x#1", "_score": 1.0}), compact_hit({"_id": "x#0", "_score": 0.5}), compact_hit({"_id": "y#0"})]
+    assert [h["id"] for h in collapse_hits(hits, k=10)] == ["x#1", "y#0"]
+
+
+class FakeMappings:
+    def __init__(self, mappings):
+        self.mappings = mappings
+
+    def exists(self, index):
+        return bool(self.mappings)
+
+    def get_mapping(self, index):
+        return {name: {"mappings": {"properties": {"embedding": vector}}} for name, vector in self.mappings.items()}
+
+
+def mapping_client(mappings):
+    client = FakeOpenSearch()
+    client.indices = FakeMappings(mappings)
+    return client
+
+
+def test_dimension_check_fails_fast_on_another_model():
+    client = mapping_client({"pois-1": {"type": "knn_vector", "dimension": 384}})
+    check_embedding_dimension(client, "pois", 384)
+    with pytest.raises(RuntimeError, match="384"):
+        check_embedding_dimension(client, "pois", 3072)
+
+
+def test_dimension_check_skips_missing_index_and_pq_models():
+    check_embedding_dimension(mapping_client({}), "pois", 3072)
+    check_embedding_dimension(mapping_client({"pois-1": {"type": "knn_vector", "model_id": "pq"}}), "pois", 3072)
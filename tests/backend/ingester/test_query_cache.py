@@ -0,0 +1,119 @@
+import threading
+
+import numpy as np
+from llama_index.core.embeddings import MockEmbedding
+
+from poi_search import PoiSearch
+from query_cache import QueryEmbeddingLRU, SemanticResultCache, normalize_query, with_query_cache
+
+
+class CountingEmbedding(MockEmbedding):
+    calls: list = []
+
+    def _get_query_embedding(self, query):
+        self.calls.append(query)
+        return [float(len(query)), 1.0, 0.0, 0.0]
+
+
+def test_normalize_query():
+    assert normalize_query("Wandern und Berge") == normalize_query("  wandern & berge!")
+    assert normalize_query("Café in München?") == "café in münchen"
+    assert normalize_query("Pizza") != normalize_query("Pasta")
+
+
+def test_query_lru_hits_on_normalized_text_and_is_bounded():
+    inner = CountingEmbedding(embed_dim=4, calls=[])
+    cached = QueryEmbeddingLRU(inner, max_entries=2)
+
+    first = cached.get_query_embedding("Wandern und Berge")
+    assert cached.get_query_embedding("wandern & berge") == first
+    assert inner.calls == ["Wandern und Berge"]
+
+    cached.get_query_embedding("Pizza")
+    cached.get_query_embedding("Sauna")  # evicts "wandern und berge"
+    cached.get_query_embedding("Wandern und Berge")
+    assert len(inner.calls) == 4
+    assert cached.hit_rate == {"hits": 1, "misses": 4, "rate": 0.2, "entries": 2}
+
+    # document embeddings are not cached
+    assert cached.get_text_embedding("Berge") == inner.get_text_embedding("Berge")
+    assert with_query_cache(inner, max_entries=0) is inner
+
+
+def test_query_lru_is_thread_safe():
+    cached = QueryEmbeddingLRU(CountingEmbedding(embed_dim=4, calls=[]), max_entries=8)
+    queries = [f"q{i % 16}" for i in range(400)]
+
+    threads = [threading.Thread(target=lambda: [cached.get_query_embedding(q) for q in queries]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = cached.hit_rate
+    assert stats["hits"] + stats["misses"] == 1600
+    assert stats["entries"] == 8
+
+
+def unit(*values):
+    v = np.asarray(values, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_semantic_cache_hits_near_duplicates_with_same_key():
+    cache = SemanticResultCache(max_entries=4, threshold=0.95, ttl_sec=60)
+    cache.put(unit(1, 0, 0), "k", ["a"])
+
+    assert cache.get(unit(1, 0.1, 0), "k") == ["a"]  # cosine ~0.995
+    assert cache.get(unit(1, 0.5, 0), "k") is None  # cosine ~0.89
+    assert cache.get(unit(1, 0, 0), "other filters") is None
+    assert cache.hit_rate == {"hits": 1, "misses": 2, "rate": 0.333, "entries": 1}
+
+
+def test_semantic_cache_evicts_least_recently_used_and_expired(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("query_cache.time.monotonic", lambda: now[0])
+    cache = SemanticResultCache(max_entries=2, threshold=0.99, ttl_sec=60)
+
+    cache.put(unit(1, 0, 0), "k", "x")
+    now[0] += 1
+    cache.put(unit(0, 1, 0), "k", "y")
+    now[0] += 1
+    assert cache.get(unit(1, 0, 0), "k") == "x"  # x is now the most recently used
+    cache.put(unit(0, 0, 1), "k", "z")  # evicts y
+    assert cache.get(unit(0, 1, 0), "k") is None
+    assert len(cache) == 2
+
+    now[0] += 60
+    assert cache.get(unit(0, 0, 1), "k") is None
+    assert SemanticResultCache(max_entries=0).get(unit(1, 0, 0), "k") is None
+
+
+class FakeOpenSearch:
+    def __init__(self):
+        self.requests = 0
+
+    def search(self, index, body, params=None):
+        self.requests += 1
+        return {"hits": {"hits": [{"_id": "x#0", "_score": 1.0, "_source": {"metadata": {"name": "X"}}}]}}
+
+
+def test_search_reuses_results_for_the_same_question():
+    client = FakeOpenSearch()
+    inner = CountingEmbedding(embed_dim=4, calls=[])
+    search = PoiSearch(
+        client,
+        "tourism-data",
+        with_query_cache(inner),
+        dim=4,
+        result_cache=SemanticResultCache(max_entries=8, threshold=0.99),
+    )
+
+    first = search.search("Wandern und Berge", k=3)
+    assert search.search("wandern & berge", k=3) == first
+    assert client.requests == 1 and len(inner.calls) == 1
+
+    # different filters: no result reuse, but the embedding is still cached
+    search.search("Wandern und Berge", k=3, city="Oberstdorf")
+    assert client.requests == 2 and len(inner.calls) == 1
+    assert search.result_cache.hit_rate["hits"] == 1
@@ -0,0 +1,46 @@
+import pytest
+
+from index_versions import IndexVersions
+from runner import IngestRunner
+
+from .test_index_versions import FakeOpenSearch
+
+
+def index_body():
+    return {"settings": {"index": {"knn": True}}, "mappings": {}}
+
+
+def runner(client, stats):
+    ingestor = IngestRunner(client, "pois", index_body, parse=None, embed_model=None, embed_dim=8)
+    ingestor.ingest = lambda run=None: stats
+    return ingestor
+
+
+def test_reindex_swaps_the_alias_to_the_new_version():
+    client = FakeOpenSearch()
+    versions = IndexVersions(client, alias="pois")
+
+    ingestor = runner(client, {"documents": 3, "failed_files": 0})
+    ingestor.build_version(versions, "reindex:pois", ledger=None, resume=False)
+
+    assert versions.current() == ingestor.index_name
+    assert ingestor.index_name in client.indices.indices
+
+
+@pytest.mark.parametrize("stats", [{"documents": 0}, {"documents": 3, "failed_files": 1}])
+def test_empty_or_incomplete_versions_never_go_live(stats):
+    client = FakeOpenSearch()
+    versions = IndexVersions(client, alias="pois")
+
+    ingestor = runner(client, stats)
+    with pytest.raises(RuntimeError):
+        ingestor.build_version(versions, "reindex:pois", ledger=None, resume=False)
+
+    assert versions.current() is None
+    assert client.indices.indices == {}
+
+
+def test_resume_needs_a_ledger(monkeypatch):
+    monkeypatch.setattr("runner.INGEST_LEDGER_PATH", "")
+    with pytest.raises(ValueError):
+        runner(FakeOpenSearch(), {}).open_ledger(resume=True)
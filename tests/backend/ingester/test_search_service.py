@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from opensearchpy.exceptions import ConnectionError as OpenSearchConnectionError
+
+import search_service
+
+
+class FakeSearch:
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+
+    def search(self, text, **kwargs):
+        self.calls.append((text, kwargs))
+        if self.error is not None:
+            raise self.error
+        return [{"id": "poi-1#0", "score": 0.9, "source_id": "poi-1", "name": "Nebelhorn", "snippet": "Berg"}]
+
+
+@pytest.fixture
+async def client():
+    # ASGITransport skips the lifespan: no embedding model and no OpenSearch connection
+    async with AsyncClient(transport=ASGITransport(app=search_service.app), base_url="http://test") as ac:
+        yield ac
+
+
+@pytest.mark.asyncio
+async def test_search_passes_filters_and_returns_hits(client, monkeypatch):
+    fake = FakeSearch()
+    monkeypatch.setattr(search_service, "search", fake)
+
+    response = await client.post(
+        "/search",
+        json={
+            "query": "Bergbahn",
+            "k": 5,
+            "city": "Oberstdorf",
+            "types": ["Bergbahn"],
+            "near": {"lat": 47.4, "lon": 10.27},
+            "open_at": "2025-06-15T15:00:00",
+        },
+    )
+
+    assert response.status_code == 200
+    [hit] = response.json()
+    assert (hit["id"], hit["source_id"], hit["name"]) == ("poi-1#0", "poi-1", "Nebelhorn")
+    [(text, kwargs)] = fake.calls
+    assert text == "Bergbahn"
+    assert kwargs == {
+        "k": 5,
+        "city": "Oberstdorf",
+        "types": ["Bergbahn"],
+        "near": (47.4, 10.27, 10),
+        "open_at": datetime(2025, 6, 15, 15, 0),
+    }
+
+
+@pytest.mark.asyncio
+async def test_search_validates_the_request(client, monkeypatch):
+    monkeypatch.setattr(search_service, "search", FakeSearch())
+
+    assert (await client.post("/search", json={"query": ""})).status_code == 422
+    assert (await client.post("/search", json={"query": "Pizza", "k": 0})).status_code == 422
+    assert (await client.post("/search", json={"query": "Pizza", "near": {"lat": 91, "lon": 0}})).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_opensearch_errors_are_bad_gateway(client, monkeypatch):
+    monkeypatch.setattr(search_service, "search", FakeSearch(error=OpenSearchConnectionError("N/A", "down", None)))
+
+    response = await client.post("/search", json={"query": "Pizza"})
+
+    assert response.status_code == 502
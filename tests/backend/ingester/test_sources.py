@@ -0,0 +1,92 @@
+import os
+import json
+import shutil
+
+import pytest
+
+from Backend.api_gateway.writers import CorpusCollectionWriter, NdjsonCollectionWriter
+from Backend.Ingester.sources import CorpusReader, collection_name, iter_source_items, list_source_files
+
+
+def sample_items(n):
+    return [
+        {
+            "@id": f"poi-{i}",
+            "@type": ["Place"],
+            "name": f"POI {i}",
+            "description": "<p>Schöner Ort</p>",
+            "address": {"addressLocality": "Fischen", "postalCode": "87538", "@type": "PostalAddress"},
+            "geo": {"latitude": 47.4, "longitude": 10.2, "elevation": 760},
+            "dc:classification": [{"@id": "unused"}],
+        }
+        for i in range(n)
+    ]
+
+
+def write_corpus(tmp_path, items, page_size=100):
+    writer = CorpusCollectionWriter(str(tmp_path), "bayerncloud_food")
+    writer.open({"@graph": items[:page_size], "meta": {"total": len(items)}})
+    for page, start in enumerate(range(0, len(items), page_size), start=1):
+        writer.write_page(page, items[start:start + page_size])
+    return writer.close(pages_total=page, failed_pages=[])
+
+
+def test_corpus_round_trip_and_lookup(tmp_path):
+    items = sample_items(150)
+    info = write_corpus(tmp_path, items)
+    assert info["count"] == 150
+
+    with CorpusReader(str(tmp_path / "bayerncloud_food.corpus")) as reader:
+        records = list(reader)
+        assert len(reader) == 150
+        assert [r["@id"] for r in records] == [f"poi-{i}" for i in range(150)]
+        assert reader.get("poi-99") == {
+            "@id": "poi-99",
+            "name": "POI 99",
+            "description": "<p>Schöner Ort</p>",
+            "address": {"addressLocality": "Fischen", "postalCode": "87538"},
+            "geo": {"latitude": 47.4, "longitude": 10.2},
+        }
+        assert reader.get("missing") is None
+
+
+def test_corpus_is_smaller_than_json(tmp_path):
+    items = sample_items(500)
+    write_corpus(tmp_path, items)
+    pretty = json.dumps({"@graph": items}, ensure_ascii=False, indent=2).encode("utf-8")
+
+    assert (tmp_path / "bayerncloud_food.corpus").stat().st_size < len(pretty) / 10
+
+
+def test_corpus_index_is_replaced_before_the_data(tmp_path, monkeypatch):
+    replaced = []
+    real_replace = os.replace
+    monkeypatch.setattr(os, "replace", lambda src, dst: (replaced.append(os.path.basename(dst)), real_replace(src, dst)))
+
+    write_corpus(tmp_path, sample_items(3))
+
+    assert replaced == ["bayerncloud_food.corpus.idx", "bayerncloud_food.corpus"]
+
+
+def test_reader_rejects_data_that_does_not_match_the_index(tmp_path):
+    write_corpus(tmp_path, sample_items(3))
+    shutil.copy(tmp_path / "bayerncloud_food.corpus", tmp_path / "old.corpus")
+    write_corpus(tmp_path, sample_items(150))
+    # the moment between the writer's two renames: new index, old data
+    shutil.copy(tmp_path / "old.corpus", tmp_path / "bayerncloud_food.corpus")
+
+    with pytest.raises(ValueError, match="does not match its index"):
+        CorpusReader(str(tmp_path / "bayerncloud_food.corpus"))
+
+
+def test_source_listing_and_reading_all_formats(tmp_path):
+    write_corpus(tmp_path, sample_items(3))
+    writer = NdjsonCollectionWriter(str(tmp_path), "bayerncloud_tracks", compress=True)
+    writer.open({})
+    writer.write_page(1, sample_items(2))
+    writer.close(pages_total=1, failed_pages=[])
+    (tmp_path / "bayerncloud_retail.json").write_text(json.dumps({"@graph": sample_items(1)}))
+
+    files = list_source_files(str(tmp_path), "bayerncloud*")
+    assert [collection_name(f) for f in files] == ["bayerncloud_food", "bayerncloud_retail", "bayerncloud_tracks"]
+    assert [len(list(iter_source_items(f))) for f in files] == [3, 1, 2]
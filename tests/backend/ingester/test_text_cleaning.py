@@ -0,0 +1,42 @@
+import pytest
+
+from text_cleaning import _html_to_text, clean_html, clean_html_soup
+
+SAMPLES = [
+    "<p>Schöner&nbsp;Ort</p><p>mit <b>Blick</b></p>",
+    "a &amp; b",
+    "<!-- Kommentar --><p>x</p>",
+    "<script>var a = 1</script><p>y</p>",
+    "<style>p {}</style>z",
+    "<template>t</template>q",
+    "plain <3 text",
+    "<br>Mo-Fr<br/>9-12",
+    "  Text\r\nmehr  ",
+    "<p>a</p>tail<div>b<span>c</span>d</div>",
+    "&lt;p&gt;",
+    "<p>",
+    "<",
+    "x\x00y",
+    "Nur Text, ohne Markup.",
+    "",
+    None,
+]
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_clean_html_matches_beautifulsoup(text):
+    assert clean_html(text) == clean_html_soup(text)
+
+
+def test_plain_text_skips_parser():
+    _html_to_text.cache_clear()
+    assert clean_html("  Gasthof im Allgäu ") == "Gasthof im Allgäu"
+    assert _html_to_text.cache_info().misses == 0
+
+
+def test_repeated_markup_is_memoized():
+    _html_to_text.cache_clear()
+    for _ in range(3):
+        assert clean_html("<p>Nach Vereinbarung</p>") == "Nach Vereinbarung"
+    info = _html_to_text.cache_info()
+    assert (info.misses, info.hits) == (1, 2)
@@ -0,0 +1,62 @@
+import math
+
+import pytest
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+
+from pipeline import OpenSearchBulkWriter
+from vector_mapping import (
+    ByteQueryEmbedding,
+    estimate_graph_bytes,
+    knn_vector_mapping,
+    quantize_to_byte,
+    vector_transform,
+)
+
+
+def test_mappings_per_compression():
+    assert knn_vector_mapping(3072, "none") == {
+        "type": "knn_vector",
+        "dimension": 3072,
+        "method": {"name": "hnsw", "engine": "faiss"},
+    }
+    fp16 = knn_vector_mapping(3072, "fp16")
+    assert fp16["method"]["parameters"]["encoder"] == {"name": "sq", "parameters": {"type": "fp16"}}
+    assert knn_vector_mapping(3072, "byte")["data_type"] == "byte"
+    assert knn_vector_mapping(3072, "pq", pq_model_id="poi-pq") == {"type": "knn_vector", "model_id": "poi-pq"}
+
+    with pytest.raises(ValueError):
+        knn_vector_mapping(3072, "pq", pq_model_id="")
+    with pytest.raises(ValueError):
+        knn_vector_mapping(3072, "int4")
+
+
+def test_memory_estimate_shrinks_with_compression():
+    sizes = [estimate_graph_bytes(100_000, 3072, mode, pq_m=384) for mode in ("none", "fp16", "byte", "pq")]
+    assert sizes == sorted(sizes, reverse=True)
+    assert sizes[0] == int(1.1 * (4 * 3072 + 8 * 16) * 100_000)
+
+
+def test_quantize_to_byte_clips_and_scales_by_dimension():
+    dim = 1024
+    unit = 1 / math.sqrt(dim)
+    vector = [unit] * (dim - 2) + [1.0, -1.0]
+
+    quantized = quantize_to_byte(vector)
+
+    assert quantized[0] == round(127 / 4)
+    assert quantized[-2:] == [127, -128]
+    assert quantize_to_byte([0.5, -0.5], scale=100) == [50, -50]
+
+
+def test_byte_mode_writes_and_queries_int8():
+    assert vector_transform("none") is None
+
+    writer = OpenSearchBulkWriter(os_client=None, index="pois", vector_transform=vector_transform("byte"))
+    node = TextNode(text="Ort", embedding=[0.1] * 16)
+    assert writer.to_action(node)["embedding"] == quantize_to_byte([0.1] * 16)
+
+    model = ByteQueryEmbedding(MockEmbedding(embed_dim=16))
+    query = model.get_query_embedding("Pizza")
+    assert all(float(v).is_integer() and -128 <= v <= 127 for v in query)
+    assert model.get_text_embedding("Pizza") == MockEmbedding(embed_dim=16).get_text_embedding("Pizza")
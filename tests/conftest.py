@@ -1,9 +1,20 @@
 import pytest
 from httpx import ASGITransport, AsyncClient
+from Backend.api_gateway import main as gateway
+from Backend.api_gateway.admission import AdmissionController
 from Backend.api_gateway.main import app as gateway_app
 
 @pytest.fixture
 async def gateway_client():
     """Fixture to provide an async client for the API Gateway."""
     async with AsyncClient(transport=ASGITransport(app=gateway_app), base_url="http://test") as ac:
-        yield ac
\ No newline at end of file
+        yield ac
+
+@pytest.fixture(autouse=True)
+def unlimited_admission(monkeypatch):
+    """Fresh, non-limiting admission controllers per test (tests share one client address)."""
+    for attr in ("plan_trip_admission", "fetch_admission"):
+        monkeypatch.setattr(gateway, attr, AdmissionController(
+            attr, max_concurrency=0, max_queue=0, queue_timeout_sec=0,
+            client_rate_per_sec=0, client_burst=1,
+        ))